@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Mononucleotide-shuffled baseline of the whole corpus without shuffling:
+the expected rank-count vector of each genome's shuffle is computed from
+its GC content and length (common/expected_spectrum.py) and the models of
+common/model_registry.py are fitted to it, in blocks of genomes.
+
+GC content and genome size are read from the 'GC Content (%)' and
+'Genome Size (bp)' columns of a results store (or workbook) partition, or
+from a TSV with genome, gc (fraction or %) and length columns. One record
+per genome and k is written, in fit_models.py's layout; --spectra also
+saves the expected vectors (zero-padded rank-count rows).
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import atomic_path
+from common.expected_spectrum import expected_rank_frequency, MAX_EXPECTED_K
+from common.kmer_counting import parse_k_values
+from common.model_registry import FIT_MODELS, model_columns, evaluate_models
+from common.results_store import load_results
+
+RESULTS_STORE = "/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/results_store"
+DEFAULT_MODELS = ('zipf_mandelbrot', 'truncated_power_law')
+
+
+def read_genomes(source, model, k, table=None):
+    """(names, GC fractions, lengths) from a TSV table or a results partition."""
+    if table is not None:
+        df = pd.read_csv(table, sep='\t')
+        names, gc, length = df['genome'], df['gc'], df['length']
+    else:
+        df = load_results(source, model, k,
+                          columns=['Filename', 'GC Content (%)', 'Genome Size (bp)'])
+        names, gc, length = df['Filename'], df['GC Content (%)'], df['Genome Size (bp)']
+    gc = pd.to_numeric(gc, errors='coerce').to_numpy(dtype=float)
+    gc = np.where(gc > 1, gc / 100, gc)     # percentages
+    length = pd.to_numeric(length, errors='coerce').to_numpy(dtype=float)
+    keep = np.isfinite(gc) & np.isfinite(length) & (gc >= 0) & (gc <= 1) & (length > 0)
+    if not keep.all():
+        print(f"WARNING: {np.count_nonzero(~keep)} genomes without GC content or size skipped")
+    return names.astype(str).to_numpy()[keep], gc[keep], length[keep]
+
+
+def fit_expected(names, gc, length, k, models, init='auto', batch_size=1024):
+    """Records (genome, k, n_ranks, values) of the expected spectra, and the spectra."""
+    records, spectra = [], []
+    for start in range(0, len(names), batch_size):
+        stop = min(start + batch_size, len(names))
+        vectors = expected_rank_frequency(gc[start:stop], length[start:stop], k)
+        # ranks expected to be empty are dropped, as for observed spectra
+        ranked = [v[v > 0] for v in vectors]
+        values = evaluate_models(models, ranked, init=init)
+        records.extend((names[i], k, v.size, row)
+                       for i, v, row in zip(range(start, stop), ranked, values))
+        spectra.append(vectors.astype(np.float32))
+    return records, np.concatenate(spectra) if spectra else np.empty((0, 0), np.float32)
+
+
+def write_records(path, models, records):
+    columns = ["genome", "k", "status", "n_ranks"] + model_columns(models)
+    with atomic_path(path) as tmp:
+        with open(tmp, 'w') as out:
+            out.write("\t".join(columns) + "\n")
+            for name, k, n_ranks, values in records:
+                out.write("\t".join([name, str(k), "ok", str(n_ranks)] +
+                                    [f"{v:.6g}" for v in values]) + "\n")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Fit the expected spectra of shuffled genomes")
+    p.add_argument('-o', '--output', required=True, help="Output TSV of fit records")
+    p.add_argument('--source', default=RESULTS_STORE,
+                   help="Results store or workbook with 'GC Content (%%)' and 'Genome Size (bp)'")
+    p.add_argument('--source-model', default='zipf_mandelbrot',
+                   help="Model partition of --source to read them from")
+    p.add_argument('--source-k', type=int, default=3, help="k partition of --source")
+    p.add_argument('--table', default=None,
+                   help="TSV with genome, gc and length columns instead of --source")
+    p.add_argument('--k', default='3-7', help="k values (default: 3-7)")
+    p.add_argument('--models', default=",".join(DEFAULT_MODELS),
+                   help=f"Comma-separated models (default: {','.join(DEFAULT_MODELS)})")
+    p.add_argument('--init', choices=('fixed', 'auto'), default='auto',
+                   help="Starting parameters of the fitted models (see batch_fit.starting_params)")
+    p.add_argument('--batch-size', type=int, default=1024, help="Genomes per block")
+    p.add_argument('--spectra', default=None,
+                   help="Also save the expected spectra (npz, one genomes x ranks array per k)")
+    args = p.parse_args()
+
+    try:
+        ks = parse_k_values(args.k)
+    except ValueError as e:
+        sys.exit(str(e))
+    if max(ks) > MAX_EXPECTED_K:
+        sys.exit(f"k must be <= {MAX_EXPECTED_K}, got {max(ks)}")
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in FIT_MODELS]
+    if unknown:
+        sys.exit(f"Unknown model(s) {unknown}; available: {', '.join(FIT_MODELS)}")
+    try:
+        names, gc, length = read_genomes(args.source, args.source_model, args.source_k,
+                                         args.table)
+    except (FileNotFoundError, KeyError) as e:
+        sys.exit(f"Cannot read GC content and genome size: {e}")
+
+    records, spectra = [], {'genome': np.asarray(names, dtype=str)}
+    for k in ks:
+        recs, vectors = fit_expected(names, gc, length, k, models, args.init, args.batch_size)
+        records.extend(recs)
+        spectra[f"k{k}"] = vectors
+        print(f"k={k}: {len(recs)} expected spectra fitted")
+
+    write_records(args.output, models, records)
+    if args.spectra:
+        with atomic_path(args.spectra) as tmp:
+            with open(tmp, 'wb') as f:
+                np.savez_compressed(f, **spectra)
+    print(f"Done. Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
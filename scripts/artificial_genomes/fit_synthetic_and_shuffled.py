@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
+import os
 import re
+import sys
 from pathlib import Path
 import numpy as np
 from scipy.optimize import curve_fit
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.kmer_counting import read_rank_counts
+
 def truncated_power_law(r, alpha, lam, scale):
     return scale * r ** (-alpha) * np.exp(-lam * r)
 
@@ -37,21 +42,24 @@ def fit_and_evaluate(model_func, x, y, p0, bounds, maxfev=1000000):
 
 def load_counts(path: Path):
     """
-    Load a two-column tab file (kmer<TAB>count), return a sorted list of counts.
+    Load a two-column tab file (kmer<TAB>count) or a ranks-only .npy file,
+    return the counts in descending order; create_kmers.py writes them
+    rank-sorted already, so they are only sorted when they are not.
     """
-    lines = path.read_text().strip().splitlines()
-    counts = [int(line.split('\t')[1]) for line in lines if line]
-    return sorted(counts, reverse=True)
+    counts = read_rank_counts(path)
+    if np.any(counts[1:] > counts[:-1]):
+        counts = np.sort(counts)[::-1]
+    return counts
 
 def prepare_rank_freq(counts):
-    total = sum(counts)
-    freqs = np.array(counts, dtype=float) / total
+    total = counts.sum()
+    freqs = counts / total
     x = np.arange(1, len(freqs) + 1)
     return x, freqs
 
 def main(input_dir, output_summary):
-    p = re.compile(r'(.+)_([34567])\.txt$')
-    files = list(Path(input_dir).glob("*.txt"))
+    p = re.compile(r'(.+)_([34567])\.(?:txt|npy)$')
+    files = list(Path(input_dir).glob("*.txt")) + list(Path(input_dir).glob("*.npy"))
 
     genomes = {}
     for f in files:
@@ -66,12 +74,13 @@ def main(input_dir, output_summary):
             out.write(f"{prefix}\n")
 
             entries = sorted(genomes[prefix], key=lambda t: t[0])
+            # parse every count file once; both models reuse it
+            rank_freqs = {k: prepare_rank_freq(load_counts(path)) for k, path in entries}
 
             # truncated power law
             out.write("Truncated power law:\n")
-            for k, path in entries:
-                counts = load_counts(path)
-                x, y = prepare_rank_freq(counts)
+            for k, _ in entries:
+                x, y = rank_freqs[k]
 
                 popt, r2, aic, bic, rmse = fit_and_evaluate(
                     truncated_power_law,
@@ -96,9 +105,8 @@ def main(input_dir, output_summary):
 
             # Zipf–Mandelbrot
             out.write("Zipf–Mandelbrot:\n")
-            for k, path in entries:
-                counts = load_counts(path)
-                x, y = prepare_rank_freq(counts)
+            for k, _ in entries:
+                x, y = rank_freqs[k]
 
                 popt, r2, aic, bic, rmse = fit_and_evaluate(
                     zipf_mandelbrot,
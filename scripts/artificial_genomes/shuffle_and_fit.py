@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Shuffled-genome null models without shuffled FASTA files: every genome is
+read once, shuffled --replicates times in memory (common/shuffling.py,
+mononucleotide or --klet), each shuffle's canonical k-mers are counted for
+every k, and the rank-frequency models of common/model_registry.py are
+fitted to the spectra right away. Only the fit records (one row per genome,
+replicate and k) and, with --spectra-dir, the rank-sorted count vectors are
+written.
+
+Replicate r of a genome uses the Generator record_rng(seed, name, r), so
+replicate 0 is the genome shuffle_fasta.py writes with the same --seed and
+--klet, and the results do not depend on --workers.
+"""
+import os
+import sys
+import argparse
+from functools import partial
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import (load_work_list, iter_tasks, atomic_path, add_executor_args,
+                             file_size, ALL_BUCKETS)
+from common.kmer_counting import (new_kmer_table, update_kmer_tables, ranked_counts,
+                                  parse_k_values, MAX_DENSE_K)
+from common.model_registry import FIT_MODELS, model_columns, evaluate_models
+from common.packed_genome import read_genome, genome_name
+from common.shuffling import shuffle_record, record_rng, MAX_KLET
+
+DEFAULT_MODELS = ('zipf_mandelbrot', 'truncated_power_law')
+
+
+def shuffled_spectra(records, ks, klet, rng):
+    """{k: rank-sorted canonical counts} of one shuffle of the encoded records."""
+    tables = [new_kmer_table(k, first_seen=False) for k in ks]
+    for encoded in records:
+        update_kmer_tables(tables, shuffle_record(encoded, klet, rng))
+    return {k: ranked_counts(t['counts']) for k, t in zip(ks, tables)}
+
+
+def save_spectra(path, ks, spectra):
+    """npz with one (replicates, ranks) zero-padded count array per k ('k3', 'k4', ...)."""
+    arrays = {}
+    for k in ks:
+        vectors = [s[k] for s in spectra]
+        out = np.zeros((len(vectors), max((v.size for v in vectors), default=0)), dtype=np.int64)
+        for i, v in enumerate(vectors):
+            out[i, :v.size] = v
+        arrays[f"k{k}"] = out
+    with atomic_path(path) as tmp:
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+
+def shuffle_and_fit(path, ks, klet, replicates, seed, models, init='auto', cache_dir=None,
+                    spectra_dir=None):
+    """
+    Records (genome, replicate, k, status, n_ranks, values) of every
+    replicate shuffle of one genome, fitting all replicates of a k together.
+    """
+    name = genome_name(path)
+    records = read_genome(path, cache_dir)
+    spectra = [shuffled_spectra(records, ks, klet, record_rng(seed, name, r))
+               for r in range(replicates)]
+    del records
+    if spectra_dir is not None:
+        save_spectra(os.path.join(spectra_dir, f"{name}_shuffled_spectra.npz"), ks, spectra)
+
+    rows = []
+    for k in ks:
+        vectors = [s[k] for s in spectra]
+        keep = [r for r, v in enumerate(vectors) if v.size and v.sum() > 0]
+        values = dict(zip(keep, evaluate_models(models, [vectors[r] for r in keep], init=init)
+                          if keep else []))
+        for r, v in enumerate(vectors):
+            if r in values:
+                rows.append((name, r, k, "ok", v.size, values[r]))
+            else:
+                rows.append((name, r, k, "NoData", 0, None))
+    print(f"Done {name}: {replicates} replicate(s), k={','.join(map(str, ks))}")
+    return rows
+
+
+def write_records(path, models, records):
+    columns = ["genome", "replicate", "k", "status", "n_ranks"] + model_columns(models)
+    n_values = len(columns) - 5
+    with atomic_path(path) as tmp:
+        with open(tmp, 'w') as out:
+            out.write("\t".join(columns) + "\n")
+            for name, replicate, k, status, n_ranks, values in records:
+                if values is None:
+                    values = np.full(n_values, np.nan)
+                out.write("\t".join([name, str(replicate), str(k), status, str(n_ranks)] +
+                                    [f"{v:.6g}" for v in values]) + "\n")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Shuffle, count and fit genomes in memory")
+    p.add_argument('scheduler', help="Scheduler JSON, or a plain list of FASTA paths")
+    p.add_argument('-o', '--output', required=True, help="Output TSV of fit records")
+    p.add_argument('--bucket-id', default=ALL_BUCKETS,
+                   help="Bucket to process (default: every bucket)")
+    p.add_argument('--k', default='3-7', help="k values to count and fit (default: 3-7)")
+    p.add_argument('--klet', type=int, default=1,
+                   help="Preserve k-let counts for this k (1 = mononucleotide shuffle)")
+    p.add_argument('--replicates', type=int, default=1, help="Shuffles per genome (default: 1)")
+    p.add_argument('--seed', type=int, default=0, help="Run seed (default: 0)")
+    p.add_argument('--models', default=",".join(DEFAULT_MODELS),
+                   help=f"Comma-separated models (default: {','.join(DEFAULT_MODELS)})")
+    p.add_argument('--init', choices=('fixed', 'auto'), default='auto',
+                   help="Starting parameters of the fitted models (see batch_fit.starting_params)")
+    p.add_argument('--spectra-dir', default=None,
+                   help="Also save each genome's rank-sorted spectra (.npz) in this directory")
+    p.add_argument('--genome-cache', default=None,
+                   help="Directory of packed genomes from pack_genomes.py, used when up to date.")
+    add_executor_args(p)
+    args = p.parse_args()
+
+    try:
+        ks = parse_k_values(args.k)
+    except ValueError as e:
+        sys.exit(str(e))
+    if max(ks) > MAX_DENSE_K:
+        sys.exit(f"k must be <= {MAX_DENSE_K}, got {max(ks)}")
+    if not 1 <= args.klet <= MAX_KLET:
+        sys.exit(f"--klet must be in [1, {MAX_KLET}], got {args.klet}")
+    if args.replicates < 1:
+        sys.exit("--replicates must be >= 1")
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in FIT_MODELS]
+    if unknown:
+        sys.exit(f"Unknown model(s) {unknown}; available: {', '.join(FIT_MODELS)}")
+
+    try:
+        files = load_work_list(args.scheduler, args.bucket_id)
+    except KeyError:
+        sys.exit(f"Bucket '{args.bucket_id}' not found in scheduler.")
+    fastas = []
+    for path in files:
+        if not os.path.exists(path):
+            print(f"Missing file, skipping: {path}", file=sys.stderr)
+            continue
+        fastas.append(path)
+    if args.spectra_dir:
+        os.makedirs(args.spectra_dir, exist_ok=True)
+
+    work = partial(shuffle_and_fit, ks=ks, klet=args.klet, replicates=args.replicates,
+                   seed=args.seed, models=models, init=args.init,
+                   cache_dir=args.genome_cache, spectra_dir=args.spectra_dir)
+    results = {}
+    for i, rows in iter_tasks(work, fastas, args.workers, args.retries,
+                              [file_size(f) for f in fastas]):
+        if rows is None:
+            print(f"Failed {fastas[i]}", file=sys.stderr)
+            rows = [(genome_name(fastas[i]), r, k, "WorkerFailed", 0, None)
+                    for r in range(args.replicates) for k in ks]
+        results[i] = rows
+
+    records = [row for i in sorted(results) for row in results[i]]
+    write_records(args.output, models, records)
+    n_ok = sum(r[3] == "ok" for r in records)
+    print(f"Done. {n_ok}/{len(records)} spectra fitted with {', '.join(models)}; "
+          f"results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,38 @@
 #!/usr/bin/env python3
+"""
+Shuffled copies of the genomes of a scheduler: every record is shuffled
+(mononucleotide by default, k-let preserving with --klet K; see
+common/shuffling.py) and streamed to <outdir>/<name>_shuffled.fna.gz, one
+record in memory at a time. Runs of N stay in place; bases are written
+upper-case with other IUPAC codes as N. Each file gets its own Generator
+seeded from --seed and its name, so reruns and any --workers give the same
+output.
+"""
 import os
 import sys
-import json
-import gzip
-import random
+import argparse
+from functools import partial
 from pathlib import Path
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
 
-def shuffle_sequence(seq):
-    """Return a new sequence string with nucleotides shuffled."""
-    seq_list = list(str(seq))
-    random.shuffle(seq_list)
-    return "".join(seq_list)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import (load_work_list, iter_tasks, atomic_path, add_executor_args,
+                             file_size, ALL_BUCKETS)
+from common.fasta import open_fasta, write_fasta_record
+from common.packed_genome import iter_genome, genome_name, decode
+from common.shuffling import shuffle_record, record_rng, MAX_KLET
 
-def process_file(inpath, outpath):
-    """Read inpath .fna.gz, shuffle each record, and write to outpath .fna.gz."""
-    with gzip.open(inpath, "rt") as hin, gzip.open(outpath, "wt") as hout:
-        records = []
-        for rec in SeqIO.parse(hin, "fasta"):
-            shuffled = shuffle_sequence(rec.seq)
-            records.append(SeqRecord(Seq(shuffled),
-                                     id=rec.id,
-                                     description=rec.description))
-        SeqIO.write(records, hout, "fasta")
+def process_file(inpath, outpath, klet=1, seed=0, cache_dir=None):
+    """Shuffle each record of inpath and write it to outpath .fna.gz as it is done."""
+    rng = record_rng(seed, genome_name(inpath))
+    with atomic_path(outpath) as tmp:
+        with open_fasta(tmp, "wb", compressed=outpath.endswith(".gz")) as hout:
+            for header, encoded in iter_genome(inpath, cache_dir):
+                write_fasta_record(hout, header, decode(shuffle_record(encoded, klet, rng)))
+    return outpath
+
+def shuffle_task(task, **kwargs):
+    """process_file on an (inpath, outpath) pair, for the executor."""
+    return process_file(*task, **kwargs)
 
 def make_shuffled_name(filename: str) -> str:
     suffix = ".fna.gz"
@@ -35,32 +43,47 @@ def make_shuffled_name(filename: str) -> str:
         return f"{filename}_shuffled"
 
 def main():
-    if len(sys.argv) != 3:
-        sys.exit("Usage: python shuffle.py <scheduler.json> <outdir>")
+    p = argparse.ArgumentParser(description="Write shuffled copies of the scheduler's genomes")
+    p.add_argument('scheduler', help="Scheduler JSON, or a plain list of FASTA paths")
+    p.add_argument('outdir')
+    p.add_argument('--bucket-id', default=ALL_BUCKETS,
+                   help="Bucket to shuffle (default: every bucket)")
+    p.add_argument('--klet', type=int, default=1,
+                   help="Preserve k-let counts for this k (1 = mononucleotide shuffle)")
+    p.add_argument('--seed', type=int, default=0, help="Run seed (default: 0)")
+    p.add_argument('--genome-cache', default=None,
+                   help="Directory of packed genomes from pack_genomes.py, used when up to date.")
+    add_executor_args(p)
+    args = p.parse_args()
 
-    scheduler_path = sys.argv[1]
-    outdir = Path(sys.argv[2])
+    if not 1 <= args.klet <= MAX_KLET:
+        sys.exit(f"--klet must be in [1, {MAX_KLET}], got {args.klet}")
+    outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     try:
-        with open(scheduler_path) as f:
-            sched = json.load(f)
-    except Exception as e:
+        files = load_work_list(args.scheduler, args.bucket_id)
+    except KeyError:
+        sys.exit(f"Bucket '{args.bucket_id}' not found in scheduler.")
+    except (OSError, ValueError) as e:
         sys.exit(f"Error reading scheduler file: {e}")
 
-    for bucket_id, files in sched.items():
-        print(f"Processing bucket {bucket_id} with {len(files)} files…")
-        for filepath in files:
-            infile = Path(filepath)
-            if not infile.exists():
-                print(f"  [!] WARNING: {infile} not found, skipping.")
-                continue
-
-            new_name = make_shuffled_name(infile.name)
-            outfile = outdir / new_name
+    inputs, outputs = [], []
+    for filepath in files:
+        if not os.path.exists(filepath):
+            print(f"  [!] WARNING: {filepath} not found, skipping.")
+            continue
+        inputs.append(filepath)
+        outputs.append(str(outdir / make_shuffled_name(genome_name(filepath))))
 
-            print(f"  → Shuffling {infile.name} → {new_name}")
-            process_file(str(infile), str(outfile))
+    work = partial(shuffle_task, klet=args.klet, seed=args.seed, cache_dir=args.genome_cache)
+    sizes = [file_size(f) for f in inputs]
+    for i, result in iter_tasks(work, list(zip(inputs, outputs)),
+                                args.workers, args.retries, sizes):
+        if result is None:
+            print(f"  [!] Failed {inputs[i]}", file=sys.stderr)
+        else:
+            print(f"  → Shuffled {os.path.basename(inputs[i])} → {os.path.basename(result)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check that common/shuffling.klet_shuffle draws uniformly among the
+sequences with the same k-let counts and first (k-1)-mer.
+
+For short sequences every such sequence is enumerated by walking the
+Eulerian paths of the k-let multigraph; the shuffle is drawn --draws times
+and the frequencies are tested against the uniform distribution with a
+chi-square test. One row per (sequence, k) is printed; the exit status is 1
+when any test rejects at --alpha or a draw is not a valid shuffle.
+"""
+import os
+import sys
+import argparse
+from collections import Counter
+
+import numpy as np
+from scipy.stats import chisquare
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.kmer_counting import encode_sequence
+from common.shuffling import klet_shuffle
+
+DEFAULT_CASES = ("AACACCA:2", "ACAGTACGATCA:2", "AACAGCAGCAACAGCA:3")
+COLUMNS = ["sequence", "k", "valid", "draws", "min_freq", "max_freq", "chi2", "p_value"]
+
+
+def klet_sequences(seq, k):
+    """Every sequence with the k-let counts and first (k-1)-mer of seq."""
+    m = k - 1
+    edges = Counter(seq[i:i + k] for i in range(len(seq) - m))
+    out = set()
+
+    def walk(path, vertex, left):
+        if left == 0:
+            out.add(path)
+            return
+        for edge in [e for e, n in edges.items() if n and e[:m] == vertex]:
+            edges[edge] -= 1
+            walk(path + edge[-1], edge[1:], left - 1)
+            edges[edge] += 1
+
+    walk(seq[:m], seq[:m], len(seq) - m)
+    return out
+
+
+def check_case(seq, k, draws, seed):
+    """(row, ok) of one sequence: frequencies of the draws over the valid sequences."""
+    valid = sorted(klet_sequences(seq, k))
+    encoded = encode_sequence(seq)
+    rng = np.random.default_rng(seed)
+    freq = Counter("".join("ACGT"[b] for b in klet_shuffle(encoded, k, rng))
+                   for _ in range(draws))
+    invalid = set(freq) - set(valid)
+    if invalid:
+        print(f"{seq} k={k}: {len(invalid)} draws are not valid shuffles, e.g. "
+              f"{sorted(invalid)[0]}", file=sys.stderr)
+    observed = np.array([freq[s] for s in valid], dtype=float)
+    chi2, p = chisquare(observed) if len(valid) > 1 else (0.0, 1.0)
+    row = [seq, k, len(valid), draws, int(observed.min()), int(observed.max()), chi2, p]
+    return row, not invalid, p
+
+
+def main():
+    p = argparse.ArgumentParser(description="Brute-force uniformity check of the k-let shuffle")
+    p.add_argument('cases', nargs='*', default=list(DEFAULT_CASES),
+                   help=f"SEQUENCE:K pairs (default: {' '.join(DEFAULT_CASES)})")
+    p.add_argument('--draws', type=int, default=30000, help="Shuffles per case (default: 30000)")
+    p.add_argument('--seed', type=int, default=0, help="Seed (default: 0)")
+    p.add_argument('--alpha', type=float, default=1e-3,
+                   help="Reject uniformity below this p-value (default: 1e-3)")
+    args = p.parse_args()
+
+    failed = False
+    print("\t".join(COLUMNS))
+    for case in args.cases:
+        seq, _, k = case.partition(':')
+        row, ok, p_value = check_case(seq.upper(), int(k or 2), args.draws, args.seed)
+        failed |= not ok or p_value < args.alpha
+        print("\t".join(f"{v:.4g}" if isinstance(v, float) else str(v) for v in row))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared helpers used by the analysis scripts in the sibling directories."""
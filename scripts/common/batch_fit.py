@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Batched least-squares fits of rank-frequency models.
+
+Many genomes are fitted at once: their normalised rank-frequency vectors
+are stacked into a 2-D array (one row per genome, shorter rows padded and
+masked), and Levenberg-Marquardt iterations with analytic Jacobians run on
+all rows together. Each row solves its own 3x3 normal equations, so every
+genome gets exactly the least-squares fit curve_fit would compute on the
+linear frequency scale, while the loop over genomes disappears.
+"""
+import numpy as np
+
+BLOCK_ELEMENTS = 1 << 18     # rows x ranks fitted together
+GRID_RANKS = 512             # ranks used to score the starting grid
+
+
+def zipf_mandelbrot(r, alpha, beta, scale):
+    """freq(r) = scale * (r + beta) ** (-alpha)"""
+    return scale * (r + beta) ** (-alpha)
+
+
+def zipf_mandelbrot_shape(r, alpha, beta):
+    """Unit-scale Zipf-Mandelbrot curve and its derivatives in (alpha, beta)."""
+    shifted = r + beta
+    log_r = np.log(shifted)
+    g = np.exp(-alpha * log_r)
+    return g, (-g * log_r, -alpha * g / shifted)
+
+
+def truncated_power_law(r, alpha, lambda_, scale):
+    """freq(r) = scale * r ** (-alpha) * exp(-lambda * r)"""
+    return scale * r ** (-alpha) * np.exp(-lambda_ * r)
+
+
+def truncated_power_law_shape(r, alpha, lambda_):
+    """Unit-scale truncated power law and its derivatives in (alpha, lambda)."""
+    log_r = np.log(r)
+    g = np.exp(-alpha * log_r - lambda_ * r)
+    return g, (-g * log_r, -g * r)
+
+
+def zipf_mandelbrot_loglinear(r, beta):
+    """log freq = log scale - alpha * x + offset, for a fixed beta."""
+    return np.log(r + beta), np.zeros_like(r)
+
+
+def truncated_power_law_loglinear(r, lambda_):
+    """log freq = log scale - alpha * x + offset, for a fixed lambda."""
+    return np.log(r), -lambda_ * r
+
+
+# name -> model description used by fit_batch. Every model is
+# scale * shape(r, alpha, second); the scale is solved in closed form.
+# 'grid' holds the starting values tried for the second parameter (for the
+# truncated power law in units of 1 / number of ranks).
+MODELS = {
+    'zipf_mandelbrot': {
+        'params': ('alpha', 'beta', 'scale'),
+        'func': zipf_mandelbrot,
+        'shape': zipf_mandelbrot_shape,
+        'loglinear': zipf_mandelbrot_loglinear,
+        'grid': np.concatenate(([0.0], np.geomspace(0.1, 300, 16))),
+        'rank_scaled_grid': False,
+        'p0': (1.0, 1.0),
+        'lower': (0.0, 0.0),
+        'upper': (np.inf, np.inf),
+    },
+    'truncated_power_law': {
+        'params': ('alpha', 'lambda', 'scale'),
+        'func': truncated_power_law,
+        'shape': truncated_power_law_shape,
+        'loglinear': truncated_power_law_loglinear,
+        'grid': np.concatenate(([0.0], np.geomspace(0.01, 30, 16))),
+        'rank_scaled_grid': True,
+        'p0': (1.0, 0.1),
+        'lower': (0.0, 0.0),
+        'upper': (np.inf, np.inf),
+    },
+}
+
+
+def stack_rank_frequencies(vectors):
+    """
+    Normalise count vectors (already in rank order) to frequencies and stack
+    them into (ranks, freqs, mask); rows shorter than the longest are
+    zero-padded and masked out. Empty vectors give an all-masked row.
+    """
+    width = max((len(v) for v in vectors), default=0)
+    freqs = np.zeros((len(vectors), width))
+    mask = np.zeros((len(vectors), width), dtype=bool)
+    for i, v in enumerate(vectors):
+        v = np.asarray(v, dtype=float)
+        total = v.sum()
+        if v.size and total > 0:
+            freqs[i, :v.size] = v / total
+            mask[i, :v.size] = True
+    ranks = np.arange(1, width + 1, dtype=float)
+    return ranks, freqs, mask
+
+
+def _shape(model, ranks, theta, mask, with_jac=False):
+    """
+    Unit-scale curve g of every row (zero where masked or not finite) and,
+    optionally, its derivatives in each nonlinear parameter.
+    """
+    cols = [theta[:, j:j + 1] for j in range(theta.shape[1])]
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore', under='ignore'):
+        g, dg = model['shape'](ranks, *cols)
+    g = np.where(mask & np.isfinite(g), g, 0.0)
+    if not with_jac:
+        return g, None
+    return g, [np.where(mask & np.isfinite(d), d, 0.0) for d in dg]
+
+
+def _project(g, freqs):
+    """Least-squares scale of every row and the resulting residual and SSE."""
+    gg = np.einsum('ij,ij->i', g, g)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.where(gg > 0, np.einsum('ij,ij->i', g, freqs) / gg, 0.0)
+    resid = scale[:, None] * g - freqs
+    sse = np.einsum('ij,ij->i', resid, resid)
+    return scale, resid, np.where(np.isfinite(sse), sse, np.inf)
+
+
+def fit_statistics(freqs, pred, mask, n_params):
+    """R2, AIC, BIC and RMSE of every row, over its unmasked ranks."""
+    n = mask.sum(axis=1)
+    resid = np.where(mask, freqs - pred, 0.0)
+    sse = np.einsum('ij,ij->i', resid, resid)
+    mean = np.where(n > 0, freqs.sum(axis=1) / np.maximum(n, 1), 0.0)
+    dev = np.where(mask, freqs - mean[:, None], 0.0)
+    ss_total = np.einsum('ij,ij->i', dev, dev)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_total > 0, 1 - sse / ss_total, np.nan)
+        log_term = np.where(sse > 0, n * np.log(sse / n), 0.0)
+        rmse = np.sqrt(sse / n)
+    aic = np.where(sse > 0, log_term + 2 * n_params, 2 * n_params)
+    bic = np.where(sse > 0, log_term + n_params * np.log(n), n_params * np.log(n))
+    return {'R2': r2, 'AIC': aic, 'BIC': bic, 'RMSE': rmse, 'SSE': sse}
+
+
+def _fit_rows(model, ranks, freqs, mask, theta, max_iter, ftol, xtol):
+    n_rows, n_par = theta.shape
+    lower = np.asarray(model['lower'], dtype=float)
+    upper = np.asarray(model['upper'], dtype=float)
+    eye = np.eye(n_par)
+
+    g, _ = _shape(model, ranks, theta, mask)
+    scale, resid, sse = _project(g, freqs)
+    nfev = np.ones(n_rows, dtype=np.int64)
+    mu = np.full(n_rows, 1e-3)
+    converged = ~mask.any(axis=1)
+    active = np.flatnonzero(~converged)
+
+    need_jac = np.ones(n_rows, dtype=bool)
+    jtj = np.zeros((n_rows, n_par, n_par))
+    grad = np.zeros((n_rows, n_par))
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        # normal equations only for rows whose parameters moved
+        upd = active[need_jac[active]]
+        if upd.size:
+            gu, dg = _shape(model, ranks, theta[upd], mask[upd], with_jac=True)
+            gg = np.einsum('ij,ij->i', gu, gu)
+            gg[gg == 0] = 1.0
+            # Kaufman: J = s * (I - g g^T / <g, g>) dg
+            jac = [scale[upd, None] * (d - gu * (np.einsum('ij,ij->i', gu, d) / gg)[:, None])
+                   for d in dg]
+            for p in range(n_par):
+                grad[upd, p] = np.einsum('ij,ij->i', jac[p], resid[upd])
+                for q in range(p + 1):
+                    jtj[upd, p, q] = jtj[upd, q, p] = np.einsum('ij,ij->i', jac[p], jac[q])
+            need_jac[upd] = False
+
+        a = jtj[active]
+        ga = grad[active]
+        th = theta[active]
+        # parameters held at a bound by the gradient stay out of the step
+        free = ~(((th <= lower) & (ga > 0)) | ((th >= upper) & (ga < 0)))
+        damp = mu[active, None] * np.maximum(np.diagonal(a, axis1=1, axis2=2), 1e-300)
+        lhs = a + damp[:, :, None] * eye
+        lhs = np.where(free[:, :, None] & free[:, None, :], lhs, eye)
+        rhs = np.where(free, ga, 0.0)[:, :, None]
+        try:
+            step = -np.linalg.solve(lhs, rhs)[:, :, 0]
+        except np.linalg.LinAlgError:
+            step = -(np.linalg.pinv(lhs) @ rhs)[:, :, 0]
+        trial = np.clip(th + step, lower, upper)
+
+        g_new, _ = _shape(model, ranks, trial, mask[active])
+        new_scale, new_resid, new_sse = _project(g_new, freqs[active])
+        nfev[active] += 1
+        old = sse[active]
+        better = new_sse < old
+
+        acc = active[better]
+        theta[acc] = trial[better]
+        scale[acc] = new_scale[better]
+        resid[acc] = new_resid[better]
+        sse[acc] = new_sse[better]
+        need_jac[acc] = True
+        mu[acc] = np.maximum(mu[acc] * 0.3, 1e-12)
+        mu[active[~better]] *= 4.0
+
+        small_step = np.all(np.abs(step) <= xtol * (np.abs(th) + xtol), axis=1)
+        conv = (better & ((old - new_sse) <= ftol * old)) | (~better & small_step) | (new_sse == 0)
+        converged[active[conv]] = True
+        active = active[~(conv | (mu[active] > 1e16))]
+
+    return np.column_stack((theta, scale)), nfev, converged
+
+
+def fit_batch(model, ranks, freqs, mask, p0=None, max_iter=1000,
+              ftol=1e-8, xtol=1e-8, block_rows=None):
+    """
+    Least-squares fit of `model` to every row of `freqs` (masked entries
+    ignored). The linear scale is eliminated by variable projection
+    (Golub-Pereyra, with Kaufman's Jacobian), and the nonlinear parameters
+    follow Levenberg-Marquardt steps with damping scaled by diag(J^T J),
+    projected onto the model bounds. Rows are iterated in blocks of
+    `block_rows` (default: about BLOCK_ELEMENTS values per block) so the
+    working arrays stay in cache.
+
+    p0 gives the starting (alpha, beta/lambda), one for all rows or one per
+    row, e.g. from initial_guess. Returns a dict with 'params' (rows x params, scale last), 'nfev'
+    (curve evaluations per row), 'converged' and the fit_statistics.
+    """
+    if isinstance(model, str):
+        model = MODELS[model]
+    n_rows = freqs.shape[0]
+    lower = np.asarray(model['lower'], dtype=float)
+    upper = np.asarray(model['upper'], dtype=float)
+    if p0 is None:
+        p0 = model['p0']
+    p0 = np.asarray(p0, dtype=float)[..., :lower.size]     # a trailing scale is ignored
+    theta = np.clip(np.broadcast_to(p0, (n_rows, lower.size)), lower, upper)
+
+    if block_rows is None:
+        block_rows = max(16, BLOCK_ELEMENTS // max(freqs.shape[1], 1))
+
+    params = np.zeros((n_rows, lower.size + 1))
+    nfev = np.zeros(n_rows, dtype=np.int64)
+    converged = np.zeros(n_rows, dtype=bool)
+    for start, stop in iter_row_blocks(n_rows, block_rows):
+        # trim the padding shared by every row of the block
+        width = int(mask[start:stop].sum(axis=1).max(initial=0))
+        params[start:stop], nfev[start:stop], converged[start:stop] = _fit_rows(
+            model, ranks[:width], freqs[start:stop, :width], mask[start:stop, :width],
+            theta[start:stop].copy(), max_iter, ftol, xtol)
+
+    cols = [params[:, j:j + 1] for j in range(params.shape[1])]
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore', under='ignore'):
+        pred = model['func'](ranks, *cols)
+    stats = fit_statistics(freqs, pred, mask, params.shape[1])
+    stats.update(params=params, nfev=nfev, converged=converged)
+    return stats
+
+
+def initial_guess(model, ranks, freqs, mask):
+    """
+    Closed-form starting parameters (rows x params, scale last): for every
+    value of the model's grid for the second parameter, alpha comes from an
+    ordinary least-squares fit of log frequency (log-log for the power-law
+    part) and the scale from the linear projection; the grid value with the
+    smallest linear-scale SSE, scored on about GRID_RANKS evenly spaced
+    ranks, is kept.
+    """
+    if isinstance(model, str):
+        model = MODELS[model]
+    n_rows = freqs.shape[0]
+    grid = model['grid'] / ranks.size if model['rank_scaled_grid'] else model['grid']
+    # the grid is scored on every stride-th rank only
+    stride = max(1, ranks.size // GRID_RANKS)
+    ranks, freqs, mask = ranks[::stride], freqs[:, ::stride], mask[:, ::stride]
+    ok = mask & (freqs > 0)
+    n = ok.sum(axis=1)
+    with np.errstate(divide='ignore'):
+        logf = np.where(ok, np.log(np.where(ok, freqs, 1.0)), 0.0)
+
+    best = np.tile(np.append(model['p0'], 1.0), (n_rows, 1))
+    best_sse = np.full(n_rows, np.inf)
+    for value in grid:
+        x, offset = model['loglinear'](ranks, value)
+        xs = np.where(ok, x, 0.0)
+        ys = np.where(ok, logf - offset, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x_mean = xs.sum(axis=1) / n
+            y_mean = ys.sum(axis=1) / n
+            dx = np.where(ok, x - x_mean[:, None], 0.0)
+            slope = (np.einsum('ij,ij->i', dx, ys - y_mean[:, None])
+                     / np.einsum('ij,ij->i', dx, dx))
+        alpha = np.clip(np.nan_to_num(-slope, nan=model['p0'][0]),
+                        model['lower'][0], model['upper'][0])
+        theta = np.column_stack((alpha, np.full(n_rows, value)))
+        g, _ = _shape(model, ranks, theta, mask)
+        scale, _, sse = _project(g, freqs)
+        better = sse < best_sse
+        best[better] = np.column_stack((theta, scale))[better]
+        best_sse[better] = sse[better]
+    return best
+
+
+def rescale_start(model, params, rank_ratio=4.0):
+    """
+    Map parameters fitted at k-1 to a start at k, where there are about
+    `rank_ratio` times as many ranks: f_k(r) ~ f_(k-1)(r / ratio) / ratio.
+    """
+    if isinstance(model, str):
+        model = MODELS[model]
+    params = np.array(params, dtype=float, ndmin=2)
+    out = params.copy()
+    if model['rank_scaled_grid']:
+        out[:, 1] = params[:, 1] / rank_ratio
+    else:
+        out[:, 1] = params[:, 1] * rank_ratio
+    out[:, -1] = params[:, -1] * rank_ratio ** (params[:, 0] - 1)
+    return out
+
+
+def best_start(model, ranks, freqs, mask, candidates):
+    """Per row, the candidate start (each rows x params) with the smallest SSE."""
+    if isinstance(model, str):
+        model = MODELS[model]
+    n_par = len(model['lower'])
+    best = best_sse = None
+    for cand in candidates:
+        cand = np.broadcast_to(np.asarray(cand, dtype=float), (freqs.shape[0], n_par + 1))
+        g, _ = _shape(model, ranks, cand[:, :n_par], mask)
+        scale, _, sse = _project(g, freqs)
+        sse = np.where(np.isnan(sse), np.inf, sse)
+        cand = np.column_stack((cand[:, :n_par], scale))
+        if best is None:
+            best, best_sse = cand, sse
+        else:
+            better = sse < best_sse
+            best[better] = cand[better]
+            best_sse[better] = sse[better]
+    return best
+
+
+def starting_params(model, ranks, freqs, mask, init='fixed', warm=None):
+    """
+    Starting parameters (rows x params, scale last) for fit_batch or
+    curve_fit. init='fixed' is the model's fixed p0 with scale 1 (the start
+    the fit scripts always used), init='auto' the initial_guess. `warm`
+    optionally holds, per row, an array of extra candidate starts (e.g. the
+    genome's fit at k-1, its taxon median); the candidate with the smallest
+    SSE is used.
+    """
+    if isinstance(model, str):
+        model = MODELS[model]
+    if init == 'auto':
+        base = initial_guess(model, ranks, freqs, mask)
+    else:
+        base = np.tile(np.append(model['p0'], 1.0), (freqs.shape[0], 1))
+    if not warm or not any(len(w) for w in warm):
+        return base
+    candidates = [base]
+    for j in range(max(len(w) for w in warm)):
+        cand = np.full_like(base, np.nan)
+        for i, w in enumerate(warm):
+            if len(w) > j:
+                cand[i] = w[j]
+        candidates.append(cand)
+    return best_start(model, ranks, freqs, mask, candidates)
+
+
+def group_median_starts(params, groups):
+    """Median parameters of every group: {group: params}."""
+    params = np.asarray(params, dtype=float)
+    groups = np.asarray(groups)
+    return {grp: np.median(params[groups == grp], axis=0) for grp in np.unique(groups)}
+
+
+def read_fit_results(path, model):
+    """{genome_key: params} from a fit results file, skipping failed fits."""
+    if isinstance(model, str):
+        model = MODELS[model]
+    fits = {}
+    with open(path) as f:
+        for line in f:
+            name, values = parse_result_line(line)
+            try:
+                params = [float(values[p]) for p in model['params']]
+            except (KeyError, TypeError, ValueError):
+                continue
+            if np.all(np.isfinite(params)):
+                fits[genome_key(name)] = np.array(params)
+    return fits
+
+
+def read_groups(path):
+    """{genome_key: group} from a two-column (genome, group) tab-separated file."""
+    groups = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 2 and not line.startswith('#'):
+                groups[genome_key(parts[0])] = parts[1]
+    return groups
+
+
+def warm_start_candidates(model, keys, fits, groups=None, rank_ratio=4.0):
+    """
+    Extra start candidates for every genome key: its own previous fit and
+    the median previous fit of its group, both mapped by rescale_start
+    (rank_ratio=4 for fits made at k-1, 1 for the same k).
+    """
+    if isinstance(model, str):
+        model = MODELS[model]
+    medians = {}
+    if groups:
+        known = [key for key in fits if key in groups]
+        if known:
+            medians = group_median_starts([fits[key] for key in known],
+                                          [groups[key] for key in known])
+    out = []
+    for key in keys:
+        cands = []
+        if key in fits:
+            cands.append(fits[key])
+        if groups and groups.get(key) in medians:
+            cands.append(medians[groups[key]])
+        out.append(rescale_start(model, cands, rank_ratio) if cands else np.empty((0, len(model['params']))))
+    return out
+
+
+def parse_result_line(line):
+    """
+    Split a results line 'name: key=value key=value ...' into (name, values);
+    values that are not numbers are kept as strings.
+    """
+    name, _, rest = line.strip().partition(':')
+    values = {}
+    for token in rest.split():
+        key, sep, value = token.partition('=')
+        if not sep:
+            continue
+        try:
+            values[key] = float(value)
+        except ValueError:
+            values[key] = value
+    return name, values
+
+
+def genome_key(filename):
+    """Genome part of a count file name: 'X_kmers_5.txt' or 'X_ranks_5.npy' -> 'X'."""
+    name = filename.rsplit('/', 1)[-1]
+    for suffix, marker in (('.txt', '_kmers_'), ('.npy', '_ranks_')):
+        if name.endswith(suffix):
+            head, sep, tail = name[:-len(suffix)].rpartition(marker)
+            return head if sep and tail.isdigit() else name[:-len(suffix)]
+    return name
+
+
+def iter_row_blocks(n_rows, block_rows):
+    """(start, stop) of consecutive row blocks."""
+    for start in range(0, n_rows, block_rows):
+        yield start, min(start + block_rows, n_rows)
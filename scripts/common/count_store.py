@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Binary store of dense canonical k-mer count vectors.
+
+Layout, one directory per scheduler bucket:
+
+    <store_dir>/bucket_<id>/manifest.txt     one genome name per line (row order)
+    <store_dir>/bucket_<id>/counts_k<k>.npy  uint32 array, genomes x canonical k-mers
+
+Columns follow canonical_codes(k): every k-mer that is its own canonical
+form, in ascending (= lexicographic) code order. The arrays are plain .npy
+files, so loaders memory-map them instead of parsing text.
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+STORE_DTYPE = np.uint32
+MANIFEST = "manifest.txt"
+
+
+def reverse_complement_codes(codes, k):
+    """Reverse-complement 2-bit packed k-mer codes."""
+    x = np.array(codes, dtype=np.uint64)
+    rc = np.zeros_like(x)
+    for _ in range(k):
+        rc <<= np.uint64(2)
+        rc |= np.uint64(3) - (x & np.uint64(3))
+        x >>= np.uint64(2)
+    return rc
+
+
+@lru_cache(maxsize=None)
+def canonical_codes(k):
+    """Sorted codes of the canonical k-mers; column order of the store."""
+    codes = np.arange(4 ** k, dtype=np.uint64)
+    codes = codes[codes <= reverse_complement_codes(codes, k)]
+    codes.setflags(write=False)
+    return codes
+
+
+def canonical_vector(counts, k):
+    """Project a dense 4**k count table onto the canonical columns."""
+    vec = counts[canonical_codes(k).astype(np.intp)]
+    if vec.size and vec.max() > np.iinfo(STORE_DTYPE).max:
+        raise OverflowError(f"k={k} count {vec.max()} does not fit in {STORE_DTYPE.__name__}")
+    return vec.astype(STORE_DTYPE)
+
+
+def bucket_dir(store_dir, bucket_id):
+    return os.path.join(store_dir, f"bucket_{bucket_id}")
+
+
+def counts_path(store_dir, bucket_id, k):
+    return os.path.join(bucket_dir(store_dir, bucket_id), f"counts_k{k}.npy")
+
+
+def create_bucket(store_dir, bucket_id, ks, n_genomes):
+    """
+    Pre-allocate the count arrays of a bucket. Returns a writer dict used by
+    store_counts/close_bucket; arrays are written under a temporary name and
+    only renamed into place once the bucket is complete.
+    """
+    out_dir = bucket_dir(store_dir, bucket_id)
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {}
+    for k in ks:
+        tmp = counts_path(store_dir, bucket_id, k) + ".tmp"
+        arrays[k] = open_memmap(tmp, mode='w+', dtype=STORE_DTYPE,
+                                shape=(n_genomes, canonical_codes(k).size))
+    return {'dir': out_dir, 'store_dir': store_dir, 'bucket_id': bucket_id,
+            'arrays': arrays, 'names': []}
+
+
+def store_counts(writer, name, vectors):
+    """Append one genome as a row; vectors maps k to its canonical_vector."""
+    row = len(writer['names'])
+    for k, vec in vectors.items():
+        writer['arrays'][k][row] = vec
+    writer['names'].append(name)
+
+
+def close_bucket(writer):
+    """Flush the arrays, trim unused rows and publish arrays plus manifest."""
+    n = len(writer['names'])
+    for k in list(writer['arrays']):
+        arr = writer['arrays'].pop(k)
+        tmp = arr.filename
+        if n < arr.shape[0]:
+            trimmed = open_memmap(tmp + ".trim", mode='w+', dtype=arr.dtype,
+                                  shape=(n, arr.shape[1]))
+            trimmed[:] = arr[:n]
+            trimmed.flush()
+            del arr, trimmed
+            os.replace(tmp + ".trim", tmp)
+        else:
+            arr.flush()
+            del arr
+        os.replace(tmp, counts_path(writer['store_dir'], writer['bucket_id'], k))
+
+    manifest = os.path.join(writer['dir'], MANIFEST)
+    with open(manifest + ".tmp", 'w') as f:
+        f.writelines(f"{name}\n" for name in writer['names'])
+    os.replace(manifest + ".tmp", manifest)
+
+
+def list_buckets(store_dir):
+    """Bucket ids present in a store, in sorted order."""
+    return sorted(
+        d[len("bucket_"):] for d in os.listdir(store_dir)
+        if d.startswith("bucket_") and os.path.isfile(os.path.join(store_dir, d, MANIFEST))
+    )
+
+
+def load_bucket(store_dir, bucket_id, k):
+    """Return (names, counts) for one bucket; counts is a read-only memmap."""
+    with open(os.path.join(bucket_dir(store_dir, bucket_id), MANIFEST)) as f:
+        names = f.read().splitlines()
+    counts = np.load(counts_path(store_dir, bucket_id, k), mmap_mode='r')
+    return names, counts
+
+
+def iter_count_vectors(store_dir, k, buckets=None):
+    """Yield (name, canonical count vector) for every genome in the store."""
+    for bucket_id in (buckets if buckets is not None else list_buckets(store_dir)):
+        names, counts = load_bucket(store_dir, bucket_id, k)
+        for name, row in zip(names, counts):
+            yield name, row
+
+
+def rank_frequency(row):
+    """Counts of the observed k-mers sorted in descending order (rank 1 first)."""
+    row = row[row > 0]
+    return np.sort(row)[::-1].astype(float)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Local process-pool executor for the per-genome pipeline stages.
+
+Instead of one serial process per scheduler bucket (SLURM_PROCID fan-out),
+a stage can run any bucket, or all of them at once, on a single node:
+files are dispatched largest first to a ProcessPoolExecutor, so workers
+pull the next genome as soon as they are free and no bucket sets the wall
+time. Failed genomes are retried, and outputs are published atomically.
+"""
+import os
+import sys
+import json
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+ALL_BUCKETS = "all"
+
+
+def default_workers():
+    """Number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def load_work_list(path, bucket_id=ALL_BUCKETS):
+    """
+    Files to process from a scheduler JSON ({bucket_id: [files]}) or from a
+    plain list with one path per line. bucket_id='all' (or None) takes every
+    bucket of a scheduler.
+    """
+    with open(path) as f:
+        text = f.read()
+    try:
+        sched = json.loads(text)
+    except json.JSONDecodeError:
+        return [line.strip() for line in text.splitlines() if line.strip()]
+
+    if isinstance(sched, list):
+        return list(sched)
+    if bucket_id is None or bucket_id == ALL_BUCKETS:
+        return [fn for files in sched.values() for fn in files]
+    if bucket_id not in sched:
+        raise KeyError(f"Bucket '{bucket_id}' not in scheduler {path}")
+    return list(sched[bucket_id])
+
+
+def file_size(path):
+    """Size in bytes, or 0 when the file cannot be stat'ed."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """
+    Yield a temporary path next to `path`; it is renamed onto `path` only if
+    the block finishes (and wrote it), so readers never see a half-written
+    output.
+    """
+    tmp = f"{path}.tmp.{os.getpid()}"
+    try:
+        yield tmp
+        if os.path.exists(tmp):
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _run_serial(func, items, order, retries):
+    for i in order:
+        for attempt in range(retries + 1):
+            try:
+                result = func(items[i])
+            except Exception as e:
+                print(f"Error on {items[i]} (attempt {attempt + 1}/{retries + 1}): {e}",
+                      file=sys.stderr)
+                continue
+            yield i, result
+            break
+        else:
+            yield i, None
+
+
+def _run_pool(func, items, order, workers, retries):
+    attempts = {i: 0 for i in order}
+    queue = list(reversed(order))          # pop() hands out the largest first
+    isolated = []                          # in flight when a worker died: rerun one at a time
+    pool = ProcessPoolExecutor(max_workers=workers)
+    running = {}
+    try:
+        while queue or isolated or running:
+            if isolated:
+                if not running:
+                    i = isolated.pop()
+                    attempts[i] += 1
+                    running[pool.submit(func, items[i])] = i
+            else:
+                while queue and len(running) < 2 * workers:
+                    i = queue.pop()
+                    attempts[i] += 1
+                    running[pool.submit(func, items[i])] = i
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            crashed = []
+            for fut in done:
+                i = running.pop(fut)
+                try:
+                    result = fut.result()
+                except BrokenProcessPool:
+                    crashed.append(i)
+                    continue
+                except Exception as e:
+                    print(f"Error on {items[i]} (attempt {attempts[i]}/{retries + 1}): {e}",
+                          file=sys.stderr)
+                    if attempts[i] <= retries:
+                        queue.append(i)
+                    else:
+                        yield i, None
+                    continue
+                yield i, result
+
+            if crashed:
+                # a worker died (e.g. out of memory); only a task running alone is
+                # charged for it, the others in flight are rerun one at a time
+                crashed.extend(running.values())
+                running.clear()
+                pool.shutdown(cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=workers)
+                if len(crashed) == 1:
+                    i = crashed[0]
+                    print(f"Worker died on {items[i]} (attempt {attempts[i]}/{retries + 1})",
+                          file=sys.stderr)
+                    if attempts[i] <= retries:
+                        isolated.append(i)
+                    else:
+                        yield i, None
+                else:
+                    print(f"Worker died with {len(crashed)} tasks in flight; "
+                          f"rerunning them one at a time", file=sys.stderr)
+                    for i in crashed:
+                        attempts[i] -= 1
+                        isolated.append(i)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def iter_tasks(func, items, workers=1, retries=2, sizes=None):
+    """
+    Run func(item) for every item, largest first (by `sizes`, default file
+    size), and yield (index, result) as tasks finish. workers=0/None uses
+    every CPU, workers=1 runs in-process. Items that still fail after
+    `retries` extra attempts yield a result of None; when a worker dies, the
+    tasks in flight are rerun one at a time so that only the one that kills
+    its worker uses up retries. func must be picklable
+    (a module-level function or a functools.partial of one).
+    """
+    items = list(items)
+    if sizes is None:
+        sizes = [file_size(it) if isinstance(it, str) else 0 for it in items]
+    order = sorted(range(len(items)), key=lambda i: sizes[i], reverse=True)
+    if not workers:
+        workers = default_workers()
+    if workers == 1:
+        yield from _run_serial(func, items, order, retries)
+    else:
+        yield from _run_pool(func, items, order, min(workers, max(len(items), 1)), retries)
+
+
+def run_tasks(func, items, workers=1, retries=2, sizes=None):
+    """Like iter_tasks but return the results in input order."""
+    items = list(items)
+    results = [None] * len(items)
+    for i, result in iter_tasks(func, items, workers, retries, sizes):
+        results[i] = result
+    return results
+
+
+def add_executor_args(parser):
+    """--workers / --retries options shared by the pipeline scripts."""
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes (0 = all CPUs of the node; 1 = serial).")
+    parser.add_argument('--retries', type=int, default=2,
+                        help="Extra attempts for a genome whose processing fails.")
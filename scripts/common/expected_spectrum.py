@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Expected canonical k-mer spectrum of a mononucleotide-shuffled genome from
+its GC content and length, without sampling.
+
+A shuffle keeps the base composition, so its k-mers are modelled as the
+windows of an i.i.d. sequence with P(C) = P(G) = gc/2 and P(A) = P(T) =
+(1 - gc)/2 (exact as the length grows; a finite permutation has slightly
+smaller variances). A k-mer with g C/G bases then has probability
+x^g y^(k-g), x = gc/2, y = (1 - gc)/2, and its reverse complement the same,
+so over N windows the canonical count of c has mean N P_c, with P_c twice
+the k-mer probability unless c is a palindrome.
+
+The variance adds the covariances of overlapping windows (Waterman,
+"Introduction to computational biology", ch. 12): for the words W of c,
+
+  Var = N P_c - P_c^2 ((2k - 1) N - k (k - 1))
+        + 2 sum_{d=1}^{k-1} (N - d) sum_{u,v in W, v overlaps u at shift d} P(u + v[k-d:])
+
+Every term is a monomial in x and y, so the tables of exponents are built
+once per k and a block of genomes is a few (genomes x k) @ (k x 4^k/2)
+products. Columns follow count_store.canonical_codes(k). The tables grow as
+4^k k^2, so k is limited to MAX_EXPECTED_K.
+"""
+from functools import lru_cache
+import numpy as np
+from scipy.stats import nbinom, poisson
+
+from common.count_store import canonical_codes, reverse_complement_codes
+
+# the overlap tables hold ~1.5 k^2 floats per canonical k-mer (630 MB at k=10),
+# and a block of 1024 genomes takes ~45 s at k=9
+MAX_EXPECTED_K = 10
+
+
+def gc_counts(codes, n):
+    """Number of C/G bases in each n-base 2-bit code."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    g = np.zeros(codes.shape, dtype=np.int64)
+    for i in range(n):
+        digit = (codes >> np.uint64(2 * i)) & np.uint64(3)
+        g += (digit == 1) | (digit == 2)
+    return g
+
+
+@lru_cache(maxsize=None)
+def spectrum_terms(k):
+    """
+    Exponent tables of the canonical k-mers: 'gc' (C/G count), 'mult' (1 for
+    palindromes, else 2) and 'overlaps', for d = 1..k-1 a (canonical k-mers,
+    k+d+1) array counting the ordered pairs of words of each k-mer that
+    overlap at shift d, by C/G count of the merged (k+d)-mer.
+    """
+    codes = canonical_codes(k)
+    rc = reverse_complement_codes(codes, k)
+    palindrome = codes == rc
+    gc = gc_counts(codes, k)
+    rows = np.arange(codes.size)
+    pairs = [(codes, codes, np.ones_like(palindrome)), (codes, rc, ~palindrome),
+             (rc, codes, ~palindrome), (rc, rc, ~palindrome)]
+    overlaps = []
+    for d in range(1, k):
+        keep = np.uint64((1 << 2 * (k - d)) - 1)
+        tail = np.uint64((1 << 2 * d) - 1)
+        table = np.zeros((codes.size, k + d + 1))
+        for u, v, ok in pairs:
+            hit = ok & ((u & keep) == (v >> np.uint64(2 * d)))
+            merged_gc = gc + gc_counts(v & tail, d)
+            np.add.at(table, (rows[hit], merged_gc[hit]), 1)
+        overlaps.append(table)
+    return {'gc': gc, 'mult': np.where(palindrome, 1.0, 2.0), 'overlaps': overlaps}
+
+
+def _monomials(gc, n):
+    """(genomes, n+1) array of x^a y^(n-a), a = 0..n."""
+    x, y = gc[:, None] / 2, (1 - gc[:, None]) / 2
+    a = np.arange(n + 1)
+    return x ** a * y ** (n - a)
+
+
+def _inputs(gc, length, k, n_records):
+    gc = np.atleast_1d(np.asarray(gc, dtype=float))
+    if np.any((gc < 0) | (gc > 1)):
+        raise ValueError("GC content must be a fraction in [0, 1]")
+    length = np.broadcast_to(np.asarray(length, dtype=float), gc.shape)
+    windows = np.maximum(length - np.asarray(n_records) * (k - 1), 0)
+    return gc, windows
+
+
+def canonical_probabilities(gc, k):
+    """(genomes, canonical k-mers) probability of a window being each canonical k-mer."""
+    terms = spectrum_terms(k)
+    gc = np.atleast_1d(np.asarray(gc, dtype=float))
+    return _monomials(gc, k)[:, terms['gc']] * terms['mult']
+
+
+def expected_counts(gc, length, k, n_records=1):
+    """
+    (genomes, canonical k-mers) expected counts for GC fractions and
+    lengths (bases; n_records sequences, k-1 fewer windows each).
+    """
+    gc, windows = _inputs(gc, length, k, n_records)
+    return windows[:, None] * canonical_probabilities(gc, k)
+
+
+def count_variances(gc, length, k, n_records=1):
+    """(genomes, canonical k-mers) variances of the counts, overlapping windows included."""
+    gc, windows = _inputs(gc, length, k, n_records)
+    terms = spectrum_terms(k)
+    p = canonical_probabilities(gc, k)
+    n = windows[:, None]
+    var = n * p - p ** 2 * ((2 * k - 1) * n - k * (k - 1))
+    for d, table in enumerate(terms['overlaps'], start=1):
+        var += 2 * np.maximum(n - d, 0) * (_monomials(gc, k + d) @ table.T)
+    return np.maximum(var, 0)
+
+
+@lru_cache(maxsize=None)
+def _groups(k):
+    """Column indices of the canonical k-mers sharing a mean (same C/G count and multiplicity)."""
+    terms = spectrum_terms(k)
+    key = terms['gc'] * 2 + (terms['mult'] == 1)
+    return [np.flatnonzero(key == g) for g in np.unique(key)]
+
+
+def _evaluate(method, mean, n, p, nb, x):
+    """(rows, points) ppf or cdf (`method`) of nbinom(n, p) for rows in nb, else Poisson(mean)."""
+    x = np.broadcast_to(x, (mean.size, np.shape(x)[-1]))
+    res = np.empty(x.shape)
+    res[nb] = getattr(nbinom, method)(x[nb], n[nb, None], p[nb, None])
+    res[~nb] = getattr(poisson, method)(x[~nb], mean[~nb, None])
+    return res
+
+
+def order_statistics(mean, var, m):
+    """
+    (genomes, m) approximate expected order statistics (descending) of m
+    counts with each genome's mean and variance: the quantiles at Blom's
+    plotting positions of a Poisson, or of a negative binomial when overlaps
+    make var > mean. Counts of 0 are k-mers expected to be unseen.
+
+    All genomes are done at once: each row's distribution is tabulated on
+    the integers between its extreme quantiles, and the number of positions
+    landing on each integer is a searchsorted of the cdf table into the
+    shared positions. Rows whose range is wider than m (large counts, few
+    k-mers) evaluate the ppf at their m positions instead.
+    """
+    mean = np.maximum(np.asarray(mean, dtype=float), 0)
+    var = np.asarray(var, dtype=float)
+    out = np.zeros((mean.size, m))
+    if m == 0:
+        return out
+    q = (np.arange(1, m + 1) - 0.375) / (m + 0.25)
+    nb = (mean > 0) & (var > mean * (1 + 1e-9))
+    n = np.ones_like(mean)
+    p = np.ones_like(mean)
+    n[nb] = mean[nb] ** 2 / (var[nb] - mean[nb])
+    p[nb] = mean[nb] / var[nb]
+
+    ends = _evaluate('ppf', mean, n, p, nb, q[[0, -1]])
+    width = (ends[:, 1] - ends[:, 0]).astype(np.int64) + 1
+    wide = width > m
+    if wide.any():
+        out[wide] = _evaluate('ppf', mean[wide], n[wide], p[wide], nb[wide], q)
+    rows = ~wide
+    if rows.any():
+        grid = ends[rows, :1] + np.arange(width[rows].max())
+        cdf = _evaluate('cdf', mean[rows], n[rows], p[rows], nb[rows], grid)
+        # positions at or below each grid value; a position takes the first
+        # grid value whose cdf reaches it
+        below = np.searchsorted(q, cdf, side='right')
+        below[:, -1] = m
+        hits = np.diff(below, axis=1, prepend=0)
+        out[rows] = np.repeat(grid.ravel(), hits.ravel()).reshape(-1, m)
+    return out[:, ::-1]
+
+
+def expected_rank_frequency(gc, length, k, n_records=1, spread=True):
+    """
+    (genomes, canonical k-mers) descending expected spectra, the rank-count
+    vectors fitted for shuffled genomes. The means alone tie within every
+    group of equal-composition k-mers; with spread=True each group is
+    replaced by its expected order statistics (order_statistics with the
+    group's mean variance), which are whole counts whose nonzero entries
+    number about the expected distinct k-mers, sum(1 - exp(-mean)). Rows
+    are zero-padded: drop the zeros, as count_store.rank_frequency does for
+    observed counts, before fitting. The spread costs one (genomes x quantile
+    range) cdf table and a searchsorted per group, on top of count_variances.
+    """
+    if k > MAX_EXPECTED_K:
+        raise ValueError(f"Expected spectra support k <= {MAX_EXPECTED_K}, got {k}")
+    mean = expected_counts(gc, length, k, n_records)
+    if spread:
+        var = count_variances(gc, length, k, n_records)
+        for cols in _groups(k):
+            mean[:, cols] = order_statistics(mean[:, cols[0]], var[:, cols].mean(axis=1),
+                                             cols.size)
+    return -np.sort(-np.maximum(mean, 0), axis=1)
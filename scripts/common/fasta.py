@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Lean FASTA reading for whole-genome scans.
+
+Bio.SeqIO builds a SeqRecord per record and the scripts then copied its
+sequence into str/bytes and upper-cased it, several copies of every
+multi-megabase record. Here the (optionally gzipped) file is read in large
+binary blocks, line breaks are dropped with bytes.translate while the
+record's sequence is appended to a bytearray, and the record is handed out
+as a uint8 array over that buffer. Upper-casing and 2-bit encoding are
+table lookups (bytes.translate in kmer_counting.encode_sequence).
+
+Gzip is decompressed with isal (python-isal) or zlib-ng when one of them is
+installed, and the standard gzip module otherwise.
+"""
+import numpy as np
+
+try:
+    from isal import igzip as _gzip
+    GZIP_BACKEND = 'isal'
+except ImportError:
+    try:
+        from zlib_ng import gzip_ng as _gzip
+        GZIP_BACKEND = 'zlib-ng'
+    except ImportError:
+        import gzip as _gzip
+        GZIP_BACKEND = 'gzip'
+
+from common.kmer_counting import encode_sequence
+
+READ_BLOCK = 1 << 22    # bytes per read
+LINE_WIDTH = 60         # SeqIO.write's line length
+_WHITESPACE = b'\r\n\t '
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord('a'):ord('z') + 1] -= 32
+
+
+def open_fasta(path, mode='rb', compressed=None):
+    """
+    Binary handle on a FASTA file ('rb' or 'wb'), through gzip for .gz paths
+    (or as `compressed` says, e.g. for temporary output names).
+    """
+    if compressed is None:
+        compressed = str(path).endswith('.gz')
+    if compressed:
+        return _gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _iter_records(path, block_size):
+    """Yield (header, bytearray of the sequence without line breaks) for every record."""
+    header = None
+    seq = None
+    tail = b''          # incomplete header line carried to the next block
+    in_header = False
+    with open_fasta(path) as handle:
+        while True:
+            block = handle.read(block_size)
+            if not block:
+                break
+            data = tail + block if tail else block
+            tail = b''
+            start = 0
+            while start < len(data):
+                if in_header:
+                    nl = data.find(b'\n', start)
+                    if nl < 0:
+                        tail = data[start:]
+                        break
+                    header = data[start:nl].decode().rstrip('\r')
+                    seq = bytearray()
+                    in_header = False
+                    start = nl + 1
+                    continue
+                gt = data.find(b'>', start)
+                stop = len(data) if gt < 0 else gt
+                if seq is not None:
+                    seq += data[start:stop].translate(None, _WHITESPACE)
+                if gt < 0:
+                    break
+                if header is not None:
+                    yield header, seq
+                header, seq = None, None
+                in_header = True
+                start = gt + 1
+        if in_header and tail:
+            header, seq = tail.decode().rstrip('\r\n'), bytearray()
+        if header is not None:
+            yield header, seq
+
+
+def iter_fasta(path, block_size=READ_BLOCK):
+    """
+    Yield (header, sequence) for every record: the header line without '>'
+    (str) and the sequence as a uint8 array without line breaks, in its
+    original case. Each record gets a fresh buffer, so arrays can be kept.
+    """
+    for header, seq in _iter_records(path, block_size):
+        yield header, np.frombuffer(seq, dtype=np.uint8)
+
+
+def iter_encoded(path, block_size=READ_BLOCK):
+    """Yield (header, 2-bit encoded sequence) for every record (see encode_sequence)."""
+    for header, seq in _iter_records(path, block_size):
+        yield header, encode_sequence(seq)
+
+
+def read_encoded(path):
+    """List of the 2-bit encoded records of a genome."""
+    return [encoded for _, encoded in iter_encoded(path)]
+
+
+def upper(seq):
+    """Upper-cased copy of a uint8 sequence array."""
+    return _UPPER[seq]
+
+
+def record_id(header):
+    """First word of a header line, SeqRecord.id's rule."""
+    return header.split(None, 1)[0] if header.strip() else ''
+
+
+def format_sequence(seq, width=LINE_WIDTH):
+    """Bytes of a uint8 sequence wrapped at `width` characters, ending in a newline."""
+    seq = np.asarray(seq, dtype=np.uint8)
+    full = seq.size // width * width
+    lines = np.empty((seq.size // width, width + 1), dtype=np.uint8)
+    lines[:, :width] = seq[:full].reshape(-1, width)
+    lines[:, width] = ord('\n')
+    out = lines.tobytes()
+    if full < seq.size:
+        out += seq[full:].tobytes() + b'\n'
+    return out
+
+
+def write_fasta_record(handle, header, seq, width=LINE_WIDTH):
+    """Write one record ('>' header line, then the wrapped sequence) to a binary handle."""
+    handle.write(b'>' + header.encode() + b'\n')
+    handle.write(format_sequence(seq, width))
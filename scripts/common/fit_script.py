@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Shared driver of the single-model fit scripts (fit_zipf_mandelbrot.py,
+fit_truncated_powerlaw.py).
+
+Each script only names its model (a key of batch_fit.MODELS), the model
+function curve_fit is called with, and its output file; the count-file
+reading, the curve_fit and --batch paths, the starting points
+(batch_fit.starting_params, with --warm-start candidates from
+batch_fit.warm_start_candidates), the results store and the nfev report
+live here, so the scripts stay in sync with each other and with
+fit_models.py, which fits the same models through common/model_registry.py.
+"""
+import os
+import sys
+import argparse
+from functools import partial
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+from common.batch_fit import (MODELS, stack_rank_frequencies, fit_batch, fit_statistics,
+                              starting_params, genome_key, read_fit_results, read_groups,
+                              warm_start_candidates, parse_result_line)
+from common.executor import (load_work_list, run_tasks, add_executor_args, file_size,
+                             atomic_path)
+from common.kmer_counting import read_rank_counts
+from common.results_store import write_results, results_frame
+
+
+def format_result(name, model, params, stats, nfev):
+    """Results line 'name: <param>=... R2=... AIC=... nfev=...'."""
+    fields = [f" {p}={v:.6g}" for p, v in zip(MODELS[model]['params'], params)]
+    return (f"{name}:" + "".join(fields) +
+            f" R2={stats['R2']:.4g} AIC={stats['AIC']:.4g} nfev={nfev}\n")
+
+
+def fit_file(filepath, model, func, init='fixed', warm=None):
+    """
+    Fit one rank-sorted count file with curve_fit and return its results
+    line. init/warm choose the starting point (see batch_fit.starting_params).
+    """
+    try:
+        counts = read_rank_counts(filepath)
+    except FileNotFoundError:
+        return f"{os.path.basename(filepath)}: FileNotFound\n"
+    if len(counts) == 0:
+        return ""
+
+    ranks, freqs, mask = stack_rank_frequencies([counts])
+    initial_guess = starting_params(model, ranks, freqs, mask, init,
+                                    None if warm is None else [warm])[0]
+    try:
+        popt, _, info, _, _ = curve_fit(func, ranks, freqs[0], p0=initial_guess,
+                                        bounds=(0, np.inf), method='trf',
+                                        max_nfev=1000000, full_output=True)
+    except RuntimeError as e:
+        return f"{os.path.basename(filepath)}: FitError={str(e)}\n"
+
+    pred = func(ranks, *popt)
+    stats = fit_statistics(freqs, pred[None, :], mask, len(popt))
+    return format_result(os.path.basename(filepath), model, popt,
+                         {key: stats[key][0] for key in ('R2', 'AIC')}, info['nfev'])
+
+
+def fit_task(task, model, func, init='fixed'):
+    """fit_file on a (filepath, warm-start candidates) pair."""
+    filepath, warm = task
+    return fit_file(filepath, model, func, init, warm)
+
+
+def fit_files_batch(tasks, model, init='fixed'):
+    """
+    Fit a block of (filepath, warm-start candidates) tasks together with the
+    vectorised fitter and return their results lines, in order.
+    """
+    filepaths = [filepath for filepath, _ in tasks]
+    lines = [None] * len(filepaths)
+    vectors, rows = [], []
+    for i, filepath in enumerate(filepaths):
+        try:
+            counts = read_rank_counts(filepath)
+        except FileNotFoundError:
+            lines[i] = f"{os.path.basename(filepath)}: FileNotFound\n"
+            continue
+        if len(counts) == 0:
+            lines[i] = ""
+            continue
+        vectors.append(counts)
+        rows.append(i)
+
+    if vectors:
+        ranks, freqs, mask = stack_rank_frequencies(vectors)
+        warm = [tasks[i][1] for i in rows]
+        p0 = starting_params(model, ranks, freqs, mask, init,
+                             None if all(w is None for w in warm) else
+                             [w if w is not None else () for w in warm])
+        res = fit_batch(model, ranks, freqs, mask, p0=p0)
+        for j, i in enumerate(rows):
+            name = os.path.basename(filepaths[i])
+            if not res['converged'][j]:
+                lines[i] = f"{name}: FitError=fit did not converge\n"
+                continue
+            stats = {'R2': res['R2'][j], 'AIC': res['AIC'][j]}
+            lines[i] = format_result(name, model, res['params'][j], stats, res['nfev'][j])
+    return lines
+
+
+def fit_parser(script):
+    """Command line shared by the single-model fit scripts."""
+    p = argparse.ArgumentParser(
+        usage=f"python {script} <bucket_id> <scheduler_file.json> [--batch] [--workers N]")
+    p.add_argument('bucket_id', help="Bucket to fit, or 'all' for every bucket")
+    p.add_argument('scheduler_file', help="Scheduler JSON, or a plain list of count files")
+    p.add_argument('--batch', action='store_true',
+                   help="Fit blocks of files together with the vectorised fitter instead of "
+                        "one curve_fit call per file")
+    p.add_argument('--batch-size', type=int, default=1024,
+                   help="Files per block in --batch mode (default: 1024)")
+    p.add_argument('--init', choices=('fixed', 'auto'), default='fixed',
+                   help="Starting point: the fixed p0 used so far, or a closed-form estimate "
+                        "(log-log OLS for alpha and scale, grid for the second parameter); "
+                        "curve_fit can still stop in a different local minimum, --batch is more robust")
+    p.add_argument('--warm-start', default=None,
+                   help="Results file of an earlier run (e.g. at k-1) whose fits are tried as starts")
+    p.add_argument('--warm-start-ratio', type=float, default=4.0,
+                   help="Rank ratio between this k and the --warm-start fits (4 for k-1, 1 for the same k)")
+    p.add_argument('--groups', default=None,
+                   help="Tab-separated genome<TAB>taxon file; the taxon median of the "
+                        "--warm-start fits is tried as a start too")
+    p.add_argument('--results-store', default=None,
+                   help="Also write the results to this columnar store (see common/results_store.py)")
+    p.add_argument('--k', type=int, default=None, help="k of the fitted counts, for --results-store")
+    add_executor_args(p)
+    return p
+
+
+def run_fit_script(model, func, output_name, script, argv=None):
+    """
+    main() of a single-model fit script: fit every count file of a bucket
+    and write output_name.format(bucket=...) (plus the results store part).
+    """
+    args = fit_parser(script).parse_args(argv)
+    if args.results_store and args.k is None:
+        sys.exit("--results-store needs --k")
+
+    bucket_id_str = args.bucket_id
+    try:
+        file_list = load_work_list(args.scheduler_file, bucket_id_str)
+    except KeyError:
+        print(f"No entry found in JSON for bucket_id='{bucket_id_str}'")
+        sys.exit(0)
+
+    if not file_list:
+        print(f"No files listed for bucket {bucket_id_str}")
+        sys.exit(0)
+
+    out_filename = output_name.format(bucket=bucket_id_str)
+    warm = [None] * len(file_list)
+    if args.warm_start:
+        fits = read_fit_results(args.warm_start, model)
+        groups = read_groups(args.groups) if args.groups else None
+        warm = warm_start_candidates(model, [genome_key(f) for f in file_list], fits, groups,
+                                     args.warm_start_ratio)
+    tasks = list(zip(file_list, warm))
+
+    if args.batch:
+        blocks = [tasks[i:i + args.batch_size]
+                  for i in range(0, len(tasks), args.batch_size)]
+        results = run_tasks(partial(fit_files_batch, model=model, init=args.init), blocks,
+                            args.workers, args.retries, sizes=[len(b) for b in blocks])
+        lines = [line for block, res in zip(blocks, results)
+                 for line in (res if res is not None else [None] * len(block))]
+    else:
+        lines = run_tasks(partial(fit_task, model=model, func=func, init=args.init), tasks,
+                          args.workers, args.retries, sizes=[file_size(f) for f in file_list])
+    lines = [line if line is not None else f"{os.path.basename(filepath)}: FitError=worker failed\n"
+             for filepath, line in zip(file_list, lines)]
+    with atomic_path(out_filename) as tmp:
+        with open(tmp, 'w') as out_f:
+            out_f.writelines(lines)
+    if args.results_store:
+        path = write_results(args.results_store, model, args.k, results_frame(lines),
+                             part=bucket_id_str)
+        print(f"Results table written to: {path}")
+
+    nfev = [parse_result_line(line)[1].get('nfev') for line in lines if line]
+    nfev = [n for n in nfev if isinstance(n, float)]
+    if nfev:
+        print(f"Function evaluations per fit: median {np.median(nfev):.0f}, "
+              f"mean {np.mean(nfev):.1f}, max {max(nfev):.0f}")
+    print(f"Done. Results saved to: {out_filename}")
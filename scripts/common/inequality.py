@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Inequality summaries of one k-mer count vector: Gini coefficient, Shannon
+entropy and a Lorenz curve down-sampled to a fixed number of points.
+
+create_kmers.py computes them for every genome and k while the counts are
+in memory (over all canonical k-mers, unseen ones as zeros) and writes a
+kmer_summary_<bucket>.tsv table, so the global-pattern figures and
+correlations with the model fits need not re-read the count files.
+"""
+import numpy as np
+import pandas as pd
+
+LORENZ_POINTS = 256
+SUMMARY_COLUMNS = ['genome', 'k', 'total', 'distinct', 'gini', 'entropy']
+
+
+def gini(counts):
+    """counts: non-negative 1D array -> Gini in [0, 1], NaN if no data"""
+    x = np.sort(np.asarray(counts, dtype=float))
+    n = x.size
+    if n == 0 or x.sum() <= 0:
+        return np.nan
+    return (2.0 * np.sum(np.arange(1, n + 1) * x) / (n * x.sum())) - (n + 1) / n
+
+
+def entropy(counts):
+    """Shannon entropy (bits) of the k-mer frequency distribution."""
+    x = np.asarray(counts, dtype=float)
+    x = x[x > 0]
+    if x.size == 0:
+        return np.nan
+    p = x / x.sum()
+    return float(-(p * np.log2(p)).sum())
+
+
+def lorenz_curve(counts, points=LORENZ_POINTS):
+    """
+    Cumulative share of the total count held by the poorest fraction f of
+    k-mers, at f = 0, 1/(points-1), ..., 1 (linear between k-mers).
+    """
+    x = np.sort(np.asarray(counts, dtype=float))
+    if x.size == 0 or x.sum() <= 0:
+        return np.full(points, np.nan)
+    share = np.concatenate(([0.0], np.cumsum(x) / x.sum()))
+    population = np.arange(x.size + 1) / x.size
+    return np.interp(np.linspace(0, 1, points), population, share)
+
+
+def summarize_counts(counts, points=LORENZ_POINTS):
+    """Summary dict (total, distinct, gini, entropy, lorenz) of one count vector."""
+    counts = np.asarray(counts)
+    return {
+        'total': int(counts.sum()),
+        'distinct': int(np.count_nonzero(counts)),
+        'gini': gini(counts),
+        'entropy': entropy(counts),
+        'lorenz': lorenz_curve(counts, points),
+    }
+
+
+def summarize_histogram(values, n, points=LORENZ_POINTS):
+    """
+    summarize_counts of the vector holding n[i] k-mers of count values[i]
+    (values ascending, zeros included), for vocabularies too large to
+    expand. Within a group of equal counts the sorted sums and the Lorenz
+    curve are linear, so the result is the same.
+    """
+    values = np.asarray(values, dtype=float)
+    n = np.asarray(n, dtype=float)
+    size, total = n.sum(), (values * n).sum()
+    summary = {'total': int(round(total)), 'distinct': int(n[values > 0].sum())}
+    if size == 0 or total <= 0:
+        summary.update(gini=np.nan, entropy=np.nan, lorenz=np.full(points, np.nan))
+        return summary
+    before = np.cumsum(n) - n
+    # sum of i * x_i over sorted x, i = before+1 .. before+n within each group
+    weighted = (values * n * (2 * before + n + 1) / 2).sum()
+    summary['gini'] = 2.0 * weighted / (size * total) - (size + 1) / size
+    p = values[values > 0] / total
+    summary['entropy'] = float(-(n[values > 0] * p * np.log2(p)).sum())
+    share = np.concatenate(([0.0], np.cumsum(values * n) / total))
+    population = np.concatenate(([0.0], np.cumsum(n) / size))
+    summary['lorenz'] = np.interp(np.linspace(0, 1, points), population, share)
+    return summary
+
+
+def lorenz_columns(points=LORENZ_POINTS):
+    return [f"lorenz_{i:03d}" for i in range(points)]
+
+
+def write_summaries(path, rows, points=LORENZ_POINTS):
+    """
+    Tab-separated summary table, one row per (genome, k): SUMMARY_COLUMNS
+    then the Lorenz curve as lorenz_000 ... lorenz_<points-1>.
+    """
+    with open(path, 'w') as out:
+        out.write("\t".join(SUMMARY_COLUMNS + lorenz_columns(points)) + "\n")
+        for genome, k, s in rows:
+            fields = [genome, str(k), str(s['total']), str(s['distinct']),
+                      f"{s['gini']:.6g}", f"{s['entropy']:.6g}"]
+            fields += [f"{v:.6g}" for v in s['lorenz']]
+            out.write("\t".join(fields) + "\n")
+
+
+def read_summaries(paths, lorenz=True):
+    """DataFrame of one or more summary tables (Lorenz columns dropped unless asked for)."""
+    if isinstance(paths, str):
+        paths = [paths]
+    usecols = None if lorenz else SUMMARY_COLUMNS
+    frames = [pd.read_csv(p, sep='\t', usecols=usecols) for p in paths]
+    if not frames:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    # one block per dtype, so callers can add columns cheaply
+    return pd.concat(frames, ignore_index=True).copy()
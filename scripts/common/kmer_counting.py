@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Vectorised 2-bit k-mer counting.
+
+Sequences are encoded as uint8 arrays (A=0, C=1, G=2, T=3, anything else=4).
+Forward and reverse-complement k-mer codes are built for every window of a
+block at once with rolling 2-bit shifts, and the canonical k-mer is the
+smaller of the two codes. Since A < C < G < T both in ASCII and in the 2-bit
+alphabet, comparing codes picks the same canonical k-mer as comparing strings.
+"""
+import numpy as np
+
+INVALID = 4
+CHUNK_SIZE = 1 << 22    # windows per vectorised block
+MAX_DENSE_K = 13        # 4**13 counts + first-seen positions ~ 1 GiB
+RANKS_SUFFIX = '.npy'   # ranks-only count files
+
+_UNSEEN = np.iinfo(np.int64).max
+_ALPHABET = np.frombuffer(b"ACGT", dtype=np.uint8)
+_LOOKUP = np.full(256, INVALID, dtype=np.uint8)
+for _code, _base in enumerate("ACGT"):
+    _LOOKUP[ord(_base)] = _code
+    _LOOKUP[ord(_base.lower())] = _code
+_TRANSLATE = _LOOKUP.tobytes()
+
+
+def parse_k_values(text):
+    """Parse '6', '3-8' or '3,5,7' (or a mix, e.g. '3-5,8') into sorted ks."""
+    ks = set()
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            ks.update(range(int(lo), int(hi) + 1))
+        elif part:
+            ks.add(int(part))
+    if not ks or min(ks) < 1:
+        raise ValueError(f"Invalid k specification: {text!r}")
+    return sorted(ks)
+
+
+def code_dtype(k):
+    """Smallest unsigned dtype that holds a 2-bit packed k-mer."""
+    if k > 32:
+        raise ValueError(f"k must be <= 32 for 2-bit codes, got {k}")
+    return np.uint32 if k <= 16 else np.uint64
+
+
+def encode_sequence(seq):
+    """Map a DNA sequence (str, bytes or uint8 array) to 2-bit codes; non-ACGT -> 4."""
+    if isinstance(seq, str):
+        seq = seq.encode("ascii")
+    if isinstance(seq, (bytes, bytearray, memoryview)):
+        # bytes.translate is several times faster than the numpy gather
+        return np.frombuffer(bytearray(seq).translate(_TRANSLATE), dtype=np.uint8)
+    return _LOOKUP[np.asarray(seq, dtype=np.uint8)]
+
+
+def _window_codes(base, comp, k):
+    """
+    Forward and reverse-complement codes of every k-window. Codes of
+    power-of-two windows are built by doubling and then concatenated
+    following the binary expansion of k, so only ~2*log2(k) passes are made.
+    """
+    scalar = base.dtype.type
+    fwd_p, rc_p, span = base, comp, 1
+    fwd = rc = None
+    length = 0
+    while True:
+        if k & span:
+            if fwd is None:
+                fwd, rc, length = fwd_p, rc_p, span
+            else:
+                n = fwd.size - span
+                fwd = fwd[:n] << scalar(2 * span)
+                fwd |= fwd_p[length:length + n]
+                new_rc = rc_p[length:length + n] << scalar(2 * length)
+                new_rc |= rc[:n]
+                rc = new_rc
+                length += span
+        if 2 * span > k:
+            return fwd, rc
+        new_fwd = fwd_p[:-span] << scalar(2 * span)
+        new_fwd |= fwd_p[span:]
+        new_rc = rc_p[span:] << scalar(2 * span)
+        new_rc |= rc_p[:-span]
+        fwd_p, rc_p = new_fwd, new_rc
+        span *= 2
+
+
+def canonical_codes(encoded, k):
+    """
+    Return (codes, positions) of the canonical k-mers of every ACGT-only
+    window in an encoded block. Positions are window offsets in the block;
+    they are None when every window is valid (codes[i] is window i).
+    """
+    n = encoded.size - k + 1
+    dtype = code_dtype(k)
+    if n <= 0:
+        return np.empty(0, dtype=dtype), None
+
+    bad = encoded == INVALID
+    has_bad = bad.any()
+    base = (np.where(bad, 0, encoded) if has_bad else encoded).astype(dtype)
+    fwd, rc = _window_codes(base, dtype(3) - base, k)
+    canon = np.minimum(fwd, rc, out=fwd)
+    if not has_bad:
+        return canon, None
+
+    bad_cs = np.zeros(encoded.size + 1, dtype=np.int64)
+    np.cumsum(bad, out=bad_cs[1:])
+    valid = bad_cs[k:] == bad_cs[:n]
+    return canon[valid], np.flatnonzero(valid)
+
+
+def count_valid_windows(encoded, k):
+    """Number of ACGT-only k-windows, from the lengths of the runs between N's."""
+    bad = np.flatnonzero(encoded == INVALID)
+    bounds = np.concatenate(([-1], bad, [encoded.size]))
+    runs = np.diff(bounds) - 1
+    return int(np.maximum(runs - k + 1, 0).sum())
+
+
+def iter_canonical_codes(encoded, k, chunk_size=CHUNK_SIZE):
+    """
+    Yield (codes, positions, start) over a whole record in overlapping
+    blocks; positions are relative to the block starting at window `start`.
+    """
+    n_windows = encoded.size - k + 1
+    for start in range(0, max(n_windows, 0), chunk_size):
+        stop = min(start + chunk_size, n_windows)
+        codes, pos = canonical_codes(encoded[start:stop + k - 1], k)
+        yield codes, pos, start
+
+
+def new_kmer_table(k, first_seen=True):
+    """
+    Dense count table over all 4**k codes, plus first-seen window order
+    (None with first_seen=False, for callers that only need the counts).
+    """
+    if k > MAX_DENSE_K:
+        raise ValueError(f"Dense counting supports k <= {MAX_DENSE_K}, got {k}")
+    return {
+        'k': k,
+        'counts': np.zeros(4 ** k, dtype=np.int64),
+        'first_seen': np.full(4 ** k, _UNSEEN, dtype=np.int64) if first_seen else None,
+        'offset': 0,
+    }
+
+
+def add_codes(counts, codes):
+    """Add one to counts[c] for every code c."""
+    if counts.size <= 4 * codes.size:
+        counts += np.bincount(codes, minlength=counts.size)
+    else:
+        uniq, n = np.unique(codes, return_counts=True)
+        counts[uniq] += n
+
+
+def record_first_seen(first_seen, codes, pos, offset, block=1 << 16):
+    """
+    Store the smallest position of every code not seen before. Works in
+    sub-blocks so that, once the vocabulary saturates, later windows only
+    cost a gather.
+    """
+    for start in range(0, codes.size, block):
+        sub = codes[start:start + block]
+        unseen = first_seen[sub] == _UNSEEN
+        if not unseen.any():
+            continue
+        if pos is None:
+            where = np.flatnonzero(unseen) + (offset + start)
+        else:
+            where = pos[start:start + block][unseen] + offset
+        np.minimum.at(first_seen, sub[unseen], where)
+
+
+def update_kmer_table(table, encoded):
+    """Count every canonical k-mer of one encoded record into the table."""
+    k = table['k']
+    for codes, pos, start in iter_canonical_codes(encoded, k):
+        add_codes(table['counts'], codes)
+        if table['first_seen'] is not None:
+            record_first_seen(table['first_seen'], codes, pos, table['offset'] + start)
+    table['offset'] += max(encoded.size - k + 1, 0)
+
+
+def update_kmer_tables(tables, encoded):
+    """Count one encoded record into the tables of several k at once."""
+    for table in tables:
+        update_kmer_table(table, encoded)
+
+
+def _check_top(top):
+    if top is not None and top < 1:
+        raise ValueError(f"top must be >= 1, got {top}")
+
+
+def rank_order(counts, first_seen=None, top=None):
+    """
+    Codes of the observed k-mers by descending count, ties by first_seen
+    (when given). With `top`, only the first `top` ranks: the top-th
+    largest count is found with a linear-time partition and only the
+    k-mers at or above it are sorted.
+    """
+    _check_top(top)
+    present = np.flatnonzero(counts)
+    c = counts[present]
+    if top is not None and top < present.size:
+        kth = present.size - top
+        threshold = np.partition(c, kth)[kth]
+        keep = c >= threshold
+        present, c = present[keep], c[keep]
+    keys = (-c,) if first_seen is None else (first_seen[present], -c)
+    return present[np.lexsort(keys)[:top]]
+
+
+def ranked_counts(counts, top=None):
+    """Descending nonzero counts (the first `top` only, via a partition), without codes."""
+    _check_top(top)
+    c = counts[counts > 0]
+    if top is not None and top < c.size:
+        c = np.partition(c, c.size - top)[c.size - top:]
+    return np.sort(c)[::-1]
+
+
+def ranked_kmers(table, top=None):
+    """
+    Codes and counts of every observed k-mer (or of the `top` most frequent),
+    by descending count. Ties keep the order in which the k-mers were first
+    seen, like a stable sort of an insertion-ordered dict.
+    """
+    counts = table['counts']
+    codes = rank_order(counts, table['first_seen'], top)
+    return codes, counts[codes]
+
+
+def decode_kmers(codes, k):
+    """Turn integer codes back into k-mer strings."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    digits = (codes[:, None] >> shifts) & np.uint64(3)
+    chars = np.ascontiguousarray(_ALPHABET[digits])
+    return chars.view(f"S{k}").ravel().astype(f"U{k}")
+
+
+def write_kmer_counts(path, codes, counts, k):
+    """Write the '#kmer<TAB>count' file consumed by the fitting scripts."""
+    write_kmer_blocks(path, [(codes, counts)], k)
+
+
+def write_kmer_blocks(path, blocks, k, step=1 << 16):
+    """
+    write_kmer_counts from an iterable of (codes, counts) blocks, in order;
+    decoded `step` k-mers at a time (decoding takes 8*k bytes per k-mer).
+    """
+    with open(path, 'w') as out_f:
+        out_f.write("#kmer\tcount\n")
+        for codes, counts in blocks:
+            for start in range(0, len(codes), step):
+                kmers = decode_kmers(codes[start:start + step], k)
+                out_f.writelines(
+                    f"{kmer}\t{count}\n"
+                    for kmer, count in zip(kmers.tolist(), counts[start:start + step].tolist())
+                )
+
+
+def write_rank_counts(path, counts):
+    """
+    Ranks-only output: the rank-ordered count vector alone as a .npy array
+    (uint32 when the counts fit), all the fitters need, without k-mer strings.
+    """
+    counts = np.asarray(counts)
+    dtype = np.uint32 if counts.size == 0 or counts.max() <= np.iinfo(np.uint32).max else np.int64
+    with open(path, 'wb') as f:
+        np.save(f, counts.astype(dtype))
+
+
+def read_rank_counts(path):
+    """
+    Rank-ordered counts (float) of a ranks-only .npy file or of a
+    '#kmer<TAB>count' text file (in file order; malformed lines skipped).
+    """
+    if str(path).endswith(RANKS_SUFFIX):
+        return np.load(path).astype(float)
+    counts = []
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            if len(parts) != 2:
+                continue
+            try:
+                counts.append(float(parts[1]))
+            except ValueError:
+                continue
+    return np.array(counts, dtype=float)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Registry of rank-frequency models evaluated by model_fits/fit_models.py.
+
+Every entry takes a block of stacked frequency vectors (see
+batch_fit.stack_rank_frequencies) and returns per-row arrays: its
+parameters plus R2, AIC, BIC, RMSE and nfev. New models are added with
+the register_model decorator; all of them see the same parsed vectors, so
+the counts are read once however many models are compared.
+"""
+import numpy as np
+
+from common.batch_fit import fit_batch, fit_statistics, starting_params, stack_rank_frequencies
+
+FIT_MODELS = {}
+STAT_COLUMNS = ('R2', 'AIC', 'BIC', 'RMSE', 'nfev')
+
+
+def register_model(name, params):
+    """Decorator adding fn(ranks, freqs, mask, **options) to FIT_MODELS."""
+    def decorator(fn):
+        FIT_MODELS[name] = {'params': tuple(params), 'evaluate': fn}
+        return fn
+    return decorator
+
+
+def model_columns(names):
+    """Output column names, '<model>_<param>' and '<model>_<stat>', in order."""
+    return [f"{name}_{col}" for name in names
+            for col in FIT_MODELS[name]['params'] + STAT_COLUMNS]
+
+
+@register_model('zipf', ('scale',))
+def evaluate_zipf(ranks, freqs, mask, **options):
+    """Plain Zipf, f(r) = f(1) / r; nothing is fitted (one parameter)."""
+    scale = freqs[:, 0].copy()
+    pred = scale[:, None] / ranks
+    stats = fit_statistics(freqs, pred, mask, 1)
+    stats.update(params=scale[:, None], nfev=np.ones(freqs.shape[0], dtype=np.int64))
+    return stats
+
+
+def _evaluate_batch(model, ranks, freqs, mask, init='auto', warm=None):
+    p0 = starting_params(model, ranks, freqs, mask, init, warm)
+    return fit_batch(model, ranks, freqs, mask, p0=p0)
+
+
+@register_model('zipf_mandelbrot', ('alpha', 'beta', 'scale'))
+def evaluate_zipf_mandelbrot(ranks, freqs, mask, **options):
+    """f(r) = scale * (r + beta) ** (-alpha), fitted with batch_fit."""
+    return _evaluate_batch('zipf_mandelbrot', ranks, freqs, mask, **options)
+
+
+@register_model('truncated_power_law', ('alpha', 'lambda', 'scale'))
+def evaluate_truncated_power_law(ranks, freqs, mask, **options):
+    """f(r) = scale * r ** (-alpha) * exp(-lambda * r), fitted with batch_fit."""
+    return _evaluate_batch('truncated_power_law', ranks, freqs, mask, **options)
+
+
+def evaluate_models(names, vectors, **options):
+    """
+    Stack the rank-ordered count vectors once and evaluate every named
+    model on them; returns one row of values per vector, in
+    model_columns(names) order (failed fits give NaN parameters).
+    """
+    ranks, freqs, mask = stack_rank_frequencies(vectors)
+    rows = np.full((len(vectors), len(model_columns(names))), np.nan)
+    col = 0
+    for name in names:
+        entry = FIT_MODELS[name]
+        res = entry['evaluate'](ranks, freqs, mask, **options)
+        params = np.asarray(res['params'], dtype=float)
+        if 'converged' in res:
+            params = np.where(res['converged'][:, None], params, np.nan)
+        n_par = len(entry['params'])
+        rows[:, col:col + n_par] = params
+        col += n_par
+        for stat in STAT_COLUMNS:
+            rows[:, col] = res[stat]
+            col += 1
+    return rows
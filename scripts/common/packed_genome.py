@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+One-time 2-bit packed copy of a genome, read by memory mapping.
+
+Every k-sweep pass used to gunzip and parse the same .fna.gz again. A
+genome is converted once (preprocessing/pack_genomes.py) to a
+'<genome>.packed' file:
+
+  bytes 0-63     magic, offset and length of the JSON index
+  data           each contig packed 4 bases per byte (A=0 C=1 G=2 T=3, first
+                 base in the high bits), starting on a byte boundary
+  runs           int64 rows (contig, start, end) of every run of non-ACGT
+                 bases, which are stored as A in the data
+  index          JSON: source file size/mtime, contig headers, lengths and
+                 byte offsets, position of the runs table
+
+A contig is unpacked with one table lookup over its bytes (4 bases per
+byte from the page cache) and its N runs are written back as 4, giving the
+same arrays as fasta.iter_encoded. Soft-masking case and IUPAC codes are
+not kept; everything outside ACGT becomes N.
+"""
+import os
+import json
+import struct
+import numpy as np
+
+from common.executor import atomic_path
+from common.fasta import iter_encoded
+from common.kmer_counting import INVALID
+
+PACKED_SUFFIX = '.packed'
+MAGIC = b'KMPACK01'
+_PREAMBLE = struct.Struct('<8sQQ')
+DATA_OFFSET = 64
+_UNPACK = np.array([[(b >> s) & 3 for s in (6, 4, 2, 0)] for b in range(256)], dtype=np.uint8)
+_LETTERS = np.frombuffer(b'ACGTN', dtype=np.uint8)
+
+
+def pack_bases(encoded):
+    """4-bases-per-byte packing of a 2-bit encoded record (non-ACGT packed as A)."""
+    n = encoded.size
+    padded = np.zeros(-(-n // 4) * 4, dtype=np.uint8)
+    padded[:n] = encoded
+    padded[:n][encoded == INVALID] = 0
+    q = padded.reshape(-1, 4)
+    packed = q[:, 0] << 6
+    packed |= q[:, 1] << 4
+    packed |= q[:, 2] << 2
+    packed |= q[:, 3]
+    return packed
+
+
+def invalid_runs(encoded):
+    """(starts, ends) of the runs of non-ACGT bases of an encoded record."""
+    bad = np.zeros(encoded.size + 2, dtype=np.int8)
+    bad[1:-1] = encoded == INVALID
+    edges = np.diff(bad)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def decode(encoded):
+    """ACGTN letters (uint8) of an encoded record."""
+    return _LETTERS[encoded]
+
+
+def write_packed_genome(fasta_path, out_path):
+    """Pack a FASTA genome into out_path (written atomically). Returns the number of contigs."""
+    st = os.stat(fasta_path)
+    contigs, runs = [], []
+    with atomic_path(out_path) as tmp:
+        with open(tmp, 'wb') as out:
+            out.write(b'\0' * DATA_OFFSET)
+            offset = DATA_OFFSET
+            for i, (header, encoded) in enumerate(iter_encoded(fasta_path)):
+                packed = pack_bases(encoded)
+                out.write(packed.tobytes())
+                contigs.append([header, int(encoded.size), offset])
+                offset += packed.size
+                starts, ends = invalid_runs(encoded)
+                if starts.size:
+                    runs.append(np.column_stack([np.full(starts.size, i), starts, ends]))
+            runs_offset = -(-offset // 8) * 8
+            out.write(b'\0' * (runs_offset - offset))
+            table = np.concatenate(runs) if runs else np.empty((0, 3))
+            out.write(table.astype('<i8').tobytes())
+            index = json.dumps({
+                'source': os.path.basename(fasta_path),
+                'source_size': st.st_size,
+                'source_mtime_ns': st.st_mtime_ns,
+                'contigs': contigs,
+                'runs_offset': runs_offset,
+                'n_runs': int(table.shape[0]),
+            }).encode()
+            index_offset = runs_offset + table.shape[0] * 24
+            out.write(index)
+            out.seek(0)
+            out.write(_PREAMBLE.pack(MAGIC, index_offset, len(index)))
+    return len(contigs)
+
+
+class PackedGenome:
+    """Memory-mapped packed genome: contig headers and lengths, encoded contigs on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, index_offset, index_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a packed genome")
+            f.seek(index_offset)
+            self.index = json.loads(f.read(index_length))
+        self.headers = [c[0] for c in self.index['contigs']]
+        self.lengths = [c[1] for c in self.index['contigs']]
+        self._offsets = [c[2] for c in self.index['contigs']]
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        n_runs = self.index['n_runs']
+        runs_offset = self.index['runs_offset']
+        self.runs = np.frombuffer(self._data[runs_offset:runs_offset + n_runs * 24].tobytes(),
+                                  dtype='<i8').reshape(n_runs, 3)
+
+    def __len__(self):
+        return len(self.headers)
+
+    @property
+    def total_bases(self):
+        return sum(self.lengths)
+
+    def matches(self, fasta_path):
+        """True when the packed file was made from fasta_path as it is now."""
+        st = os.stat(fasta_path)
+        return (self.index['source_size'] == st.st_size
+                and self.index['source_mtime_ns'] == st.st_mtime_ns)
+
+    def encoded(self, i):
+        """2-bit encoded contig i (non-ACGT -> 4), as fasta.iter_encoded gives it."""
+        length, offset = self.lengths[i], self._offsets[i]
+        packed = self._data[offset:offset + -(-length // 4)]
+        seq = _UNPACK[packed].reshape(-1)[:length]
+        lo, hi = np.searchsorted(self.runs[:, 0], [i, i + 1])
+        for start, end in self.runs[lo:hi, 1:]:
+            seq[start:end] = INVALID
+        return seq
+
+    def __iter__(self):
+        """(header, encoded contig) in file order."""
+        for i, header in enumerate(self.headers):
+            yield header, self.encoded(i)
+
+
+def packed_path(fasta_path, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(fasta_path) + PACKED_SUFFIX)
+
+
+def genome_name(path):
+    """File name of the genome, without PACKED_SUFFIX for packed files."""
+    name = os.path.basename(path)
+    return name[:-len(PACKED_SUFFIX)] if name.endswith(PACKED_SUFFIX) else name
+
+
+def cached_genome(fasta_path, cache_dir):
+    """PackedGenome of fasta_path in cache_dir if there is an up-to-date one, else None."""
+    path = packed_path(fasta_path, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        genome = PackedGenome(path)
+    except (OSError, ValueError):
+        return None
+    return genome if genome.matches(fasta_path) else None
+
+
+def iter_genome(path, cache_dir=None):
+    """
+    Yield (header, encoded record) of a genome given as a FASTA or a .packed
+    file; a FASTA is read from its packed copy in cache_dir when that is
+    up to date.
+    """
+    if path.endswith(PACKED_SUFFIX):
+        yield from PackedGenome(path)
+        return
+    genome = cached_genome(path, cache_dir) if cache_dir else None
+    if genome is not None:
+        yield from genome
+    else:
+        yield from iter_encoded(path)
+
+
+def read_genome(path, cache_dir=None):
+    """List of the encoded records of a genome (see iter_genome)."""
+    return [encoded for _, encoded in iter_genome(path, cache_dir)]
+
+
+class StreamedGenome:
+    """
+    The encoded records of a genome, re-read on every iteration (see
+    iter_genome) so that only one record is in memory at a time; cheap to
+    re-read from a packed copy.
+    """
+
+    def __init__(self, path, cache_dir=None):
+        self.path = path
+        self.cache_dir = cache_dir
+
+    def __iter__(self):
+        return (encoded for _, encoded in iter_genome(self.path, self.cache_dir))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Per-rank quantile sketch for rank-sorted count vectors.
+
+Every rank keeps a log-bucketed histogram of the counts seen at that rank
+(the DDSketch mapping, Masson et al. 2019): a count v >= 1 goes to bucket
+ceil(log_gamma(v)) with gamma = (1 + a) / (1 - a), zeros to a bucket of
+their own, and any quantile read back is within relative error a of the
+true one. Histograms of different sketches just add, so workers can build
+partial sketches that are merged at the end, in any order, without ever
+holding the vectors. Memory is ranks x log(max count) / log(gamma) x 4 bytes.
+"""
+import math
+import numpy as np
+
+
+class RankQuantileSketch:
+    """Quantiles of the count at every rank over many vectors (relative error `rel_error`)."""
+
+    def __init__(self, rel_error=0.02):
+        if not 0 < rel_error < 1:
+            raise ValueError(f"Relative error must be in (0, 1), got {rel_error}")
+        self.rel_error = rel_error
+        self.gamma = (1 + rel_error) / (1 - rel_error)
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.hist = np.zeros((0, 1), dtype=np.uint32)   # column 0: zeros
+
+    def _grow(self, rows, cols):
+        r, c = self.hist.shape
+        if rows > r or cols > c:
+            hist = np.zeros((max(rows, r), max(cols, c)), dtype=np.uint32)
+            hist[:r, :c] = self.hist
+            self.hist = hist
+
+    def buckets(self, values):
+        """Histogram column of each value (0 for zeros, 1 + ceil(log_gamma(v)) otherwise)."""
+        values = np.asarray(values, dtype=float)
+        cols = np.zeros(values.shape, dtype=np.intp)
+        pos = values > 0
+        cols[pos] = 1 + np.maximum(np.ceil(np.log(values[pos]) / self._log_gamma - 1e-9), 0)
+        return cols
+
+    def add(self, vector):
+        """
+        Add one rank-ordered count vector. Ranks beyond its length count as
+        zeros, as in the mean/std accumulators.
+        """
+        cols = self.buckets(vector)
+        rows = self.hist.shape[0]
+        self._grow(max(cols.size, rows), int(cols.max(initial=0)) + 1)
+        # earlier (shorter) vectors had zeros at the ranks this one adds,
+        # and this one has zeros at the ranks it lacks
+        self.hist[rows:, 0] += np.uint32(self.count)
+        self.hist[np.arange(cols.size), cols] += np.uint32(1)
+        self.hist[cols.size:, 0] += np.uint32(1)
+        self.count += 1
+
+    def merge(self, other):
+        """Add another sketch of the same rel_error into this one."""
+        if other.rel_error != self.rel_error:
+            raise ValueError("Cannot merge sketches with different relative errors")
+        if other.count == 0:
+            return self
+        rows = max(self.hist.shape[0], other.hist.shape[0])
+        r_self, r_other = self.hist.shape[0], other.hist.shape[0]
+        self._grow(rows, other.hist.shape[1])
+        self.hist[:r_other, :other.hist.shape[1]] += other.hist
+        # rows only one side has are zeros for the vectors of the other side
+        self.hist[r_other:, 0] += np.uint32(other.count)
+        self.hist[r_self:rows, 0] += np.uint32(self.count)
+        self.count += other.count
+        return self
+
+    def bucket_values(self):
+        """Representative value of each histogram column."""
+        i = np.arange(self.hist.shape[1] - 1, dtype=float)
+        return np.concatenate([[0.0], 2 * self.gamma ** i / (self.gamma + 1)])
+
+    def quantiles(self, qs):
+        """(ranks, len(qs)) array of per-rank quantiles."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        cum = np.cumsum(self.hist, axis=1, dtype=np.int64)
+        values = self.bucket_values()
+        out = np.empty((self.hist.shape[0], qs.size))
+        for j, q in enumerate(qs):
+            target = np.floor(q * (self.count - 1)) + 1
+            col = (cum < target).sum(axis=1)
+            out[:, j] = values[np.minimum(col, values.size - 1)]
+        return out
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, hist=self.hist, count=self.count, rel_error=self.rel_error)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            sketch = cls(float(z['rel_error']))
+            sketch.hist = z['hist']
+            sketch.count = int(z['count'])
+        return sketch
+
+    @property
+    def nbytes(self):
+        return self.hist.nbytes
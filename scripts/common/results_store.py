@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Columnar store of model-fit results, partitioned by model and k:
+
+    <root>/model=<model>/k=<k>/part-<part>.parquet
+
+Every part is one typed table (one row per genome), written by the fitters
+with --results-store or imported from the Results_*.xlsx workbooks and the
+'name: key=value ...' logs by model_fits/build_results_store.py. Plotting
+scripts read a (model, k) partition with load_results, asking only for
+the columns they use.
+
+Parts are Parquet when pyarrow is installed and pandas pickles otherwise;
+load_results reads both, so a store written on one node is readable on any.
+"""
+import os
+import glob
+import re
+from functools import lru_cache
+import pandas as pd
+
+from common.batch_fit import parse_result_line
+from common.executor import atomic_path
+
+try:
+    import pyarrow  # noqa: F401
+    PART_SUFFIX = '.parquet'
+except ImportError:
+    PART_SUFFIX = '.pkl'
+
+PART_SUFFIXES = ('.parquet', '.pkl')
+SHEET_PATTERN = re.compile(r'^k(\d+)$')
+CACHE_ENTRIES = 64
+CACHE_DIR_NAME = '.results_cache'
+
+
+def partition_dir(root, model, k):
+    return os.path.join(root, f"model={model}", f"k={k}")
+
+
+def list_partitions(root):
+    """Sorted (model, k) pairs present in a results store."""
+    found = set()
+    for path in glob.glob(os.path.join(root, "model=*", "k=*")):
+        model = os.path.basename(os.path.dirname(path))[len("model="):]
+        k = os.path.basename(path)[len("k="):]
+        if k.isdigit():
+            found.add((model, int(k)))
+    return sorted(found)
+
+
+def write_results(root, model, k, frame, part='0'):
+    """Write one part of the (model, k) partition, replacing a part of that name."""
+    out_dir = partition_dir(root, model, k)
+    os.makedirs(out_dir, exist_ok=True)
+    for suffix in PART_SUFFIXES:
+        stale = os.path.join(out_dir, f"part-{part}{suffix}")
+        if suffix != PART_SUFFIX and os.path.exists(stale):
+            os.remove(stale)
+    path = os.path.join(out_dir, f"part-{part}{PART_SUFFIX}")
+    frame = frame.reset_index(drop=True)
+    with atomic_path(path) as tmp:
+        if PART_SUFFIX == '.parquet':
+            frame.to_parquet(tmp, index=False)
+        else:
+            frame.to_pickle(tmp)
+    return path
+
+
+def _read_part(path, columns):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    frame = pd.read_pickle(path)
+    return frame if columns is None else frame[[c for c in columns if c in frame.columns]]
+
+
+def _signature(paths):
+    """(path, mtime_ns, size) of each file; changes whenever one is rewritten."""
+    sig = []
+    for path in paths:
+        st = os.stat(path)
+        sig.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _sheet_cache_path(source, k, mtime_ns, cache_dir):
+    name = f"{os.path.basename(source)}.k{k}.{mtime_ns}.pkl"
+    return os.path.join(cache_dir or os.path.join(os.path.dirname(os.path.abspath(source)),
+                                                  CACHE_DIR_NAME), name)
+
+
+def _read_sheet(source, k, mtime_ns, cache_dir):
+    """
+    Whole 'k<k>' sheet of a workbook, through a pickle next to it keyed by
+    the workbook's mtime, so each version of a workbook is parsed once.
+    """
+    cached = _sheet_cache_path(source, k, mtime_ns, cache_dir)
+    if os.path.exists(cached):
+        return pd.read_pickle(cached)
+    try:
+        frame = pd.read_excel(source, sheet_name=f'k{k}')
+    except ValueError as e:
+        raise FileNotFoundError(f"{source}: {e}") from e
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        prefix = f"{os.path.basename(source)}.k{k}."
+        for old in glob.glob(os.path.join(os.path.dirname(cached), prefix + "*.pkl")):
+            os.remove(old)
+        with atomic_path(cached) as tmp:
+            frame.to_pickle(tmp)
+    except OSError:
+        pass
+    return frame
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _cached_results(source, model, k, columns, signature, cache_dir):
+    """Read behind load_results; `signature` makes rewritten inputs a cache miss."""
+    if not os.path.isdir(source):
+        frame = _read_sheet(source, k, signature[0][1], cache_dir)
+        return frame if columns is None else frame[list(columns)]
+    frames = [_read_part(path, None if columns is None else list(columns))
+              for path, _, _ in signature]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def load_results(source, model, k, columns=None, cache_dir=None):
+    """
+    Results of one model at one k as a DataFrame, restricted to `columns`
+    when given. `source` is a results store directory, or (for data not
+    yet imported) a Results_*.xlsx workbook whose sheet 'k<k>' is read.
+    Raises FileNotFoundError when the partition or sheet is missing.
+
+    Reads are memoised in-process (the same partition asked for by several
+    figures is read once) and invalidated by the mtime of the parts or the
+    workbook; workbook sheets are also cached on disk, in `cache_dir`
+    (default: .results_cache next to the workbook). The returned frame is
+    the caller's own copy.
+    """
+    columns = None if columns is None else tuple(columns)
+    if os.path.isdir(source):
+        parts = sorted(p for p in glob.glob(os.path.join(partition_dir(source, model, k), "part-*"))
+                       if p.endswith(PART_SUFFIXES))
+        if not parts:
+            raise FileNotFoundError(f"No results for model={model} k={k} in {source}")
+    else:
+        parts = [source]
+    return _cached_results(source, model, k, columns, _signature(parts), cache_dir).copy()
+
+
+def clear_cache():
+    """Drop the in-process results cache (the on-disk sheet cache is kept)."""
+    _cached_results.cache_clear()
+
+
+def results_frame(lines):
+    """
+    Table of 'name: key=value ...' result lines: a Filename column, a status
+    column ('ok', or the error key such as FitError/FileNotFound) and one
+    column per value. Blank lines are skipped.
+    """
+    rows = []
+    for line in lines:
+        if not line or not line.strip():
+            continue
+        name, values = parse_result_line(line)
+        if not values:
+            status = line.partition(':')[2].strip() or 'NoData'
+        else:
+            errors = [key for key, v in values.items() if isinstance(v, str)]
+            status = errors[0] if errors else 'ok'
+        row = {'Filename': name, 'status': status}
+        row.update((key, v) for key, v in values.items() if not isinstance(v, str))
+        rows.append(row)
+    return pd.DataFrame(rows, columns=None if rows else ['Filename', 'status'])
+
+
+def read_result_log(path):
+    """results_frame of a fitter's text log."""
+    with open(path) as f:
+        return results_frame(f)
+
+
+def workbook_sheets(path):
+    """{k: sheet name} of the 'k<k>' sheets of a Results_*.xlsx workbook."""
+    sheets = {}
+    for name in pd.ExcelFile(path).sheet_names:
+        m = SHEET_PATTERN.match(name)
+        if m:
+            sheets[int(m.group(1))] = name
+    return sheets
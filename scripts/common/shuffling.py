@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Shuffles of 2-bit encoded records with a seeded numpy Generator.
+
+Runs of non-ACGT bases stay where they are, so the shuffled genome has the
+same number of valid k-windows as the original. With klet=1 the ACGT bases
+of a record are permuted (mononucleotide composition kept). With klet=k>1
+every ACGT segment between N runs is shuffled so that its k-let counts are
+kept exactly (Altschul & Erikson 1985, as in uShuffle, Jiang et al. 2008):
+
+  the (k-1)-mers are vertices and every k-let an edge, the segment being an
+  Eulerian path from its first to its last (k-1)-mer. A random arborescence
+  into the last vertex (Wilson's algorithm) fixes the last edge out of every
+  other vertex, the remaining edges of each vertex are put in random order,
+  and walking the edges in that order spells a uniformly random sequence
+  with the same k-let counts, first and last (k-1)-mer.
+
+Only the (k-1)-mers present in a segment are indexed, so a segment costs
+O(length) whatever k; vertex codes are uint32, hence k <= MAX_KLET.
+Grouping and ordering the edges is vectorised; the walk itself is one
+Python step per base over memoryviews.
+"""
+import zlib
+import numpy as np
+
+from common.kmer_counting import INVALID
+
+MAX_KLET = 17   # (k-1)-mers packed in uint32 vertex codes
+
+
+def record_rng(seed, name, replicate=0):
+    """
+    Generator for one file, from the run seed and the file name (independent
+    of worker order); replicates > 0 get independent streams, replicate 0
+    being the one shuffle_fasta.py writes.
+    """
+    entropy = [seed, zlib.crc32(name.encode())]
+    if replicate:
+        entropy.append(replicate)
+    return np.random.default_rng(entropy)
+
+
+def valid_segments(encoded):
+    """(starts, ends) of the ACGT-only segments of an encoded record."""
+    good = np.zeros(encoded.size + 2, dtype=np.int8)
+    good[1:-1] = encoded != INVALID
+    edges = np.diff(good)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def vertex_codes(segment, m):
+    """Codes of the m-mers of an ACGT-only segment (2 bits per base, first base high)."""
+    n = segment.size - m + 1
+    codes = np.zeros(n, dtype=np.uint32)
+    for i in range(m):
+        codes <<= np.uint32(2)
+        codes |= segment[i:i + n]
+    return codes
+
+
+def random_arborescence(first, counts, targets, root, rng):
+    """
+    Wilson's algorithm: for every vertex with out-edges other than root, the
+    target of its last edge, so that these edges form a uniformly random
+    spanning arborescence into root. first/counts locate each vertex's
+    out-edge targets in `targets`. Returns {vertex: target}.
+    """
+    in_tree = {root}
+    nxt = {}
+    for u in np.flatnonzero(counts).tolist():
+        v = u
+        while v not in in_tree:
+            nxt[v] = int(targets[first[v] + rng.integers(counts[v])])
+            v = nxt[v]
+        v = u
+        while v not in in_tree:
+            in_tree.add(v)
+            v = nxt[v]
+    return nxt
+
+
+def klet_shuffle(segment, k, rng):
+    """k-let preserving shuffle of an ACGT-only encoded segment (new uint8 array)."""
+    if k > MAX_KLET:
+        raise ValueError(f"k-let shuffles support k <= {MAX_KLET}, got {k}")
+    m = k - 1
+    if segment.size <= k:
+        return segment.copy()
+    # vertices are numbered among the (k-1)-mers present, in code order
+    codes, vertices = np.unique(vertex_codes(segment, m), return_inverse=True)
+    vertices = vertices.astype(np.uint32)
+    sources, targets = vertices[:-1], vertices[1:]
+    n_vertices = codes.size
+
+    # out-edge targets grouped by source vertex, in random order within a group
+    perm = np.arange(sources.size, dtype=np.uint32)
+    rng.shuffle(perm)
+    order = perm[np.argsort(sources[perm], kind='stable')]
+    grouped = targets[order]
+    del perm, order
+    counts = np.bincount(sources, minlength=n_vertices)
+    first = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(counts, out=first[1:])
+
+    # move a uniformly chosen edge to each vertex's arborescence target to the
+    # end of its group; swapping a random one keeps the rest in random order
+    last_edge = random_arborescence(first, counts, grouped, int(vertices[-1]), rng)
+    if last_edge:
+        us = np.fromiter(last_edge.keys(), dtype=np.int64, count=len(last_edge))
+        vs = np.fromiter(last_edge.values(), dtype=np.int64, count=len(last_edge))
+        group_of = np.repeat(np.arange(n_vertices), counts)
+        want = np.full(n_vertices, -1, dtype=np.int64)
+        want[us] = vs
+        hits = np.flatnonzero(grouped == want[group_of])
+        _, start, n_hits = np.unique(group_of[hits], return_index=True, return_counts=True)
+        pos = hits[start + rng.integers(0, n_hits)]
+        ends = first[group_of[pos] + 1] - 1
+        grouped[pos], grouped[ends] = grouped[ends], grouped[pos].copy()
+        del group_of, hits
+
+    # walk the edges in order from the first vertex
+    out = np.empty(segment.size, dtype=np.uint8)
+    out[:m] = segment[:m]
+    walked = bytearray(sources.size)
+    ptr = first[:-1].tolist()
+    step = grouped.tolist() if grouped.size < 1 << 20 else memoryview(grouped)
+    last_base = (codes & np.uint32(3)).tolist()
+    u = int(vertices[0])
+    for t in range(sources.size):
+        p = ptr[u]
+        ptr[u] = p + 1
+        u = step[p]
+        walked[t] = last_base[u]
+    out[m:] = np.frombuffer(walked, dtype=np.uint8)
+    return out
+
+
+def shuffle_record(encoded, klet, rng):
+    """Shuffled copy of an encoded record, non-ACGT runs kept in place."""
+    out = encoded.copy()
+    if klet <= 1:
+        valid = encoded != INVALID
+        out[valid] = rng.permutation(encoded[valid])
+        return out
+    for start, end in zip(*valid_segments(encoded)):
+        out[start:end] = klet_shuffle(encoded[start:end], klet, rng)
+    return out
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Sparse canonical k-mer counting for k > MAX_DENSE_K, in bounded memory.
+
+A dense 4**k table stops fitting around k=14, so long k-mers are counted as
+sorted runs instead: every block of canonical codes (iter_canonical_codes)
+is sorted and reduced with np.unique to (code, count, first-seen window)
+entries, and the runs are merged as they grow, like SortedRunSet in
+vocabulary_growth.py. Once the runs reach their share of the memory budget
+they are merged into one run, which is written to a .npy file in a
+temporary directory; reading the counts back is then a k-way merge of the
+spilled runs, each read in slices through a memory map.
+
+Rank-ordered output never holds the whole vocabulary either: the rank-count
+vector follows from the histogram of counts, the top N k-mers are kept in an
+N-entry buffer, and the full k-mer ranking is a second external sort on a
+key packing (descending count, first-seen window) into 64 bits, so ties keep
+the first-seen order of kmer_counting.ranked_kmers.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from common.kmer_counting import CHUNK_SIZE, code_dtype, iter_canonical_codes
+
+DEFAULT_MEMORY = 1 << 30
+RUN_DTYPE = np.dtype([('code', np.uint64), ('count', np.int64), ('first', np.int64)])
+RANK_DTYPE = np.dtype([('key', np.uint64), ('code', np.uint64)])
+_MIN_SLICE = 1 << 12
+
+
+def canonical_kmer_count(k):
+    """Number of canonical k-mers (reverse-complement palindromes exist for even k only)."""
+    return (4 ** k + (4 ** (k // 2) if k % 2 == 0 else 0)) // 2
+
+
+def block_run(codes, pos, offset):
+    """
+    Sorted (code, count, first) entries of one block of codes; pos are the
+    block-relative windows of the codes (None when codes[i] is window i).
+    """
+    uniq, idx, n = np.unique(codes, return_index=True, return_counts=True)
+    run = np.empty(uniq.size, dtype=RUN_DTYPE)
+    run['code'] = uniq
+    run['count'] = n
+    run['first'] = (idx if pos is None else pos[idx]) + offset
+    return run
+
+
+def combine_counts(entries):
+    """Sum the counts and keep the first window of the entries sharing a code (sorted input)."""
+    if entries.size == 0:
+        return entries
+    codes = entries['code']
+    new = np.empty(codes.size, dtype=bool)
+    new[0] = True
+    np.not_equal(codes[1:], codes[:-1], out=new[1:])
+    starts = np.flatnonzero(new)
+    if starts.size == entries.size:
+        return entries
+    out = entries[starts]
+    out['count'] = np.add.reduceat(entries['count'], starts)
+    out['first'] = np.minimum.reduceat(entries['first'], starts)
+    return out
+
+
+class SortedRuns:
+    """
+    Structured arrays sorted on their first field, kept in memory up to a
+    quarter of `memory` bytes (merging leaves room for copies) and spilled
+    to .npy files beyond it. `combine` reduces entries sharing a key.
+    Iterating yields every entry once, in key order, in blocks.
+    """
+
+    def __init__(self, dtype, memory=DEFAULT_MEMORY, tmp_dir=None, combine=None):
+        self.dtype = np.dtype(dtype)
+        self.key = self.dtype.names[0]
+        self.capacity = max(memory // self.dtype.itemsize, 4 * _MIN_SLICE)
+        self.tmp_dir = tmp_dir
+        self.combine = combine
+        self.runs = []
+        self.spilled = []
+        self._dir = None
+
+    def _merge(self, parts):
+        entries = np.concatenate(parts)
+        entries = entries[np.argsort(entries[self.key], kind='stable')]
+        return self.combine(entries) if self.combine is not None else entries
+
+    def add(self, run):
+        """Add a run already sorted on the key."""
+        if run.size == 0:
+            return
+        self.runs.append(run)
+        while len(self.runs) > 1 and 2 * self.runs[-1].size >= self.runs[-2].size:
+            last = self.runs.pop()
+            self.runs[-1] = self._merge([self.runs[-1], last])
+        if sum(r.size for r in self.runs) > self.capacity // 4:
+            self.spill()
+
+    def spill(self):
+        """Merge the in-memory runs into one and write it to the temporary directory."""
+        if not self.runs:
+            return
+        run = self._merge(self.runs) if len(self.runs) > 1 else self.runs[0]
+        self.runs = []
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="kmer_runs_", dir=self.tmp_dir)
+        path = os.path.join(self._dir, f"run_{len(self.spilled):05d}.npy")
+        np.save(path, run)
+        self.spilled.append(path)
+
+    def __iter__(self):
+        sources = [np.load(p, mmap_mode='r') for p in self.spilled] + list(self.runs)
+        if len(sources) == 1:
+            run = sources[0]
+            step = max(self.capacity // 4, _MIN_SLICE)
+            for start in range(0, run.size, step):
+                yield np.array(run[start:start + step])
+            return
+        step = max(self.capacity // (4 * max(len(sources), 1)), _MIN_SLICE)
+        pos = [0] * len(sources)
+        while True:
+            live = [i for i, s in enumerate(sources) if pos[i] < s.size]
+            if not live:
+                return
+            heads = {i: sources[i][pos[i]:pos[i] + step] for i in live}
+            # every key up to the smallest last key of an unfinished slice is in this block
+            open_ends = [heads[i][self.key][-1] for i in live if pos[i] + step < sources[i].size]
+            cut = min(open_ends) if open_ends else None
+            parts = []
+            for i in live:
+                head = heads[i]
+                n = head.size if cut is None else int(np.searchsorted(head[self.key], cut,
+                                                                       side='right'))
+                parts.append(head[:n])
+                pos[i] += n
+            yield self._merge(parts)
+
+    def close(self):
+        """Delete the spilled runs."""
+        self.runs = []
+        self.spilled = []
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SparseKmerTable:
+    """
+    Canonical k-mer counts and first-seen windows of any k <= 32 in about
+    `memory` bytes, spilling to `tmp_dir` (the system default when None).
+    """
+
+    def __init__(self, k, memory=DEFAULT_MEMORY, tmp_dir=None):
+        code_dtype(k)
+        self.k = k
+        self.offset = 0
+        self.memory = memory
+        self.tmp_dir = tmp_dir
+        self.runs = SortedRuns(RUN_DTYPE, memory, tmp_dir, combine=combine_counts)
+        # a block's codes and their sort take a few times its window count in bytes
+        self.chunk_size = int(min(CHUNK_SIZE, max(memory // 64, _MIN_SLICE)))
+
+    def update(self, encoded):
+        """Count every canonical k-mer of one encoded record."""
+        for codes, pos, start in iter_canonical_codes(encoded, self.k, self.chunk_size):
+            self.runs.add(block_run(codes, pos, self.offset + start))
+        self.offset += max(encoded.size - self.k + 1, 0)
+
+    def entries(self):
+        """(code, count, first) entries of every observed k-mer, in code order, in blocks."""
+        return iter(self.runs)
+
+    def count_histogram(self):
+        """(values, n): the distinct counts in ascending order and how many k-mers have each."""
+        hist = {}
+        for block in self.entries():
+            values, n = np.unique(block['count'], return_counts=True)
+            for v, m in zip(values.tolist(), n.tolist()):
+                hist[v] = hist.get(v, 0) + m
+        values = np.array(sorted(hist), dtype=np.int64)
+        return values, np.array([hist[v] for v in values.tolist()], dtype=np.int64)
+
+    def close(self):
+        self.runs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_sparse_rank_counts(path, table, top=None):
+    """
+    kmer_counting.write_rank_counts of a sparse table, filled from the count
+    histogram into a memory-mapped .npy without building the vector.
+    """
+    if top is not None and top < 1:
+        raise ValueError(f"top must be >= 1, got {top}")
+    values, n = table.count_histogram()
+    size = int(n.sum()) if top is None else min(int(n.sum()), top)
+    fits = values.size == 0 or values[-1] <= np.iinfo(np.uint32).max
+    if size == 0:
+        with open(path, 'wb') as f:
+            np.save(f, np.empty(0, dtype=np.uint32))
+        return
+    out = open_memmap(path, mode='w+', dtype=np.uint32 if fits else np.int64, shape=(size,))
+    start = 0
+    for v, m in zip(values[::-1].tolist(), n[::-1].tolist()):
+        if start >= size:
+            break
+        out[start:start + m] = v
+        start += m
+    out.flush()
+    del out
+
+
+def _top_entries(table, top):
+    """The `top` entries by descending count, ties by first-seen window."""
+    best = np.empty(0, dtype=RUN_DTYPE)
+    for block in table.entries():
+        if best.size == top:
+            block = block[block['count'] >= best['count'][-1]]
+            if block.size == 0:
+                continue
+        cand = np.concatenate((best, block))
+        best = cand[np.lexsort((cand['first'], -cand['count']))[:top]]
+    return best
+
+
+def iter_ranked_sparse_kmers(table, top=None):
+    """
+    Yield (codes, counts) blocks of every observed k-mer (or of the `top`
+    most frequent) by descending count, ties in first-seen order, as
+    kmer_counting.ranked_kmers does for a dense table.
+    """
+    if top is not None:
+        if top < 1:
+            raise ValueError(f"top must be >= 1, got {top}")
+        best = _top_entries(table, top)
+        yield best['code'], best['count']
+        return
+    values, _ = table.count_histogram()
+    if values.size == 0:
+        return
+    max_count = int(values[-1])
+    first_bits = max(int(table.offset).bit_length(), 1)
+    if (max_count - 1).bit_length() + first_bits > 64:
+        raise ValueError(f"k={table.k}: counts up to {max_count} over {table.offset} windows "
+                         f"do not fit a 64-bit rank key; use a top-N or ranks-only output")
+    shift = np.uint64(first_bits)
+    with SortedRuns(RANK_DTYPE, table.memory, table.tmp_dir) as ranks:
+        for block in table.entries():
+            run = np.empty(block.size, dtype=RANK_DTYPE)
+            run['key'] = ((max_count - block['count']).astype(np.uint64) << shift) | \
+                block['first'].astype(np.uint64)
+            run['code'] = block['code']
+            ranks.add(run[np.argsort(run['key'])])
+        for run in ranks:
+            yield run['code'], max_count - (run['key'] >> shift).astype(np.int64)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Random access to the members of the big per-k archives (sorted_<k>mers*.tar,
+heap_<k>mers.tar) without tarfile.getmembers().
+
+The first time an archive is opened its member headers are walked once and
+(name, data offset, size) of every regular file is written to a sidecar,
+'<archive>.index' (a tab-separated text file, checked against the archive's
+size and mtime). Afterwards a member is one seek + read, any subset can be
+read in parallel, and one genome can be found in every archive without
+scanning them.
+
+Compressed archives (.tar.gz, ...) cannot be seeked into; they are indexed
+the same way, but their members are read with a single streaming pass.
+"""
+import os
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from common.executor import atomic_path
+
+INDEX_SUFFIX = '.index'
+INDEX_HEADER = '# tar index'
+READ_CHUNK = 64   # members per read task in parallel reads
+COMPRESSED_MAGIC = (b'\x1f\x8b', b'BZh', b'\xfd7zXZ')
+
+
+def is_compressed(tar_path):
+    with open(tar_path, 'rb') as f:
+        head = f.read(6)
+    return head.startswith(COMPRESSED_MAGIC)
+
+
+def _stamp(tar_path):
+    st = os.stat(tar_path)
+    return f"{INDEX_HEADER} size={st.st_size} mtime_ns={st.st_mtime_ns}"
+
+
+def scan_members(tar_path):
+    """(name, offset, size) of every regular member, in archive order (one pass)."""
+    entries = []
+    with tarfile.open(tar_path, 'r|*') as tar:
+        for member in tar:
+            if member.isfile():
+                entries.append((member.name, member.offset_data, member.size))
+    return entries
+
+
+class TarIndex:
+    """Members of one archive: `entries` in archive order, lookups by name and basename."""
+
+    def __init__(self, tar_path, entries):
+        self.tar_path = tar_path
+        self.entries = entries
+        self.compressed = is_compressed(tar_path)
+        self._by_name = {e[0]: e for e in entries}
+        self._by_basename = {}
+        for e in entries:
+            self._by_basename.setdefault(os.path.basename(e[0]), e)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def get(self, name):
+        """Entry of a member by full name or basename, None if absent."""
+        return self._by_name.get(name) or self._by_basename.get(os.path.basename(name))
+
+    def find(self, suffix):
+        """First entry whose name ends with `suffix`, None if absent."""
+        entry = self._by_basename.get(suffix)
+        if entry is not None:
+            return entry
+        return next((e for e in self.entries if e[0].endswith(suffix)), None)
+
+    def select(self, suffix):
+        """Entries whose name ends with `suffix`, in archive order."""
+        return [e for e in self.entries if e[0].endswith(suffix)]
+
+
+def write_tar_index(tar_path, entries, index_path=None):
+    path = index_path or tar_path + INDEX_SUFFIX
+    with atomic_path(path) as tmp:
+        with open(tmp, 'w') as out:
+            out.write(_stamp(tar_path) + "\n")
+            for name, offset, size in entries:
+                out.write(f"{offset}\t{size}\t{name}\n")
+    return path
+
+
+def read_tar_index(tar_path, index_path=None):
+    """Entries from the sidecar, or None when it is missing or out of date."""
+    path = index_path or tar_path + INDEX_SUFFIX
+    try:
+        with open(path) as f:
+            if f.readline().rstrip('\n') != _stamp(tar_path):
+                return None
+            entries = []
+            for line in f:
+                offset, size, name = line.rstrip('\n').split('\t', 2)
+                entries.append((name, int(offset), int(size)))
+    except (OSError, ValueError):
+        return None
+    return entries
+
+
+def load_tar_index(tar_path, index_path=None):
+    """
+    TarIndex of an archive from its sidecar, scanning the archive (and
+    writing the sidecar, if the directory is writable) when there is none.
+    """
+    entries = read_tar_index(tar_path, index_path)
+    if entries is None:
+        entries = scan_members(tar_path)
+        try:
+            write_tar_index(tar_path, entries, index_path)
+        except OSError:
+            pass
+    return TarIndex(tar_path, entries)
+
+
+def _pread_entries(tar_path, entries):
+    fd = os.open(tar_path, os.O_RDONLY)
+    try:
+        return [os.pread(fd, size, offset) for _, offset, size in entries]
+    finally:
+        os.close(fd)
+
+
+def read_member(tar_path, entry):
+    """Bytes of one (name, offset, size) entry of an uncompressed archive."""
+    return _pread_entries(tar_path, [entry])[0]
+
+
+def _stream_entries(tar_path, entries):
+    wanted = {e[0] for e in entries}
+    with tarfile.open(tar_path, 'r|*') as tar:
+        for member in tar:
+            if member.name in wanted:
+                yield member.name, tar.extractfile(member).read()
+
+
+def iter_members(index, entries=None, workers=1):
+    """
+    Yield (name, bytes) for `entries` of a TarIndex (default: all), in
+    archive order. Uncompressed archives are read in chunks of READ_CHUNK
+    members, by `workers` threads at once; compressed ones in one stream.
+    """
+    entries = index.entries if entries is None else sorted(entries, key=lambda e: e[1])
+    if index.compressed:
+        yield from _stream_entries(index.tar_path, entries)
+        return
+    chunks = [entries[i:i + READ_CHUNK] for i in range(0, len(entries), READ_CHUNK)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from zip((e[0] for e in chunk), _pread_entries(index.tar_path, chunk))
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # at most 2 * workers chunks in flight, so memory stays bounded
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(_pread_entries, index.tar_path, chunk)))
+            if len(pending) >= 2 * workers:
+                done, fut = pending.popleft()
+                yield from zip((e[0] for e in done), fut.result())
+        while pending:
+            done, fut = pending.popleft()
+            yield from zip((e[0] for e in done), fut.result())
+
+
+def read_named_member(index, name):
+    """Bytes of the member named (or ending in) `name`, None if absent."""
+    entry = index.find(name)
+    if entry is None:
+        return None
+    if index.compressed:
+        return next((data for _, data in _stream_entries(index.tar_path, [entry])), None)
+    return read_member(index.tar_path, entry)
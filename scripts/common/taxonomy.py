@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Accession/assembly -> domain index built once from taxonomies.csv.
+
+The CSV's 'Genome Type and Domain' groups (archaea, bacteria, viral and the
+eukaryotic fungi/invertebrate/plant/protozoa/vertebrate_* groups) are
+collapsed by collapse_domain, the one rule shared by every script. The
+index keeps sorted byte-string keys with an int8 domain code next to the
+CSV (taxonomies.csv -> taxonomies.taxindex.npz) and is rebuilt when the
+CSV is newer. Lookups are np.searchsorted over whole arrays of file names.
+
+Genomes are matched on the accession without its GCA_/GCF_ prefix (so
+GenBank file names find their RefSeq row), then on the assembly name. A key
+is only indexed when all of its rows agree on the domain, so an assembly
+name shared by genomes of different domains stays UNKNOWN rather than
+taking whichever row sorts first. fallback=False drops the assembly-name
+step and requires the (accession, assembly) pair of one row instead, the
+strict join some plots were built on.
+"""
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+from common.executor import atomic_path
+
+DOMAINS = ('archaea', 'bacteria', 'viral', 'eukaryote')
+UNKNOWN = -1
+EUKARYOTE_GROUPS = frozenset({
+    'fungi',
+    'invertebrate',
+    'plant',
+    'protozoa',
+    'vertebrate',
+    'vertebrate_mammalian',
+    'vertebrate_other',
+    'vertebrate(other)',
+})
+ACCESSION_COLUMN = 'Accession (GCF)'
+ASSEMBLY_COLUMN = 'Assembly Name'
+GROUP_COLUMN = 'Genome Type and Domain'
+INDEX_SUFFIX = '.taxindex.npz'
+# 'GCA_000001405.29_GRCh38.p14_genomic.fna.gz', 'GCF_000005845.2_ASM584v2_kmers_5.txt', ...
+FILENAME_PATTERN = re.compile(
+    r'GC[AF]_(?P<accession>\d+\.\d+)_(?P<assembly>.+?)(?:_genomic|_kmers|\.fna|\.txt|$)')
+
+
+def collapse_domain(group):
+    """
+    One of DOMAINS for a 'Genome Type and Domain' value (any case), or None
+    when it is not recognised.
+    """
+    if not isinstance(group, str):
+        return None
+    group = group.strip().lower()
+    if group in DOMAINS:
+        return group
+    if group in EUKARYOTE_GROUPS or group.startswith('vertebrate'):
+        return 'eukaryote'
+    return None
+
+
+def collapse_domains(groups):
+    """collapse_domain over an array or Series of group values (object array, None if unknown)."""
+    groups = pd.Series(np.asarray(groups, dtype=object))
+    mapping = {g: collapse_domain(g) for g in groups.dropna().unique()}
+    domains = groups.map(mapping).astype(object)
+    return domains.where(domains.notna(), None).to_numpy()
+
+
+def split_accession(values):
+    """Accession without its GCA_/GCF_ prefix: 'GCF_000005845.2' -> '000005845.2'."""
+    return pd.Series(values, dtype=object).astype(str).str.strip().str.replace(
+        r'^GC[AF]_', '', regex=True)
+
+
+def parse_filenames(filenames):
+    """(accessions, assemblies) byte arrays parsed from file names; b'' where absent."""
+    ids = pd.Series([os.path.basename(f) for f in filenames], dtype=object).str.extract(
+        FILENAME_PATTERN)
+    return (ids['accession'].fillna('').to_numpy().astype('S'),
+            ids['assembly'].fillna('').to_numpy().astype('S'))
+
+
+def pair_keys(accessions, assemblies):
+    """b'accession\\tassembly' keys of aligned byte arrays; b'' where either is empty."""
+    pairs = np.char.add(np.char.add(accessions, b'\t'), assemblies)
+    return np.where((accessions != b'') & (assemblies != b''), pairs, b'')
+
+
+def _sorted_keys(keys, codes):
+    """Sorted unique keys with their code, keeping only keys whose rows agree on it."""
+    keep = (keys != b'') & (codes != UNKNOWN)
+    keys, codes = keys[keep], codes[keep]
+    keys, inverse = np.unique(keys, return_inverse=True)
+    low = np.full(keys.size, np.iinfo(np.int8).max, dtype=np.int8)
+    high = np.full(keys.size, UNKNOWN, dtype=np.int8)
+    np.minimum.at(low, inverse, codes)
+    np.maximum.at(high, inverse, codes)
+    single = low == high
+    return keys[single], low[single]
+
+
+def _lookup(keys, codes, queries):
+    if keys.size == 0:
+        return np.full(queries.shape, UNKNOWN, dtype=np.int8)
+    pos = np.minimum(np.searchsorted(keys, queries), keys.size - 1)
+    return np.where(keys[pos] == queries, codes[pos], UNKNOWN).astype(np.int8)
+
+
+class TaxonomyIndex:
+    """Sorted accession, assembly and (accession, assembly) keys with their int8 domain codes."""
+
+    def __init__(self, accessions, accession_codes, assemblies, assembly_codes, pairs, pair_codes):
+        self.accessions = accessions
+        self.accession_codes = accession_codes
+        self.assemblies = assemblies
+        self.assembly_codes = assembly_codes
+        self.pairs = pairs
+        self.pair_codes = pair_codes
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        df = pd.read_csv(csv_path, usecols=lambda c: c.strip() in
+                         (ACCESSION_COLUMN, ASSEMBLY_COLUMN, GROUP_COLUMN), dtype=str)
+        df.columns = df.columns.str.strip()
+        domain = pd.Series(collapse_domains(df[GROUP_COLUMN]))
+        codes = domain.map({d: i for i, d in enumerate(DOMAINS)}).fillna(UNKNOWN)
+        codes = codes.to_numpy().astype(np.int8)
+        accessions = split_accession(df[ACCESSION_COLUMN].fillna('')).to_numpy().astype('S')
+        assemblies = df[ASSEMBLY_COLUMN].fillna('').str.strip().to_numpy().astype('S')
+        return cls(*_sorted_keys(accessions, codes), *_sorted_keys(assemblies, codes),
+                   *_sorted_keys(pair_keys(accessions, assemblies), codes))
+
+    @classmethod
+    def load(cls, path):
+        """Index saved by save(); KeyError for an index written before the pair keys."""
+        with np.load(path) as z:
+            return cls(z['accessions'], z['accession_codes'], z['assemblies'], z['assembly_codes'],
+                       z['pairs'], z['pair_codes'])
+
+    def save(self, path):
+        with atomic_path(path) as tmp:
+            with open(tmp, 'wb') as f:
+                np.savez(f, accessions=self.accessions, accession_codes=self.accession_codes,
+                         assemblies=self.assemblies, assembly_codes=self.assembly_codes,
+                         pairs=self.pairs, pair_codes=self.pair_codes)
+
+    def __len__(self):
+        return self.accessions.size
+
+    def _codes(self, accessions, assemblies, fallback):
+        if not fallback:
+            return _lookup(self.pairs, self.pair_codes, pair_keys(accessions, assemblies))
+        codes = _lookup(self.accessions, self.accession_codes, accessions)
+        if assemblies is not None:
+            missing = codes == UNKNOWN
+            codes[missing] = _lookup(self.assemblies, self.assembly_codes, assemblies[missing])
+        return codes
+
+    def codes(self, accessions, assemblies=None, fallback=True):
+        """
+        Domain codes (index into DOMAINS, UNKNOWN if unmatched) of aligned
+        accession (with or without GCA_/GCF_) and assembly-name arrays; with
+        fallback=False both must match the same row.
+        """
+        if assemblies is None and not fallback:
+            raise ValueError("the strict (accession, assembly) join needs assembly names")
+        accessions = split_accession(accessions).to_numpy().astype('S')
+        if assemblies is not None:
+            assemblies = pd.Series(assemblies, dtype=object).astype(str).str.strip()
+            assemblies = assemblies.to_numpy().astype('S')
+        return self._codes(accessions, assemblies, fallback)
+
+    def filename_codes(self, filenames, fallback=True):
+        """Domain codes of genome or count file names."""
+        return self._codes(*parse_filenames(filenames), fallback)
+
+    def domains(self, filenames, fallback=True):
+        """Domain names of file names, None where unmatched."""
+        return domain_names(self.filename_codes(filenames, fallback))
+
+
+def domain_names(codes):
+    """Object array of DOMAINS names for codes, None for UNKNOWN."""
+    names = np.array(DOMAINS + (None,), dtype=object)
+    codes = np.asarray(codes)
+    return names[np.where(codes == UNKNOWN, len(DOMAINS), codes)]
+
+
+def index_path(csv_path):
+    root, _ = os.path.splitext(csv_path)
+    return root + INDEX_SUFFIX
+
+
+@lru_cache(maxsize=None)
+def load_taxonomy(csv_path):
+    """
+    TaxonomyIndex of a taxonomies.csv, from its .taxindex.npz when that is
+    newer than the CSV; otherwise built from the CSV and saved (if the
+    directory is writable) for the next script.
+    """
+    path = index_path(csv_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+        try:
+            return TaxonomyIndex.load(path)
+        except KeyError:
+            pass
+    index = TaxonomyIndex.from_csv(csv_path)
+    try:
+        index.save(path)
+    except OSError:
+        pass
+    return index
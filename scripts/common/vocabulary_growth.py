@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Heaps' law vocabulary growth: distinct canonical k-mers V after N windows.
+
+The genome is encoded once, the number of valid windows comes from a
+vectorised N-run scan, and the percentage checkpoints are placed before
+the scan. Distinct k-mers are tracked as integer codes in a 4**k bitmap
+(k <= MAX_BITMAP_K, 128 MiB at k=15) or, for larger k, in a set of sorted
+uint64 runs that are merged as they grow.
+
+For long words on large assemblies, sketch_vocabulary_growth estimates V
+with a HyperLogLog sketch instead: memory is fixed by the requested
+relative standard error (2**p one-byte registers) whatever k and N are.
+"""
+import math
+
+import numpy as np
+
+from common.kmer_counting import iter_canonical_codes, count_valid_windows
+
+MAX_BITMAP_K = 15
+
+
+class BitmapSet:
+    """Set of k-mer codes stored as one bit per possible code."""
+
+    def __init__(self, k):
+        self.bits = np.zeros((4 ** k + 7) // 8, dtype=np.uint8)
+
+    def contains(self, codes):
+        return ((self.bits[codes >> 3] >> (codes & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def add(self, codes):
+        np.bitwise_or.at(self.bits, codes >> 3,
+                         np.left_shift(1, codes & 7).astype(np.uint8))
+
+
+class SortedRunSet:
+    """
+    Set of codes kept as sorted uint64 runs (8 bytes per code). A new run is
+    merged into the previous one while it is at least half its size, so
+    there are O(log n) runs to search.
+    """
+
+    def __init__(self, k=None):
+        self.runs = []
+
+    def contains(self, codes):
+        codes = codes.astype(np.uint64)
+        found = np.zeros(codes.size, dtype=bool)
+        for run in self.runs:
+            idx = np.searchsorted(run, codes)
+            idx[idx == run.size] = 0
+            found |= run[idx] == codes
+        return found
+
+    def add(self, codes):
+        self.runs.append(np.sort(codes.astype(np.uint64)))
+        while len(self.runs) > 1 and 2 * self.runs[-1].size >= self.runs[-2].size:
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate((self.runs[-1], last)))
+
+
+_RANK_BITS = 32     # hash bits ranked after the register index
+
+
+def _hll_sigma(x):
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        z_old = z
+        z += x * y
+        y += y
+        if z == z_old:
+            return z
+
+
+def _hll_tau(x):
+    if x in (0, 1):
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        z_old = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == z_old:
+            return z / 3
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over integer codes (Flajolet et al. 2007),
+    with 2**p registers and a 64-bit splitmix hash. The relative standard
+    error of estimate() is about 1.04 / sqrt(2**p).
+    """
+
+    def __init__(self, p=14):
+        if not 4 <= p <= 24:
+            raise ValueError(f"HyperLogLog precision must be in [4, 24], got {p}")
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, rel_error):
+        """Smallest sketch whose standard error is at most rel_error."""
+        if not 0 < rel_error < 1:
+            raise ValueError(f"Relative error must be in (0, 1), got {rel_error}")
+        return cls(max(4, math.ceil(2 * math.log2(1.04 / rel_error))))
+
+    @staticmethod
+    def hash_codes(codes):
+        z = codes.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z ^= z >> np.uint64(30)
+        z *= np.uint64(0xBF58476D1CE4E5B9)
+        z ^= z >> np.uint64(27)
+        z *= np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+        return z
+
+    def add(self, codes):
+        if codes.size == 0:
+            return
+        h = self.hash_codes(codes)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.intp)
+        # rank = position of the first 1 bit after the index bits, taken from
+        # the next 32 bits (exact in float64, enough for ~2**32 * m items)
+        rest = ((h << np.uint64(self.p)) >> np.uint64(32)).astype(np.float64)
+        rank = (_RANK_BITS + 1 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def estimate(self):
+        """
+        Cardinality estimate with Ertl's improved estimator (2017), which
+        stays unbiased through the small/large-range transition without
+        empirical bias tables.
+        """
+        m = self.m
+        q = _RANK_BITS
+        hist = np.bincount(self.registers, minlength=q + 2).astype(float)
+        if hist[0] == m:
+            return 0.0
+        z = m * _hll_tau(1 - hist[q + 1] / m)
+        for rank in range(q, 0, -1):
+            z = 0.5 * (z + hist[rank])
+        z += m * _hll_sigma(hist[0] / m)
+        return m * m / (2 * math.log(2) * z)
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes
+
+
+def new_seen_set(k):
+    return BitmapSet(k) if k <= MAX_BITMAP_K else SortedRunSet(k)
+
+
+def checkpoint_windows(total, n_points=100):
+    """
+    Window counts at which V:N is reported: for p = 1..n_points, the first N
+    whose int(N * n_points / total) reaches p. Percentages skipped over when
+    total < n_points are not reported, as in the per-window loop this
+    replaces.
+    """
+    def pct(n):
+        return int(n * n_points / total)
+
+    points = []
+    for p in range(1, n_points + 1):
+        n = -(-p * total // n_points)
+        while n > 1 and pct(n - 1) >= p:
+            n -= 1
+        while pct(n) < p:
+            n += 1
+        if pct(n) == p:
+            points.append(n)
+    return points
+
+
+def first_occurrences(seen, codes):
+    """
+    Positions in `codes` where a code appears for the first time, counting
+    the codes already in `seen`, plus the new unique codes themselves.
+    """
+    unseen = np.flatnonzero(~seen.contains(codes))
+    if unseen.size == 0:
+        return unseen, codes[:0]
+    uniq, first = np.unique(codes[unseen], return_index=True)
+    return np.sort(unseen[first]), uniq
+
+
+def iter_code_blocks(records, k, block=1 << 16):
+    """
+    Canonical codes of every valid window, in sequence order, in small
+    blocks so the seen-set test catches repeats early on.
+    """
+    for encoded in records:
+        for codes, _, _ in iter_canonical_codes(encoded, k):
+            for start in range(0, codes.size, block):
+                yield codes[start:start + block]
+
+
+def vocabulary_growth(records, k, checkpoints):
+    """
+    Scan encoded records (see kmer_counting.encode_sequence) in order and
+    return [(V, N)] at each checkpoint window count N.
+    """
+    seen = new_seen_set(k)
+    out = []
+    n_distinct = 0
+    processed = 0
+    ci = 0
+    for codes in iter_code_blocks(records, k):
+        events, uniq = first_occurrences(seen, codes)
+        end = processed + codes.size
+        while ci < len(checkpoints) and checkpoints[ci] <= end:
+            local = checkpoints[ci] - processed
+            out.append((n_distinct + int(np.searchsorted(events, local)), checkpoints[ci]))
+            ci += 1
+        if uniq.size:
+            seen.add(uniq)
+        n_distinct += uniq.size
+        processed = end
+    return out
+
+
+def total_windows(records, k):
+    """Number of ACGT-only k-windows over all encoded records."""
+    return sum(count_valid_windows(encoded, k) for encoded in records)
+
+
+def sketch_vocabulary_growth(records, k, checkpoints, rel_error=0.01):
+    """
+    Approximate vocabulary_growth: [(V, N)] with V estimated by a
+    HyperLogLog sketch of the given relative standard error.
+    """
+    sketch = HyperLogLog.for_error(rel_error)
+    out = []
+    processed = 0
+    ci = 0
+    for codes in iter_code_blocks(records, k):
+        end = processed + codes.size
+        cut = 0
+        while ci < len(checkpoints) and checkpoints[ci] <= end:
+            local = checkpoints[ci] - processed
+            sketch.add(codes[cut:local])
+            cut = local
+            n = checkpoints[ci]
+            out.append((min(int(round(sketch.estimate())), n), n))
+            ci += 1
+        sketch.add(codes[cut:])
+        processed = end
+    return out
@@ -8,23 +8,29 @@ Each plot shows data density and:
 Additionally, computes Spearman correlations between GC Content (%) and R²
 within GC-content quartiles for each (distribution, k) and prints them.
 """
+import sys
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import LogNorm
 from scipy.stats import spearmanr
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE = '/work/10906/hariskil/vista/zipf/xaris/Investigating_Dna_Words/scripts/model_fits/results_store'
 files = {
-    'Truncated': '/work/10906/hariskil/vista/zipf/xaris/Investigating_Dna_Words/scripts/model_fits/Results_truncated.xlsx',
-    'Zipf-Mandelbrot': '/work/10906/hariskil/vista/zipf/xaris/Investigating_Dna_Words/scripts/model_fits/Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 
 k_values = [3, 4, 5, 6]
 TICK_FONTSIZE = 16
 
-for dist, path in files.items():
+for dist, model in files.items():
     for k in k_values:
-        df = pd.read_excel(path, sheet_name=f'k{k}')
+        df = load_results(RESULTS_STORE, model, k, columns=['R2', 'GC Content (%)'])
         df = df[df['R2'] >= 0]
         
         gc_content = pd.to_numeric(df['GC Content (%)'], errors='coerce').dropna()
@@ -6,14 +6,19 @@ The plot shows data density and:
   - A colorbar indicating point density (log scale).
   - Major & minor grid lines.
 """
-import pandas as pd
+import sys
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import LogNorm
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE = '/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/results_store'
 files = {
-    'Truncated': '/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/Results_truncated.xlsx',
-    'Zipf-Mandelbrot': '/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 k_values = [3, 4, 5, 6]
 TICK_FONTSIZE = 16
@@ -48,9 +53,9 @@ def load_genic_data(path):
 
 genic_data_map = load_genic_data(genic_file_path)
 
-for dist, path in files.items():
+for dist, model in files.items():
     for k in k_values:
-        df = pd.read_excel(path, sheet_name=f'k{k}')
+        df = load_results(RESULTS_STORE, model, k, columns=['Filename', 'R2'])
         df = df[df['R2'] >= 0].copy() 
 
         def get_base_name(excel_filename):
@@ -6,15 +6,21 @@ The plot shows data density and:
   - Major & minor grid lines.
   - Spearman correlation analysis (ρ) with a p-value in a textbox.
 """
+import sys
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import spearmanr, rankdata
 from matplotlib.colors import LogNorm
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE = '/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/results_store'
 files = {
-    'Truncated': '/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/Results_truncated.xlsx',
-    'Zipf-Mandelbrot': '/storage/group/izg5139/default/xaris/Investigating_Dna_Words/scripts/model_fits/Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 k_values = [3, 4, 5, 6]
 TICK_FONTSIZE = 16
@@ -32,9 +38,9 @@ def interpret_rho(rho):
     else:
         return 'Very strong'
 
-for dist, path in files.items():
+for dist, model in files.items():
     for k in k_values:
-        df = pd.read_excel(path, sheet_name=f'k{k}')
+        df = load_results(RESULTS_STORE, model, k, columns=['R2', 'Genome Size (bp)'])
         df = df[df['R2'] >= 0]
         genome_sizes = pd.to_numeric(df['Genome Size (bp)'], errors='coerce').dropna()
         r2_values = df.loc[genome_sizes.index, 'R2'].astype(float)
@@ -1,144 +1,252 @@
 #!/usr/bin/env python3
+"""
+Mean and standard deviation of the count at every rank, per domain and k,
+over all rank-sorted k-mer count files (members of the sorted_<k>mers tars
+and loose files in the flat directory). Writes <domain>_avg_<k>mers.txt.
+
+Every k is done in one scan: the inputs are listed once, split into blocks
+of files, and each block is reduced by a worker to per-(k, domain) partial
+accumulators (count, mean, M2), which are merged with Chan's parallel
+update. Shorter vectors count as zeros at the ranks they lack.
+
+In the same pass a per-rank quantile sketch (common/rank_sketch.py) is
+kept per domain and k; it is saved as <domain>_quantiles_<k>mers.npz next
+to the averages, with the 5/25/50/75/95th percentiles of every rank in
+<domain>_quantiles_<k>mers.txt.
+"""
+import sys
 import os
+import io
 import re
-import tarfile
+import argparse
+from functools import partial
 import numpy as np
-import pandas as pd
 
-def collapse_domain(dom):
-    """
-    Collapse the full CSV 'Genome Type and Domain' into one of:
-      'archaea', 'bacteria', 'viral', 'eukaryote'
-    """
-    dom = dom.lower()
-    if dom in ('archaea', 'bacteria', 'viral'):
-        return dom
-    euk_groups = {
-        'fungi',
-        'invertebrate',
-        'plant',
-        'protozoa',
-        'vertebrate_mammalian',
-        'vertebrate_other',
-    }
-    if dom in euk_groups:
-        return 'eukaryote'
-    raise KeyError(f"Unknown domain '{dom}'")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.taxonomy import load_taxonomy, DOMAINS
+from common.tar_index import load_tar_index, iter_members, read_member
+from common.executor import iter_tasks, add_executor_args
+from common.rank_sketch import RankQuantileSketch
+
+TAR_DIR     = "/scratch/cpk5664"
+MAPPING_CSV = "/storage/group/izg5139/default/xaris/taxonomies.csv"
+FLAT_DIR    = "/storage/group/izg5139/default/xaris/sorted_4mers"
+OUTPUT_DIR  = "/storage/group/izg5139/default/xaris"
+KS          = [3, 4, 5, 6, 7, 8]
+QUANTILES   = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+TAR_K_PATTERN = re.compile(r'sorted_(\d+)mers')
+MEMBER_K_PATTERN = re.compile(r'_kmers_(\d+)_sorted\.txt$')
+
+
+def new_accumulator(quantile_error=None):
+    """Empty accumulator; with quantile_error it also keeps a RankQuantileSketch."""
+    sketch = RankQuantileSketch(quantile_error) if quantile_error else None
+    return {'count': 0, 'mean': np.zeros(0), 'm2': np.zeros(0), 'sketch': sketch}
+
+
+def _pad(x, size):
+    if x.size >= size:
+        return x
+    out = np.zeros(size, dtype=float)
+    out[:x.size] = x
+    return out
 
 
 def update_accumulator(acc, data):
+    """Welford update of count, per-rank mean and M2 with one count vector."""
+    size = max(acc['mean'].size, data.size)
+    mean, m2 = _pad(acc['mean'], size), _pad(acc['m2'], size)
+    data = _pad(np.asarray(data, dtype=float), size)
+    count = acc['count'] + 1
+    delta = data - mean
+    mean += delta / count
+    m2 += delta * (data - mean)
+    acc['count'], acc['mean'], acc['m2'] = count, mean, m2
+    if acc['sketch'] is not None:
+        acc['sketch'].add(data)
+
+
+def merge_accumulators(a, b):
+    """Chan et al. merge of two accumulators into `a`."""
+    if b['count'] == 0:
+        return a
+    if a['sketch'] is not None:
+        a['sketch'].merge(b['sketch'])
+    if a['count'] == 0:
+        a.update(count=b['count'], mean=b['mean'].copy(), m2=b['m2'].copy())
+        return a
+    size = max(a['mean'].size, b['mean'].size)
+    mean_a, m2_a = _pad(a['mean'], size), _pad(a['m2'], size)
+    mean_b, m2_b = _pad(b['mean'], size), _pad(b['m2'], size)
+    n_a, n_b = a['count'], b['count']
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    a['mean'] = mean_a + delta * (n_b / n)
+    a['m2'] = m2_a + m2_b + delta ** 2 * (n_a * n_b / n)
+    a['count'] = n
+    return a
+
+
+def finalize(acc):
+    """(mean, population std) per rank."""
+    var = acc['m2'] / acc['count']
+    return acc['mean'], np.sqrt(np.maximum(var, 0))
+
+
+def read_counts(source):
+    """Count column of a '#kmer<TAB>count' file (path or bytes)."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return np.atleast_1d(np.loadtxt(source, usecols=1))
+
+
+def reduce_block(task, quantile_error=None):
     """
-    Update running count, sum, and sum of squares for online mean/std.
+    Partial accumulators {(k, domain): acc} of one (kind, path, items) block,
+    items being (k, domain, source). For kind 'flat' the source is a file
+    path; for 'tar' (read directly) and 'stream' (a compressed archive read
+    in one pass) it is the member's (name, offset, size) index entry.
     """
-    count = acc['count']
-    sum1 = acc['sum1']
-    sum2 = acc['sum2']
-    M = data.shape[0]
-
-    if sum1 is None:
-        sum1 = np.zeros(M, dtype=float)
-        sum2 = np.zeros(M, dtype=float)
-    elif sum1.size < M:
-        new_sum1 = np.zeros(M, dtype=float)
-        new_sum1[:sum1.size] = sum1
-        sum1 = new_sum1
-        new_sum2 = np.zeros(M, dtype=float)
-        new_sum2[:sum2.size] = sum2
-        sum2 = new_sum2
-
-    sum1[:M] += data
-    sum2[:M] += data**2
-    count += 1
-
-    acc['count'] = count
-    acc['sum1'] = sum1
-    acc['sum2'] = sum2
-
-def main():
-    tar_dir     = "/scratch/cpk5664"
-    mapping_csv = "/storage/group/izg5139/default/xaris/taxonomies.csv"
-    flat_dir    = "/storage/group/izg5139/default/xaris/sorted_4mers"
-    output_dir  = "/storage/group/izg5139/default/xaris"
-    ks          = [3,4,5,6,7,8]
-
-    # load taxonomy mappings
-    df = pd.read_csv(mapping_csv, low_memory=False)
-    df.columns = df.columns.str.strip()
-    acc2dom = df.set_index('Accession (GCF)')['Genome Type and Domain'].to_dict()
-    asm2dom = df.set_index('Assembly Name')['Genome Type and Domain'].to_dict()
-
-    # regex to parse filenames
-    pat = re.compile(r'(GCA_\d+\.\d+)_([^_/]+)_genomic')
-    os.makedirs(output_dir, exist_ok=True)
-
-    domains = ('archaea', 'bacteria', 'viral', 'eukaryote')
-    for k in ks:
-        accumulators = {
-            dom: {'count': 0, 'sum1': None, 'sum2': None}
-            for dom in domains
-        }
-
-        # scan tarfiles
-        for fn in os.listdir(tar_dir):
-            if not (fn.endswith('.tar') or fn.endswith('.tar.gz')):
-                continue
-            if f"sorted_{k}mers" not in fn:
-                continue
-            tarpath = os.path.join(tar_dir, fn)
-            with tarfile.open(tarpath, 'r:*') as tar:
-                for member in tar.getmembers():
-                    if not member.name.endswith(f"_kmers_{k}_sorted.txt"):
-                        continue
-                    m = pat.search(member.name)
-                    if not m:
-                        print("SKIP (no regex match):", member.name)
-                        continue
-                    acc, asm = m.group(1), m.group(2)
-                    dom_full = acc2dom.get(acc) or asm2dom.get(asm)
-                    if dom_full is None:
-                        print("WARN: no taxonomy for", acc, asm)
-                        continue
-                    dom0 = collapse_domain(dom_full)
-                    with tar.extractfile(member) as fh:
-                        data = np.loadtxt(fh, usecols=1)
-                    update_accumulator(accumulators[dom0], data)
-
-        # scan normal dir
-        for fn in os.listdir(flat_dir):
-            if not fn.endswith(f"_kmers_{k}_sorted.txt"):
-                continue
-            m = pat.search(fn)
-            if not m:
-                print("SKIP (no regex match):", fn)
-                continue
-            acc, asm = m.group(1), m.group(2)
-            dom_full = acc2dom.get(acc) or asm2dom.get(asm)
-            if dom_full is None:
-                print("WARN: no taxonomy for", acc, asm)
+    kind, path, items = task
+    partial_accs = {}
+
+    def add(k, domain, data):
+        if (k, domain) not in partial_accs:
+            partial_accs[(k, domain)] = new_accumulator(quantile_error)
+        acc = partial_accs[(k, domain)]
+        update_accumulator(acc, data)
+
+    if kind == 'flat':
+        for k, domain, file_path in items:
+            add(k, domain, read_counts(file_path))
+    elif kind == 'tar':
+        for k, domain, entry in items:
+            add(k, domain, read_counts(read_member(path, entry)))
+    else:
+        index = load_tar_index(path)
+        lookup = {entry[0]: (k, domain) for k, domain, entry in items}
+        for name, raw in iter_members(index, [entry for _, _, entry in items]):
+            add(*lookup[name], read_counts(raw))
+    return partial_accs
+
+
+def member_k(name):
+    m = MEMBER_K_PATTERN.search(name)
+    return int(m.group(1)) if m else None
+
+
+def plan_blocks(tar_dir, flat_dir, ks, taxonomy, block_size):
+    """
+    (tasks, sizes) covering every input for every k, from one listing of
+    the tar and flat directories.
+    """
+    ks = set(ks)
+    tasks, sizes = [], []
+
+    def add_blocks(kind, path, items, item_size):
+        for i in range(0, len(items), block_size):
+            block = items[i:i + block_size]
+            tasks.append((kind, path, block))
+            sizes.append(sum(item_size(it) for it in block))
+
+    def with_domains(names, items):
+        kept = []
+        for item, domain, name in zip(items, taxonomy.domains(names), names):
+            if domain is None:
+                print("WARN: no taxonomy for", name)
                 continue
-            dom0 = collapse_domain(dom_full)
-            path_txt = os.path.join(flat_dir, fn)
-            data = np.loadtxt(path_txt, usecols=1)
-            update_accumulator(accumulators[dom0], data)
-
+            kept.append((item[0], domain, item[1]))
+        return kept
+
+    for fn in sorted(os.listdir(tar_dir)):
+        if not (fn.endswith('.tar') or fn.endswith('.tar.gz')):
+            continue
+        m = TAR_K_PATTERN.search(fn)
+        if not m or int(m.group(1)) not in ks:
+            continue
+        tarpath = os.path.join(tar_dir, fn)
+        index = load_tar_index(tarpath)
+        members = [(k, e) for e in index.entries
+                   for k in [member_k(e[0])] if k is not None and k in ks]
+        items = with_domains([e[0] for _, e in members], members)
+        if index.compressed:
+            # one worker streams the whole archive
+            tasks.append(('stream', tarpath, items))
+            sizes.append(sum(e[2] for _, _, e in items))
+        else:
+            add_blocks('tar', tarpath, items, lambda it: it[2][2])
+
+    flat = [(k, os.path.join(flat_dir, fn)) for fn in sorted(os.listdir(flat_dir))
+            for k in [member_k(fn)] if k is not None and k in ks]
+    items = with_domains([os.path.basename(p) for _, p in flat], flat)
+    add_blocks('flat', flat_dir, items, lambda it: os.path.getsize(it[2]))
+    return tasks, sizes
+
+
+def write_domain_averages(output_dir, ks, accumulators):
+    for k in sorted(ks):
         print(f"k={k} summary:")
-        for dom0, acc in accumulators.items():
-            print(f"  {dom0}: {acc['count']} files processed")
+        for dom0 in DOMAINS:
+            print(f"  {dom0}: {accumulators[(k, dom0)]['count']} files processed")
 
-        for dom0, acc in accumulators.items():
-            count = acc['count']
-            if count == 0:
+        for dom0 in DOMAINS:
+            acc = accumulators[(k, dom0)]
+            if acc['count'] == 0:
                 print(f"WARNING: no data for k={k}, domain={dom0}")
                 continue
-            sum1, sum2 = acc['sum1'], acc['sum2']
-            mean = sum1 / count
-            var = (sum2 / count) - mean**2
-            std = np.sqrt(np.maximum(var, 0))
+            mean, std = finalize(acc)
             out = np.vstack([mean, std]).T
 
             outpath = os.path.join(output_dir, f"{dom0}_avg_{k}mers.txt")
             np.savetxt(outpath, out, fmt="%.6f", header="mean\tstd", comments="")
-            print(f"WROTE: {outpath}\n")
+            print(f"WROTE: {outpath}")
+
+            sketch = acc['sketch']
+            if sketch is not None:
+                sketch.save(os.path.join(output_dir, f"{dom0}_quantiles_{k}mers.npz"))
+                outpath = os.path.join(output_dir, f"{dom0}_quantiles_{k}mers.txt")
+                header = "\t".join(f"q{round(q * 100):02d}" for q in QUANTILES)
+                np.savetxt(outpath, sketch.quantiles(QUANTILES), fmt="%.6f",
+                           header=header, comments="")
+                print(f"WROTE: {outpath} (+ .npz sketch, {sketch.rel_error:g} relative error)")
+            print()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Per-domain mean/std of rank-sorted k-mer counts")
+    p.add_argument('--tar-dir', default=TAR_DIR)
+    p.add_argument('--flat-dir', default=FLAT_DIR)
+    p.add_argument('--taxonomy', default=MAPPING_CSV)
+    p.add_argument('--output-dir', default=OUTPUT_DIR)
+    p.add_argument('--ks', default=",".join(map(str, KS)), help="Comma-separated k values")
+    p.add_argument('--block-size', type=int, default=256, help="Count files per worker task")
+    p.add_argument('--quantile-error', type=float, default=0.02,
+                   help="Relative error of the per-rank quantile sketches (0 = no sketches)")
+    add_executor_args(p)
+    args = p.parse_args()
+
+    ks = [int(k) for k in args.ks.split(',') if k.strip()]
+    if not 0 <= args.quantile_error < 1:
+        sys.exit("--quantile-error must be in [0, 1)")
+    taxonomy = load_taxonomy(args.taxonomy)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks, sizes = plan_blocks(args.tar_dir, args.flat_dir, ks, taxonomy, args.block_size)
+    accumulators = {(k, dom): new_accumulator(args.quantile_error) for k in ks for dom in DOMAINS}
+    failed = 0
+    work = partial(reduce_block, quantile_error=args.quantile_error)
+    for i, partial_accs in iter_tasks(work, tasks, args.workers, args.retries, sizes):
+        if partial_accs is None:
+            failed += 1
+            continue
+        for key, acc in partial_accs.items():
+            merge_accumulators(accumulators[key], acc)
+    if failed:
+        print(f"WARNING: {failed}/{len(tasks)} blocks failed and were left out")
+
+    write_domain_averages(args.output_dir, ks, accumulators)
+
 
 if __name__ == "__main__":
     main()
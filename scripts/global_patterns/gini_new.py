@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
+import sys
 import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.inequality import gini as compute_gini
+
 Taxonomies = True   # Set to False for single overall plot, True for per-taxonomy plots + combined
 ks        = [3, 4, 5, 6, 7, 8]
 base_path = '/storage/group/izg5139/default/xaris'
@@ -19,14 +23,6 @@ color_map = {
     'viral': 'purple'
 }
 
-def compute_gini(counts):
-    """counts: positive 1D array -> Gini in [0,1], NaN if no data"""
-    x = np.sort(counts)
-    n = x.size
-    if n == 0:
-        return np.nan
-    return (2.0 * np.sum(np.arange(1, n+1) * x) / (n * x.sum())) - (n + 1) / n
-
 def gather_gini(file_template):
     gini_vals = []
     for k in ks:
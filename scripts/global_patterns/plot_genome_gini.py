@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Per-genome inequality from the kmer_summary_<bucket>.tsv tables written by
+create_kmers.py: median Gini coefficient (with the interquartile range) of
+every domain against k, and the median Lorenz curve of each k for one
+domain. No count file is read.
+
+With --results-store, the Spearman correlation between each genome's Gini
+and its fitted R2 is printed per model and k.
+"""
+import sys
+import os
+import glob
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy.stats import spearmanr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.inequality import read_summaries
+from common.taxonomy import load_taxonomy, DOMAINS
+from common.results_store import load_results
+from common.batch_fit import genome_key
+
+SUMMARY_GLOB = '/scratch/cpk5664/extra_3_tru_mers/kmer_summary_*.tsv'
+TAX_CSV = '/storage/group/izg5139/default/xaris/taxonomies.csv'
+MODELS = ('zipf_mandelbrot', 'truncated_power_law')
+COLORS = {'archaea': 'cyan', 'bacteria': 'red', 'eukaryote': 'green', 'viral': 'purple'}
+
+
+def plot_gini_by_domain(summary, output_png):
+    ks = sorted(summary['k'].unique())
+    plt.figure(figsize=(8, 5))
+    for dom in DOMAINS:
+        sub = summary[summary['domain'] == dom]
+        if sub.empty:
+            continue
+        q = sub.groupby('k')['gini'].quantile([0.25, 0.5, 0.75]).unstack().reindex(ks)
+        plt.plot(ks, q[0.5], marker='o', linewidth=2, color=COLORS[dom], label=dom)
+        plt.fill_between(ks, q[0.25], q[0.75], color=COLORS[dom], alpha=0.2)
+        for k, row in q.iterrows():
+            print(f"{dom} k={k}: median Gini {row[0.5]:.4f} (IQR {row[0.25]:.4f}-{row[0.75]:.4f}), "
+                  f"{(sub['k'] == k).sum()} genomes")
+    plt.xlabel('k-mer length', fontsize=16)
+    plt.ylabel('Gini Coefficient', fontsize=16)
+    plt.xticks(ks, fontsize=13)
+    plt.yticks(fontsize=13)
+    plt.ylim(0, 1)
+    plt.grid(True, linestyle='--', alpha=0.5)
+    plt.legend(title='Taxonomy', fontsize=13)
+    plt.tight_layout()
+    plt.savefig(output_png, dpi=300)
+    plt.close()
+    print(f"Saved plot to {output_png}")
+
+
+def plot_median_lorenz(summary, domain, output_png):
+    cols = [c for c in summary.columns if c.startswith('lorenz_')]
+    sub = summary[summary['domain'] == domain]
+    plt.figure(figsize=(8, 6))
+    plt.plot([0, 1], [0, 1], linestyle='--', color='gray')
+    for k, group in sub.groupby('k'):
+        curve = group[cols].median().to_numpy()
+        plt.plot(np.linspace(0, 1, len(cols)), curve, label=f'k={k}')
+    plt.xlabel('Cumulative share of k-mers', fontsize=16)
+    plt.ylabel('Cumulative share of total counts', fontsize=16)
+    plt.xticks(fontsize=14)
+    plt.yticks(fontsize=14)
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(output_png, dpi=300, bbox_inches='tight')
+    plt.close()
+    print(f"Lorenz curve plot saved as: {output_png}")
+
+
+def correlate_with_fits(summary, store):
+    summary = summary.assign(key=[genome_key(g) for g in summary['genome']])
+    for model in MODELS:
+        for k in sorted(summary['k'].unique()):
+            try:
+                fits = load_results(store, model, k, columns=['Filename', 'R2'])
+            except FileNotFoundError:
+                continue
+            fits = fits.assign(key=[genome_key(f) for f in fits['Filename']])
+            merged = summary[summary['k'] == k].merge(fits, on='key').dropna(subset=['gini', 'R2'])
+            if len(merged) < 3:
+                continue
+            rho, pval = spearmanr(merged['gini'], merged['R2'])
+            print(f"{model} k={k}: Spearman(Gini, R2) rho={rho:.3f}, p={pval:.3e}, N={len(merged)}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Per-genome Gini and Lorenz curves from the k-mer summaries")
+    p.add_argument('--summaries', default=SUMMARY_GLOB, help="Glob of kmer_summary_*.tsv tables")
+    p.add_argument('--taxonomy', default=TAX_CSV)
+    p.add_argument('--lorenz-domain', default='eukaryote', choices=DOMAINS)
+    p.add_argument('--results-store', default=None,
+                   help="Results store to correlate Gini with the fitted R2")
+    args = p.parse_args()
+
+    paths = sorted(glob.glob(args.summaries))
+    if not paths:
+        sys.exit(f"No summary tables match {args.summaries}")
+    summary = read_summaries(paths)
+    summary['domain'] = load_taxonomy(args.taxonomy).domains(summary['genome'])
+
+    plot_gini_by_domain(summary, 'gini_per_genome_by_domain.png')
+    plot_median_lorenz(summary, args.lorenz_domain,
+                       f'lorenz_curve_median_{args.lorenz_domain}.png')
+    if args.results_store:
+        correlate_with_fits(summary, args.results_store)
+
+
+if __name__ == '__main__':
+    main()
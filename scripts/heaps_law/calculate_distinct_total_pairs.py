@@ -1,117 +1,96 @@
-import json
 import argparse
-import gzip
 import os
-from pathlib import Path
-from Bio import SeqIO
+from functools import partial
 import sys
 
-_COMPLEMENT = str.maketrans({'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'})
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import load_work_list, iter_tasks, atomic_path, add_executor_args
+from common.kmer_counting import parse_k_values, count_valid_windows
+from common.packed_genome import genome_name, StreamedGenome
+from common.vocabulary_growth import (total_windows, checkpoint_windows, vocabulary_growth,
+                                     sketch_vocabulary_growth)
 
 def extract_genome_name(file_path):
-    return Path(file_path).name
+    return genome_name(file_path)
 
-def open_fasta(path):
-    if path.endswith('.gz'):
-        return gzip.open(path, 'rt')
-    else:
-        return open(path, 'r')
-
-def count_total_windows(path, k):
-    total = 0
-    with open_fasta(path) as handle:
-        for rec in SeqIO.parse(handle, 'fasta'):
-            seq = str(rec.seq).upper()
-            run_len = 0
-            for c in seq:
-                if c in 'ATCG':
-                    run_len += 1
-                else:
-                    if run_len >= k:
-                        total += run_len - k + 1
-                    run_len = 0
-            if run_len >= k:
-                total += run_len - k + 1
-    return total
-
-def canonical_kmer(kmer):
-    """Return lexicographically smaller of kmer vs its reverse-complement."""
-    rc = kmer.translate(_COMPLEMENT)[::-1]
-    return rc if rc < kmer else kmer
-
-def generate_kmers_progressive_streaming(path, k, output_file, genome_name):
+def write_vocabulary_growth(records, k, output_file, genome_name, sketch_error=None,
+                            tot_windows=None):
     # figure out how many windows there are
-    tot_windows = count_total_windows(path, k)
+    if tot_windows is None:
+        tot_windows = total_windows(records, k)
     if tot_windows < 1:
         print(f"Error: No valid {k}-mers in {genome_name}", file=sys.stderr)
         return
 
-    seen = set()
-    total_count = 0
-    done = set()              # which %'s we’ve already recorded
-    pending = set(range(1, 101))
-
+    # V:N at every percentage of the windows, in one scan of the sequence
+    checkpoints = checkpoint_windows(tot_windows)
+    if sketch_error is None:
+        pairs = vocabulary_growth(records, k, checkpoints)
+    else:
+        pairs = sketch_vocabulary_growth(records, k, checkpoints, sketch_error)
     with open(output_file, 'w') as out:
-        # slide over each valid run
-        proc = 0
-        with open_fasta(path) as handle:
-            for rec in SeqIO.parse(handle, 'fasta'):
-                seq = str(rec.seq).upper()
-                n = len(seq)
-                i = 0
-                while i <= n - k:
-                    if seq[i] not in 'ATCG':
-                        i += 1
-                        continue
-                    # find the end of this ATCG run
-                    j = i
-                    while j < n and seq[j] in 'ATCG':
-                        j += 1
-                    run_len = j - i
-                    if run_len >= k:
-                        # slide across this clean run
-                        for r in range(i, j - k + 1):
-                            kmer = seq[r:r+k]
-                            can = canonical_kmer(kmer)
-                            seen.add(can)
-                            total_count += 1
-                            proc += 1
-
-                            pct = int(proc * 100 / tot_windows)
-                            if pct in pending:
-                                out.write(f"{len(seen)}:{total_count}\n")
-                                pending.remove(pct)
-                    i = j + 1
-
-        # ensure we wrote 100% if it never hit exactly
-        if 100 in pending:
-            out.write(f"{len(seen)}:{total_count}\n")
-
-def process_genome_file(path, k, output_dir):
+        for n_distinct, total_count in pairs:
+            out.write(f"{n_distinct}:{total_count}\n")
+
+def heaps_output_path(output_dir, name, k, multi_k):
+    """<output_dir>/<name>.txt for one k; <output_dir>/heap_<k>mers/<name>.txt for a k range."""
+    if multi_k:
+        return os.path.join(output_dir, f"heap_{k}mers", f"{name}.txt")
+    return os.path.join(output_dir, f"{name}.txt")
+
+def process_genome_file(path, ks, output_dir, sketch_error=None, cache_dir=None):
+    """
+    Write one genome's V:N checkpoints for every k; errors propagate so the
+    executor can retry. The records are streamed (one pass for the window
+    totals of every k, then one per k; cheap from a packed copy in
+    cache_dir), so only one record is in memory at a time.
+    """
     name = extract_genome_name(path)
-    outp = os.path.join(output_dir, f"{name}.txt")
-    if os.path.exists(outp):
-        print(f"Skipping {name}: output exists", file=sys.stderr)
-        return
-    try:
-        generate_kmers_progressive_streaming(path, k, outp, name)
-        print(f"Done {name}")
-    except Exception as e:
-        print(f"Error {name}: {e}", file=sys.stderr)
+    todo = []
+    for k in ks:
+        outp = heaps_output_path(output_dir, name, k, len(ks) > 1)
+        if os.path.exists(outp):
+            print(f"Skipping {name} k={k}: output exists", file=sys.stderr)
+            continue
+        todo.append((k, outp))
+    if not todo:
+        return True
+
+    records = StreamedGenome(path, cache_dir)
+    totals = {k: 0 for k, _ in todo}
+    for encoded in records:
+        for k in totals:
+            totals[k] += count_valid_windows(encoded, k)
+    for k, outp in todo:
+        os.makedirs(os.path.dirname(outp), exist_ok=True)
+        with atomic_path(outp) as tmp:
+            write_vocabulary_growth(records, k, tmp, name, sketch_error, totals[k])
+    print(f"Done {name}")
+    return True
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('scheduler_file')
-    p.add_argument('k', type=int)
+    p.add_argument('k', help="Single k, or a range/list (e.g. 6-15) computed from one scan")
     p.add_argument('output_dir')
     p.add_argument('--bucket-id', type=str, default=None,
-                  help="Bucket id to process; if omitted, uses SLURM_PROCID.")
+                  help="Bucket id to process ('all' for every bucket); if omitted, uses SLURM_PROCID.")
+    p.add_argument('--sketch-error', type=float, default=None,
+                   help="Estimate V with a HyperLogLog sketch of this relative standard "
+                        "error (e.g. 0.01) instead of exact tracking; fixed memory for large k.")
+    p.add_argument('--genome-cache', default=None,
+                   help="Directory of packed genomes from pack_genomes.py, used when up to date.")
+    add_executor_args(p)
     args = p.parse_args()
 
     if not os.path.exists(args.scheduler_file):
         sys.exit(f"Scheduler not found: {args.scheduler_file}")
-    if args.k < 1:
+    try:
+        ks = parse_k_values(args.k)
+    except ValueError:
         sys.exit(f"k must be ≥1, got {args.k}")
+    if args.sketch_error is not None and not 0 < args.sketch_error < 1:
+        sys.exit(f"--sketch-error must be in (0, 1), got {args.sketch_error}")
 
     if args.bucket_id is not None:
         bucket_id = args.bucket_id
@@ -121,18 +100,24 @@ def main():
             sys.exit("No --bucket-id provided and SLURM_PROCID is not set.")
 
     os.makedirs(args.output_dir, exist_ok=True)
-    with open(args.scheduler_file) as f:
-        sched = json.load(f)
-
-    if bucket_id not in sched:
+    try:
+        files = load_work_list(args.scheduler_file, bucket_id)
+    except KeyError:
         print(f"Bucket '{bucket_id}' not in scheduler; nothing to do.", file=sys.stderr)
         return
 
-    for fasta in sched[bucket_id]:
+    fastas = []
+    for fasta in files:
         if not os.path.exists(fasta):
             print(f"Missing file, skipping: {fasta}", file=sys.stderr)
             continue
-        process_genome_file(fasta, args.k, args.output_dir)
+        fastas.append(fasta)
+
+    work = partial(process_genome_file, ks=ks, output_dir=args.output_dir,
+                   sketch_error=args.sketch_error, cache_dir=args.genome_cache)
+    for i, result in iter_tasks(work, fastas, args.workers, args.retries):
+        if result is None:
+            print(f"Error {extract_genome_name(fastas[i])}: giving up", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
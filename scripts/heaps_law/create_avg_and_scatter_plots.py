@@ -1,9 +1,12 @@
+import sys
 import os
-import csv
 import math
 import re
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.taxonomy import load_taxonomy
+
 PLOT_SCATTER = True
 k_mer_length = 12
 
@@ -18,45 +21,21 @@ COLORS  = {
     'eukaryote': 'green',
 }
 
-EUK_LIST = ['protozoa', 'vertebrate', 'vertebrate(other)', 'fungi', 'plant', 'invertebrate']
 KS_ALL = list(range(6, 16))
 
-def extract_ids(fname):
-    base  = os.path.basename(fname)
-    parts = base.split('_')
-    acc   = "_".join(parts[:2])
-    asm   = parts[2]
-    return acc, asm
-
-def detect_domain(raw):
-    val = raw.strip().lower()
-    if 'archaea' in val:   return 'archaea'
-    if 'bacteria' in val:  return 'bacteria'
-    if 'viral' in val:     return 'viral'
-    for e in EUK_LIST:
-        if e in val:        return 'eukaryote'
-    return None
-
 def build_needed_keys(path):
     needed = set()
     with open(path) as f:
         for line in f:
             if not line.strip(): continue
-            fname = line.split('\t',1)[0]
-            needed.add(extract_ids(fname))
+            needed.add(line.split('\t',1)[0])
     return needed
 
 def build_tax_map(csv_path, needed_keys):
-    taxmap = {}
-    with open(csv_path, newline='') as csvf:
-        reader = csv.DictReader(csvf)
-        for row in reader:
-            key = (row['Accession (GCF)'], row['Assembly Name'])
-            if key in needed_keys:
-                dom = detect_domain(row['Genome Type and Domain'])
-                if dom:
-                    taxmap[key] = dom
-    return taxmap
+    """{file name: domain} for the file names that have a known domain."""
+    names = sorted(needed_keys)
+    domains = load_taxonomy(csv_path).domains(names, fallback=False)
+    return {name: dom for name, dom in zip(names, domains) if dom is not None}
 
 def main():
     needed = build_needed_keys(MERGED_FILE)
@@ -89,8 +68,7 @@ def main():
     with open(MERGED_FILE) as f:
         for line in f:
             parts = line.rstrip('\n').split('\t')
-            acc_asm = extract_ids(parts[0])
-            dom = taxmap.get(acc_asm)
+            dom = taxmap.get(parts[0])
             if not dom:
                 continue
             for k in KS_ALL:
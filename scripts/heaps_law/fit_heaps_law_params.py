@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
-import json
 import os
+import sys
 import argparse
+from functools import partial
 import numpy as np
 from scipy.optimize import curve_fit
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import load_work_list, file_size, run_tasks, add_executor_args, atomic_path
+
 def heaps_model(N, K, beta):
     """Heaps' law: V = K * N^beta."""
     return K * (N ** beta)
@@ -91,6 +95,84 @@ def fit_menzerath_from_pairs(V, N):
     A_fit, b_fit = popt
     return A_fit, b_fit
 
+def fit_file(relpath, input_dir, menzerath_only=False):
+    """Fit one V:N file and return its results line (None if it was skipped)."""
+    full_path = os.path.join(input_dir, relpath)
+
+    try:
+        if not os.path.exists(full_path):
+            print(f"Warning: '{full_path}' not found on disk, skipping")
+            return None
+
+        with open(full_path, "r") as f_txt:
+            lines = f_txt.read().splitlines()
+
+        # Parse V:N pairs
+        V_vals, N_vals = [], []
+        for line in lines:
+            if ":" not in line:
+                continue
+            v_str, n_str = line.split(":", 1)
+            try:
+                V_vals.append(int(v_str))
+                N_vals.append(int(n_str))
+            except ValueError:
+                continue
+
+        if len(V_vals) < 2:
+            print(f"Warning: insufficient data in '{relpath}', skipping")
+            return None
+
+        V_arr = np.array(V_vals, dtype=float)
+        N_arr = np.array(N_vals, dtype=float)
+
+        # ---- Heaps fit ----
+        if not menzerath_only:
+            try:
+                K_fit, beta_fit = fit_heaps_scipy(V_arr, N_arr)
+            except Exception as e:
+                print(f"Warning: Heaps fit failed for '{relpath}': {e}")
+                K_fit, beta_fit = np.nan, np.nan
+        else:
+            K_fit, beta_fit = np.nan, np.nan
+
+        # ---- Menzerath fit (M = V/N vs N, bounded) ----
+        try:
+            A_fit, b_fit = fit_menzerath_from_pairs(V_arr, N_arr)
+        except Exception as e:
+            print(f"Warning: Menzerath fit failed for '{relpath}': {e}")
+            A_fit, b_fit = np.nan, np.nan
+
+        # ---- Compose output line ----
+        if menzerath_only:
+            line_out = (
+                f"{relpath}\t"
+                f"A_M:{A_fit:.4g}\t"
+                f"b_M:{b_fit:.4g}"
+            )
+        else:
+            if np.isnan(beta_fit):
+                b_theory = np.nan
+                delta_b = np.nan
+            else:
+                b_theory = beta_fit - 1.0
+                delta_b = b_fit - b_theory if not np.isnan(b_fit) else np.nan
+
+            line_out = (
+                f"{relpath}\t"
+                f"K:{K_fit:.4g}\t"
+                f"β:{beta_fit:.4g}\t"
+                f"A_M:{A_fit:.4g}\t"
+                f"b_M:{b_fit:.4g}\t"
+                f"(b_M-(β-1)):{delta_b:.4g}"
+            )
+
+        return line_out
+
+    except Exception as e:
+        print(f"Warning: error processing '{relpath}': {e}")
+        return None
+
 def main():
     parser = argparse.ArgumentParser(
         description=(
@@ -98,8 +180,8 @@ def main():
             "for each genome file in a scheduler bucket."
         )
     )
-    parser.add_argument("scheduler", help="Path to scheduler JSON")
-    parser.add_argument("bucket", help="Bucket ID (key in scheduler JSON)")
+    parser.add_argument("scheduler", help="Path to scheduler JSON (or a plain file list)")
+    parser.add_argument("bucket", help="Bucket ID (key in scheduler JSON), or 'all'")
     parser.add_argument("input_dir", help="Directory containing V:N text files")
     parser.add_argument("output_dir", help="Directory to write the results file")
     parser.add_argument(
@@ -107,106 +189,32 @@ def main():
         action="store_true",
         help="Only fit Menzerath (skip Heaps); useful if Heaps already computed."
     )
+    add_executor_args(parser)
     args = parser.parse_args()
 
     os.makedirs(args.output_dir, exist_ok=True)
 
     # Load scheduler
-    with open(args.scheduler) as f:
-        sched = json.load(f)
-
-    if args.bucket not in sched:
+    try:
+        files = load_work_list(args.scheduler, args.bucket)
+    except KeyError:
         raise SystemExit(f"Error: bucket '{args.bucket}' not found in scheduler.")
 
-    files = sched[args.bucket]
     print(f"Processing bucket {args.bucket} with {len(files)} files")
     print(f"Input directory:  {args.input_dir}")
     print(f"Output directory: {args.output_dir}")
 
-    results_lines = []
-
-    for relpath in files:
-        full_path = os.path.join(args.input_dir, relpath)
-
-        try:
-            if not os.path.exists(full_path):
-                print(f"Warning: '{full_path}' not found on disk, skipping")
-                continue
-
-            with open(full_path, "r") as f_txt:
-                lines = f_txt.read().splitlines()
-
-            # Parse V:N pairs
-            V_vals, N_vals = [], []
-            for line in lines:
-                if ":" not in line:
-                    continue
-                v_str, n_str = line.split(":", 1)
-                try:
-                    V_vals.append(int(v_str))
-                    N_vals.append(int(n_str))
-                except ValueError:
-                    continue
-
-            if len(V_vals) < 2:
-                print(f"Warning: insufficient data in '{relpath}', skipping")
-                continue
-
-            V_arr = np.array(V_vals, dtype=float)
-            N_arr = np.array(N_vals, dtype=float)
-
-            # ---- Heaps fit ----
-            if not args.menzerath_only:
-                try:
-                    K_fit, beta_fit = fit_heaps_scipy(V_arr, N_arr)
-                except Exception as e:
-                    print(f"Warning: Heaps fit failed for '{relpath}': {e}")
-                    K_fit, beta_fit = np.nan, np.nan
-            else:
-                K_fit, beta_fit = np.nan, np.nan
-
-            # ---- Menzerath fit (M = V/N vs N, bounded) ----
-            try:
-                A_fit, b_fit = fit_menzerath_from_pairs(V_arr, N_arr)
-            except Exception as e:
-                print(f"Warning: Menzerath fit failed for '{relpath}': {e}")
-                A_fit, b_fit = np.nan, np.nan
-
-            # ---- Compose output line ----
-            if args.menzerath_only:
-                line_out = (
-                    f"{relpath}\t"
-                    f"A_M:{A_fit:.4g}\t"
-                    f"b_M:{b_fit:.4g}"
-                )
-            else:
-                if np.isnan(beta_fit):
-                    b_theory = np.nan
-                    delta_b = np.nan
-                else:
-                    b_theory = beta_fit - 1.0
-                    delta_b = b_fit - b_theory if not np.isnan(b_fit) else np.nan
-
-                line_out = (
-                    f"{relpath}\t"
-                    f"K:{K_fit:.4g}\t"
-                    f"β:{beta_fit:.4g}\t"
-                    f"A_M:{A_fit:.4g}\t"
-                    f"b_M:{b_fit:.4g}\t"
-                    f"(b_M-(β-1)):{delta_b:.4g}"
-                )
-
-            results_lines.append(line_out)
-
-        except Exception as e:
-            print(f"Warning: error processing '{relpath}': {e}")
-            continue
+    work = partial(fit_file, input_dir=args.input_dir, menzerath_only=args.menzerath_only)
+    sizes = [file_size(os.path.join(args.input_dir, f)) for f in files]
+    results_lines = [line for line in run_tasks(work, files, args.workers, args.retries, sizes)
+                     if line is not None]
 
     # Write results
     out_fname = os.path.join(args.output_dir, f"results_bucket_{args.bucket}.txt")
-    with open(out_fname, "w") as out_f:
-        for line in results_lines:
-            out_f.write(line + "\n")
+    with atomic_path(out_fname) as tmp:
+        with open(tmp, "w") as out_f:
+            for line in results_lines:
+                out_f.write(line + "\n")
 
     print(f"Wrote results to: {out_fname}")
 
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
-import tarfile
+import sys
+import os
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.tar_index import load_tar_index, read_named_member
+
 tarfiles = [
     "/scratch/cpk5664/heap_6mers.tar",
     "/scratch/cpk5664/heap_7mers.tar",
@@ -30,18 +34,12 @@ for tarpath in tarfiles:
     except Exception:
         k = tarpath
 
-    with tarfile.open(tarpath, 'r') as tar:
-        members = [m for m in tar.getmembers() if m.name.endswith(target_basename)]
-        if not members:
-            print(f" {target_basename!r} not found in {tarpath}, skipping.")
-            continue
-
-        f = tar.extractfile(members[0])
-        if not f:
-            print(f" Failed to extract {members[0].name} from {tarpath}, skipping.")
-            continue
+    data = read_named_member(load_tar_index(tarpath), target_basename)
+    if data is None:
+        print(f" {target_basename!r} not found in {tarpath}, skipping.")
+        continue
 
-        lines = f.read().decode('utf-8').strip().splitlines()
+    lines = data.decode('utf-8').strip().splitlines()
 
     xs, ys = [], []
     for line in lines:
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Check the HyperLogLog mode of calculate_distinct_total_pairs.py against
+exact distinct counting.
+
+For every genome and k (small k, where exact counting is cheap) the V:N
+series is computed exactly and with sketches of the requested relative
+errors, both are fitted with Heaps' law (V = K N^β), and one row per
+(genome, k, error) is written with the largest relative error on V and the
+differences in K and β.
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from calculate_distinct_total_pairs import extract_genome_name
+from fit_heaps_law_params import fit_heaps_scipy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.kmer_counting import parse_k_values
+from common.packed_genome import read_genome
+from common.vocabulary_growth import (total_windows, checkpoint_windows, vocabulary_growth,
+                                      sketch_vocabulary_growth, HyperLogLog)
+
+COLUMNS = ["genome", "k", "error", "sketch_bytes", "max_rel_V_err",
+           "K_exact", "K_sketch", "rel_K_diff", "beta_exact", "beta_sketch", "beta_diff"]
+
+
+def compare_genome(path, ks, errors):
+    """Rows of the comparison table for one genome."""
+    name = extract_genome_name(path)
+    records = read_genome(path)
+    rows = []
+    for k in ks:
+        total = total_windows(records, k)
+        if total < 2:
+            print(f"Warning: too few {k}-mers in {name}, skipping", file=sys.stderr)
+            continue
+        checkpoints = checkpoint_windows(total)
+        exact = np.array(vocabulary_growth(records, k, checkpoints), dtype=float)
+        K_exact, beta_exact = fit_heaps_scipy(exact[:, 0], exact[:, 1])
+        for err in errors:
+            approx = np.array(sketch_vocabulary_growth(records, k, checkpoints, err), dtype=float)
+            K_sk, beta_sk = fit_heaps_scipy(approx[:, 0], approx[:, 1])
+            rel_v = np.abs(approx[:, 0] / exact[:, 0] - 1).max()
+            rows.append([name, k, err, HyperLogLog.for_error(err).nbytes, rel_v,
+                         K_exact, K_sk, K_sk / K_exact - 1, beta_exact, beta_sk,
+                         beta_sk - beta_exact])
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare sketch-based and exact Heaps' law fits")
+    p.add_argument('fastas', nargs='+', help="FASTA files (optionally gzipped)")
+    p.add_argument('--k', default='6-12', help="k values to test (default: 6-12)")
+    p.add_argument('--errors', default='0.02,0.01,0.005',
+                   help="Comma-separated sketch relative errors (default: 0.02,0.01,0.005)")
+    p.add_argument('-o', '--output', default=None, help="TSV output (default: stdout)")
+    args = p.parse_args()
+
+    ks = parse_k_values(args.k)
+    errors = [float(e) for e in args.errors.split(',') if e.strip()]
+
+    rows = []
+    for path in args.fastas:
+        if not os.path.exists(path):
+            print(f"Missing file, skipping: {path}", file=sys.stderr)
+            continue
+        rows.extend(compare_genome(path, ks, errors))
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        out.write("\t".join(COLUMNS) + "\n")
+        for row in rows:
+            out.write("\t".join(f"{v:.4g}" if isinstance(v, float) else str(v) for v in row) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    if rows:
+        arr = np.array([r[4:] for r in rows], dtype=float)
+        print(f"Worst relative V error: {arr[:, 0].max():.4g}, "
+              f"worst |Δβ|: {np.abs(arr[:, 6]).max():.4g}, "
+              f"worst |ΔK/K|: {np.abs(arr[:, 3]).max():.4g}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Import existing fit results into the columnar results store read by the
+plotting scripts (see common/results_store.py):
+
+  --xlsx  a Results_*.xlsx workbook; every 'k<k>' sheet becomes the
+          (model, k) partition, metadata columns included.
+  --log   fitter text logs ('name: alpha=.. R2=..' lines) of one k,
+          one part per log.
+
+Run once per workbook; afterwards the figures no longer parse Excel.
+"""
+import sys
+import os
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import (write_results, read_result_log, workbook_sheets,
+                                  list_partitions, PART_SUFFIX)
+
+
+def import_workbook(store, model, path):
+    sheets = workbook_sheets(path)
+    if not sheets:
+        sys.exit(f"No 'k<k>' sheets in {path}")
+    for k, sheet in sorted(sheets.items()):
+        frame = pd.read_excel(path, sheet_name=sheet)
+        for col in frame.columns[frame.dtypes == object]:
+            frame[col] = frame[col].astype('string')
+        write_results(store, model, k, frame, part='xlsx')
+        print(f"{model} k={k}: {len(frame)} rows from sheet '{sheet}'")
+
+
+def import_logs(store, model, k, paths):
+    for path in paths:
+        frame = read_result_log(path)
+        part = os.path.splitext(os.path.basename(path))[0]
+        write_results(store, model, k, frame, part=part)
+        print(f"{model} k={k}: {len(frame)} rows from {path}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Import Results_*.xlsx workbooks or fitter logs "
+                                            "into the columnar results store")
+    p.add_argument('store', help="Results store directory (created if missing)")
+    p.add_argument('--model', required=True,
+                   help="Model the results belong to (e.g. zipf_mandelbrot, truncated_power_law, zipf)")
+    p.add_argument('--xlsx', default=None, help="Workbook with one 'k<k>' sheet per k")
+    p.add_argument('--log', nargs='+', default=None, help="Fitter text logs of a single k")
+    p.add_argument('--k', type=int, default=None, help="k of the --log files")
+    args = p.parse_args()
+
+    if (args.xlsx is None) == (args.log is None):
+        sys.exit("Give exactly one of --xlsx or --log")
+    if args.xlsx:
+        import_workbook(args.store, args.model, args.xlsx)
+    else:
+        if args.k is None:
+            sys.exit("--log needs --k")
+        import_logs(args.store, args.model, args.k, args.log)
+
+    partitions = ", ".join(f"{m}/k={k}" for m, k in list_partitions(args.store))
+    print(f"Done. Store {args.store} ({PART_SUFFIX[1:]} parts) holds: {partitions}")
+
+
+if __name__ == "__main__":
+    main()
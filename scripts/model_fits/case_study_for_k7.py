@@ -1,15 +1,21 @@
+import sys
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 
-TRUNC_FILE       = 'Results_truncated.xlsx'
-ZIPF_FILE        = 'Results_Zipf_Mandelbrot.xlsx'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE    = 'results_store'
 OUTPUT_COUNT_BAR = 'Organisms_with_positive_negative_R2_k7.png'
 OUTPUT_AVG_R2    = 'Avg_R2_k7.png'
 OUTPUT_TRUNC_POS = 'Trunc_positive_params.png'
 OUTPUT_ZIPF_POS  = 'Zipf_Mandelbrot_positive_params.png'
 
-df_trunc = pd.read_excel(TRUNC_FILE, sheet_name='k7')
-df_zipf  = pd.read_excel(ZIPF_FILE,  sheet_name='k7')
+df_trunc = load_results(RESULTS_STORE, 'truncated_power_law', 7,
+                        columns=['R2', 'alpha', 'lambda', 'scale'])
+df_zipf  = load_results(RESULTS_STORE, 'zipf_mandelbrot', 7,
+                        columns=['R2', 'alpha', 'beta', 'scale'])
 
 count_data = {
     'Truncated Power Law': {
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Fit all rank-frequency models (plain Zipf, Zipf-Mandelbrot, truncated power
+law, and anything else in common/model_registry.py) to every genome in one
+pass. Each count vector is read once and shared by the models, and one
+tab-separated record per genome is written with the parameters and
+R2/AIC/BIC/RMSE/nfev of every model.
+
+Counts come from the rank-sorted text (or ranks-only .npy) files listed in
+a scheduler, or from the binary count store written by create_kmers.py
+--store-dir. With --results-store the records also go to the columnar
+results store, one part per model.
+"""
+import sys
+import os
+import argparse
+from functools import partial
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import load_work_list, run_tasks, add_executor_args, atomic_path, ALL_BUCKETS
+from common.count_store import list_buckets, load_bucket, rank_frequency
+from common.model_registry import FIT_MODELS, STAT_COLUMNS, model_columns, evaluate_models
+from common.results_store import write_results
+from common.kmer_counting import read_rank_counts as read_counts
+
+
+def fit_vectors(names, vectors, models, init):
+    """Records (name, status, n_ranks, values) for named count vectors."""
+    records = [None] * len(names)
+    keep = []
+    for i, (name, vec) in enumerate(zip(names, vectors)):
+        if vec is None:
+            records[i] = (name, "FileNotFound", 0, None)
+        elif len(vec) == 0 or vec.sum() <= 0:
+            records[i] = (name, "NoData", 0, None)
+        else:
+            keep.append(i)
+    if keep:
+        values = evaluate_models(models, [vectors[i] for i in keep], init=init)
+        for row, i in zip(values, keep):
+            records[i] = (names[i], "ok", len(vectors[i]), row)
+    return records
+
+
+def fit_file_block(filepaths, models, init='auto'):
+    """Read a block of count files once and evaluate every model on them."""
+    vectors = []
+    for filepath in filepaths:
+        try:
+            vectors.append(read_counts(filepath))
+        except FileNotFoundError:
+            vectors.append(None)
+    return fit_vectors([os.path.basename(f) for f in filepaths], vectors, models, init)
+
+
+def fit_store_block(task, models, init='auto'):
+    """Evaluate every model on rows [start, stop) of one count-store bucket."""
+    store_dir, bucket_id, k, start, stop = task
+    names, counts = load_bucket(store_dir, bucket_id, k)
+    vectors = [rank_frequency(counts[i]) for i in range(start, stop)]
+    return fit_vectors(names[start:stop], vectors, models, init)
+
+
+def store_tasks(store_dir, bucket_id, k, block):
+    """(store_dir, bucket, k, start, stop) blocks covering the selected buckets."""
+    buckets = list_buckets(store_dir) if bucket_id == ALL_BUCKETS else [bucket_id]
+    tasks = []
+    for b in buckets:
+        names, _ = load_bucket(store_dir, b, k)
+        tasks.extend((store_dir, b, k, start, min(start + block, len(names)))
+                     for start in range(0, len(names), block))
+    return tasks
+
+
+def write_records(path, models, records):
+    columns = ["genome", "status", "n_ranks"] + model_columns(models)
+    n_values = len(columns) - 3
+    with atomic_path(path) as tmp:
+        with open(tmp, 'w') as out:
+            out.write("\t".join(columns) + "\n")
+            for name, status, n_ranks, values in records:
+                if values is None:
+                    values = np.full(n_values, np.nan)
+                out.write("\t".join([name, status, str(n_ranks)] +
+                                    [f"{v:.6g}" for v in values]) + "\n")
+
+
+def write_store(root, k, part, models, records):
+    """One results-store part per model, with Filename, status, n_ranks and its own columns."""
+    values = np.array([np.full(len(model_columns(models)), np.nan) if r[3] is None else r[3]
+                       for r in records], dtype=float).reshape(len(records), -1)
+    base = pd.DataFrame({'Filename': [r[0] for r in records],
+                         'status': [r[1] for r in records],
+                         'n_ranks': np.array([r[2] for r in records], dtype=np.int64)})
+    paths = []
+    col = 0
+    for name in models:
+        names = list(FIT_MODELS[name]['params'] + STAT_COLUMNS)
+        frame = base.copy()
+        for j, c in enumerate(names):
+            frame[c] = values[:, col + j]
+        frame['nfev'] = frame['nfev'].astype('Int64')
+        col += len(names)
+        paths.append(write_results(root, name, k, frame, part=part))
+    return paths
+
+
+def main():
+    p = argparse.ArgumentParser(description="Fit every registered rank-frequency model in one pass")
+    p.add_argument('bucket_id', help="Bucket to fit, or 'all' for every bucket")
+    p.add_argument('scheduler_file', nargs='?', default=None,
+                   help="Scheduler JSON, or a plain list of count files (not needed with --store)")
+    p.add_argument('--store', default=None, help="Read counts from this binary count store")
+    p.add_argument('--k', type=int, default=None,
+                   help="k to read from the count store, and of the --results-store partition")
+    p.add_argument('--models', default=",".join(FIT_MODELS),
+                   help=f"Comma-separated models (default: {','.join(FIT_MODELS)})")
+    p.add_argument('--init', choices=('fixed', 'auto'), default='auto',
+                   help="Starting parameters of the fitted models (see batch_fit.starting_params)")
+    p.add_argument('--batch-size', type=int, default=1024, help="Genomes per fitting block")
+    p.add_argument('-o', '--output', default=None, help="Output TSV")
+    p.add_argument('--results-store', default=None,
+                   help="Also write one part per model to this columnar store (needs --k)")
+    add_executor_args(p)
+    args = p.parse_args()
+    if args.results_store and args.k is None:
+        sys.exit("--results-store needs --k")
+
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in FIT_MODELS]
+    if unknown:
+        sys.exit(f"Unknown model(s) {unknown}; available: {', '.join(FIT_MODELS)}")
+
+    if args.store:
+        if args.k is None:
+            sys.exit("--store needs --k")
+        try:
+            tasks = store_tasks(args.store, args.bucket_id, args.k, args.batch_size)
+        except FileNotFoundError as e:
+            sys.exit(f"Count store not readable: {e}")
+        work = partial(fit_store_block, models=models, init=args.init)
+        default_out = f"model_fits_{args.k}mers_{args.bucket_id}.tsv"
+    else:
+        if args.scheduler_file is None:
+            sys.exit("Give a scheduler file, or --store and --k")
+        try:
+            file_list = load_work_list(args.scheduler_file, args.bucket_id)
+        except KeyError:
+            file_list = []
+        tasks = [file_list[i:i + args.batch_size]
+                 for i in range(0, len(file_list), args.batch_size)]
+        work = partial(fit_file_block, models=models, init=args.init)
+        default_out = f"model_fits_{args.bucket_id}.tsv"
+
+    if not tasks:
+        print(f"No genomes for bucket '{args.bucket_id}'")
+        sys.exit(0)
+
+    results = run_tasks(work, tasks, args.workers, args.retries,
+                        sizes=[len(t) if isinstance(t, list) else t[4] - t[3] for t in tasks])
+    records = []
+    for task, res in zip(tasks, results):
+        if res is not None:
+            records.extend(res)
+        elif isinstance(task, list):
+            records.extend((os.path.basename(f), "WorkerFailed", 0, None) for f in task)
+        else:
+            names, _ = load_bucket(task[0], task[1], task[2])
+            records.extend((n, "WorkerFailed", 0, None) for n in names[task[3]:task[4]])
+
+    out_path = args.output or default_out
+    write_records(out_path, models, records)
+    if args.results_store:
+        write_store(args.results_store, args.k, args.bucket_id, models, records)
+    n_ok = sum(r[1] == "ok" for r in records)
+    print(f"Done. {n_ok}/{len(records)} genomes fitted with {', '.join(models)}; "
+          f"results saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
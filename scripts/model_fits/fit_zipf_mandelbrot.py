@@ -2,9 +2,12 @@
 
 import sys
 import os
-import json
-import numpy as np
-from scipy.optimize import curve_fit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.fit_script import run_fit_script
+
+MODEL = 'zipf_mandelbrot'
+OUTPUT = "zipf_mandelbrot_4mers_{bucket}.txt"
 
 def zipf_mandelbrot(k, alpha, beta, scale):
     """
@@ -13,97 +16,8 @@ def zipf_mandelbrot(k, alpha, beta, scale):
     """
     return scale * (k + beta) ** (-alpha)
 
-def fit_statistics(y_true, y_pred, num_params):
-    sse = np.sum((y_true - y_pred) ** 2)
-    n = len(y_true)
-    ss_total = np.sum((y_true - np.mean(y_true)) ** 2)
-    r2 = 1 - (sse / ss_total) if ss_total > 0 else np.nan
-
-    if sse <= 0:
-        aic = 2 * num_params
-    else:
-        aic = n * np.log(sse / n) + 2 * num_params
-
-    return {
-        'R2': r2,
-        'AIC': aic
-    }
-
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python zipf_mandelbrot_fit.py <bucket_id> <scheduler_file.json>")
-        sys.exit(1)
-
-    bucket_id_str = sys.argv[1]
-    scheduler_file = sys.argv[2]
-
-    with open(scheduler_file, 'r') as sf:
-        data = json.load(sf)
-
-    if bucket_id_str not in data:
-        print(f"No entry found in JSON for bucket_id='{bucket_id_str}'")
-        sys.exit(0)
-
-    file_list = data[bucket_id_str]
-    if not file_list:
-        print(f"No files listed for bucket {bucket_id_str}")
-        sys.exit(0)
-
-    out_filename = f"zipf_mandelbrot_4mers_{bucket_id_str}.txt"
-    with open(out_filename, 'w') as out_f:
-        for filepath in file_list:
-            try:
-                counts = []
-                with open(filepath, 'r') as f:
-                    for line in f:
-                        parts = line.strip().split('\t')
-                        if len(parts) != 2:
-                            continue
-                        try:
-                            counts.append(float(parts[1]))
-                        except ValueError:
-                            continue
-            except FileNotFoundError:
-                out_f.write(f"{os.path.basename(filepath)}: FileNotFound\n")
-                continue
-
-            if len(counts) == 0:
-                continue
-
-            counts = np.array(counts, dtype=float)
-            k_array = np.arange(1, len(counts) + 1, dtype=float)
-            freq = counts / np.sum(counts)
-
-            initial_guess = [1.0, 1.0, 1.0]
-            try:
-                popt, _ = curve_fit(
-                    zipf_mandelbrot,
-                    k_array,
-                    freq,
-                    p0=initial_guess,
-                    bounds=(0, np.inf),
-                    method='trf',
-                    max_nfev=1000000
-                )
-            except RuntimeError as e:
-                out_f.write(f"{os.path.basename(filepath)}: FitError={str(e)}\n")
-                continue
-
-            alpha_fit, beta_fit, scale_fit = popt
-            pred = zipf_mandelbrot(k_array, alpha_fit, beta_fit, scale_fit)
-
-            stats = fit_statistics(freq, pred, len(popt))
-
-            out_f.write(
-                f"{os.path.basename(filepath)}:"
-                f" alpha={alpha_fit:.6g}"
-                f" beta={beta_fit:.6g}"
-                f" scale={scale_fit:.6g}"
-                f" R2={stats['R2']:.4g}"
-                f" AIC={stats['AIC']:.4g}\n"
-            )
-
-    print(f"Done. Results saved to: {out_filename}")
+    run_fit_script(MODEL, zipf_mandelbrot, OUTPUT, "zipf_mandelbrot_fit.py")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
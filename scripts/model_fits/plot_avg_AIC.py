@@ -4,13 +4,19 @@ Computes the average AIC and standard deviation for k = 3,4,5,6 for each distrib
 prints the count of values used, how many were negative, and plots a grouped bar chart
 with a broken y-axis so k=6 doesn't dominate.
 """
+import sys
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE = 'results_store'
 files = {
-    'Truncated': 'Results_truncated.xlsx',
-    'Zipf-Mandelbrot': 'Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 output_plot = 'Average_AIC.png'
 s_values = [3, 4, 5, 6]
@@ -19,13 +25,12 @@ avg_aic = {name: [] for name in files}
 std_aic = {name: [] for name in files}
 counts = {name: [] for name in files}
 
-for name, path in files.items():
+for name, model in files.items():
     for k in s_values:
-        sheet = f'k{k}'
         try:
-            df = pd.read_excel(path, sheet_name=sheet)
+            df = load_results(RESULTS_STORE, model, k, columns=['AIC'])
         except Exception as e:
-            print(f"Error reading {sheet} from {path}: {e}")
+            print(f"Error reading {model} k={k} from {RESULTS_STORE}: {e}")
             avg_aic[name].append(np.nan)
             std_aic[name].append(np.nan)
             counts[name].append(0)
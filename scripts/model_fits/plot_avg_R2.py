@@ -3,13 +3,18 @@
 Computes the average R2 and standard deviation for k = 3,4,5,6 for each distribution,
 Prints the count of values used, how many were negative, and plots a grouped bar chart of average R2 vs k with ±1 std error bars.
 """
-import pandas as pd
+import sys
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE = 'results_store'
 files = {
-    'Truncated': 'Results_truncated.xlsx',
-    'Zipf-Mandelbrot': 'Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 output_plot = 'Average_R2.png'
 s_values = [3, 4, 5, 6]
@@ -18,13 +23,12 @@ avg_r2 = {name: [] for name in files}
 std_r2 = {name: [] for name in files}
 counts = {name: [] for name in files}
 
-for name, path in files.items():
+for name, model in files.items():
     for k in s_values:
-        sheet = f'k{k}'
         try:
-            df = pd.read_excel(path, sheet_name=sheet)
+            df = load_results(RESULTS_STORE, model, k, columns=['R2'])
         except Exception as e:
-            print(f"Error reading {sheet} from {path}: {e}")
+            print(f"Error reading {model} k={k} from {RESULTS_STORE}: {e}")
             avg_r2[name].append(np.nan)
             std_r2[name].append(np.nan)
             counts[name].append(0)
@@ -7,34 +7,40 @@ Computes the average R2 (excluding negative values) for k = 3, 4, 5, 6 across fo
   - Eukaryote
 Generates two separate heatmap figures (one per distribution) showing taxonomies on the y-axis and k-mer lengths on the x-axis,
 """
-import pandas as pd
+import sys
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+from common.taxonomy import collapse_domains
+
+RESULTS_STORE = 'results_store'
 distributions = {
-    'Truncated': 'Results_truncated.xlsx',
-    'Zipf-Mandelbrot': 'Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 k_values = [3, 4, 5, 6]
 taxonomies = {
-    'Archaea': ['archaea'],
-    'Bacteria': ['bacteria'],
-    'Viral': ['viral'],
-    'Eukaryote': ['protozoa', 'vertebrate', 'vertebrate_other', 'fungi', 'plant', 'invertebrate', 'vertebrate_mammalian']
+    'Archaea': 'archaea',
+    'Bacteria': 'bacteria',
+    'Viral': 'viral',
+    'Eukaryote': 'eukaryote'
 }
 
-def filter_taxonomy(df, tax_list):
-    return df if tax_list is None else df[df['Taxonomy'].str.lower().isin(tax_list)]
+def filter_taxonomy(df, domain):
+    return df if domain is None else df[collapse_domains(df['Taxonomy']) == domain]
 
 tax_keys = list(taxonomies.keys())
 
 avg_r2 = {dist: np.zeros((len(tax_keys), len(k_values))) for dist in distributions}
 for i, tax in enumerate(tax_keys):
-    tax_list = taxonomies[tax]
-    for dist, path in distributions.items():
+    domain = taxonomies[tax]
+    for dist, model in distributions.items():
         for j, k in enumerate(k_values):
-            df = pd.read_excel(path, sheet_name=f'k{k}')
-            df = filter_taxonomy(df, tax_list)
+            df = load_results(RESULTS_STORE, model, k, columns=['Taxonomy', 'R2'])
+            df = filter_taxonomy(df, domain)
             vals = df['R2'][df['R2'] >= 0].dropna().astype(float)
             avg_r2[dist][i, j] = vals.mean() if not vals.empty else np.nan
 
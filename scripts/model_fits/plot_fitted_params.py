@@ -8,13 +8,20 @@ and generates five 6-panel figures:
   4. Viral
   5. Eukaryote
 """
+import sys
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+from common.taxonomy import collapse_domains
+
+RESULTS_STORE = 'results_store'
 files = {
-    'Truncated': 'Results_truncated.xlsx',
-    'Zipf-Mandelbrot': 'Results_Zipf_Mandelbrot.xlsx'
+    'Truncated': 'truncated_power_law',
+    'Zipf-Mandelbrot': 'zipf_mandelbrot'
 }
 k_values = [3, 4, 5, 6]
 distribution_params = {
@@ -24,10 +31,10 @@ distribution_params = {
 
 taxonomies = {
     'All': None,
-    'Archaea': ['archaea'],
-    'Bacteria': ['bacteria'],
-    'Viral': ['viral'],
-    'Eukaryote': ['protozoa', 'vertebrate', 'vertebrate_other', 'fungi', 'plant', 'invertebrate']
+    'Archaea': 'archaea',
+    'Bacteria': 'bacteria',
+    'Viral': 'viral',
+    'Eukaryote': 'eukaryote'
 }
 
 colors = ['C0', 'C1', 'C2', 'C3', 'C4', 'C5']
@@ -41,7 +48,7 @@ def _fmt(x):
     except Exception:
         return "nan"
 
-for tax_name, tax_list in taxonomies.items():
+for tax_name, domain in taxonomies.items():
     stats = {
         dist: {param: {'mean': [], 'std': []} for param in params}
         for dist, params in distribution_params.items()
@@ -53,11 +60,12 @@ for tax_name, tax_list in taxonomies.items():
     }
 
     print(f"\nTaxonomy: {tax_name}")
-    for dist, path in files.items():
+    for dist, model in files.items():
         for k in k_values:
-            df = pd.read_excel(path, sheet_name=f'k{k}')
-            if tax_list is not None:
-                df = df[df['Taxonomy'].str.lower().isin(tax_list)]
+            df = load_results(RESULTS_STORE, model, k,
+                              columns=['Taxonomy', 'R2'] + distribution_params[dist])
+            if domain is not None:
+                df = df[collapse_domains(df['Taxonomy']) == domain]
             neg_count = (df['R2'] < 0).sum()
             print(f"  {dist}, k={k}: excluded {neg_count} negative R2 values")
             df = df[df['R2'] >= 0]
@@ -2,10 +2,15 @@
 
 import sys
 import os
-import json
+import argparse
 import numpy as np
 from scipy.stats import spearmanr
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import load_work_list, file_size, run_tasks, add_executor_args, atomic_path
+from common.results_store import write_results, results_frame
+from common.kmer_counting import read_rank_counts
+
 DATA_DIR_PATH = "/storage/group/izg5139/default/xaris/sorted_4mers" 
 
 def fit_statistics(y_true, y_pred, num_params):
@@ -22,68 +27,68 @@ def fit_statistics(y_true, y_pred, num_params):
         bic = n * np.log(sse / n) + num_params * np.log(n)
     return {'R2': r2, 'RMSE': rmse, 'AIC': aic, 'BIC': bic}
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python kmers_evaluation_zipf_raw.py <bucket_id> <scheduler_file.json>")
-        sys.exit(1)
+def evaluate_file(file_path):
+    """Compare one count file against plain Zipf (f(r) = f(1)/r); return its results line."""
+    full_path = os.path.join(DATA_DIR_PATH, file_path)
+    if not os.path.isfile(full_path):
+        return f"{os.path.basename(file_path)}: FileNotFound\n"
+
+    try:
+        counts = read_rank_counts(full_path)
+    except Exception:
+        return f"{os.path.basename(file_path)}: ReadError\n"
 
-    bucket_id      = sys.argv[1]
-    scheduler_file = sys.argv[2]
+    if counts.size == 0:
+        return f"{os.path.basename(file_path)}: NoData\n"
 
-    with open(scheduler_file) as sf:
-        sched = json.load(sf)
+    k = np.arange(1, len(counts) + 1, dtype=float)
+    pred = counts[0] / k
 
-    if bucket_id not in sched or not sched[bucket_id]:
+    stats = fit_statistics(counts, pred, num_params=1)
+    rho, _ = spearmanr(counts, pred)
+
+    return (
+        f"{os.path.basename(file_path)}:"
+        f" R2={stats['R2']:.4g}"
+        f" Spearman={rho:.4g}"
+        f" RMSE={stats['RMSE']:.4g}"
+        f" AIC={stats['AIC']:.4g}"
+        f" BIC={stats['BIC']:.4g}\n"
+    )
+
+def main():
+    p = argparse.ArgumentParser(usage="python kmers_evaluation_zipf_raw.py <bucket_id> <scheduler_file.json> [--workers N]")
+    p.add_argument('bucket_id', help="Bucket to evaluate, or 'all' for every bucket")
+    p.add_argument('scheduler_file', help="Scheduler JSON, or a plain list of count files")
+    p.add_argument('--results-store', default=None,
+                   help="Also write the results to this columnar store under model 'zipf'")
+    p.add_argument('--k', type=int, default=4, help="k of the evaluated counts (default: 4)")
+    add_executor_args(p)
+    args = p.parse_args()
+
+    bucket_id = args.bucket_id
+    try:
+        files = load_work_list(args.scheduler_file, bucket_id)
+    except KeyError:
+        files = []
+
+    if not files:
         print(f"No files listed for bucket '{bucket_id}'")
         sys.exit(0)
 
     out_fname = f"not_zipf_law_4mers_{bucket_id}.txt"
 
-    with open(out_fname, 'w') as out_f:
-        for file_path in sched[bucket_id]:
-            full_path = os.path.join(DATA_DIR_PATH, file_path)
-            if not os.path.isfile(full_path):
-                out_f.write(f"{os.path.basename(file_path)}: FileNotFound\n")
-                continue
-
-            try:
-                with open(full_path, 'r') as f:
-                    lines = [line.strip() for line in f]
-            except Exception:
-                out_f.write(f"{os.path.basename(file_path)}: ReadError\n")
-                continue
-
-            counts = []
-            for line in lines:
-                if not line:
-                    continue
-                parts = line.split('\t')
-                if len(parts) != 2:
-                    continue
-                try:
-                    counts.append(float(parts[1]))
-                except ValueError:
-                    pass
-
-            if not counts:
-                out_f.write(f"{os.path.basename(file_path)}: NoData\n")
-                continue
-
-            counts = np.array(counts, dtype=float)
-            k = np.arange(1, len(counts) + 1, dtype=float)
-            pred = counts[0] / k
-
-            stats = fit_statistics(counts, pred, num_params=1)
-            rho, _ = spearmanr(counts, pred)
-
-            out_f.write(
-                f"{os.path.basename(file_path)}:"
-                f" R2={stats['R2']:.4g}"
-                f" Spearman={rho:.4g}"
-                f" RMSE={stats['RMSE']:.4g}"
-                f" AIC={stats['AIC']:.4g}"
-                f" BIC={stats['BIC']:.4g}\n"
-            )
+    sizes = [file_size(os.path.join(DATA_DIR_PATH, f)) for f in files]
+    lines = run_tasks(evaluate_file, files, args.workers, args.retries, sizes)
+    lines = [line if line is not None else f"{os.path.basename(file_path)}: ReadError\n"
+             for file_path, line in zip(files, lines)]
+    with atomic_path(out_fname) as tmp:
+        with open(tmp, 'w') as out_f:
+            out_f.writelines(lines)
+    if args.results_store:
+        path = write_results(args.results_store, 'zipf', args.k, results_frame(lines),
+                             part=bucket_id)
+        print(f"Results table written to: {path}")
 
     print(f"Done. Results saved to: {out_fname}")
 
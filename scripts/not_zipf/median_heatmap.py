@@ -1,110 +1,35 @@
+import sys
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import re
 
-kmer3_txt = '/storage/group/izg5139/default/xaris/not_zipf/not_zipf_3mers_final.txt'
-kmer4_txt = '/storage/group/izg5139/default/xaris/not_zipf/not_zipf_4mers_final.txt'
-kmer5_txt = '/storage/group/izg5139/default/xaris/not_zipf/not_zipf_5mers_final.txt'
-kmer6_txt = '/storage/group/izg5139/default/xaris/not_zipf/not_zipf_6mers_final.txt'
-kmer7_txt = '/storage/group/izg5139/default/xaris/not_zipf/not_zipf_7mers_final.txt'
-kmer8_txt = '/storage/group/izg5139/default/xaris/not_zipf/not_zipf_8mers_final.txt'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+from common.taxonomy import load_taxonomy
 
-txt_paths = {
-    '3': kmer3_txt,
-    '4': kmer4_txt,
-    '5': kmer5_txt,
-    '6': kmer6_txt,
-    '7': kmer7_txt,
-    '8': kmer8_txt
-}
+RESULTS_STORE = '/storage/group/izg5139/default/xaris/not_zipf/results_store'
+k_values = ['3', '4', '5', '6', '7', '8']
 
 taxonomy_csv = '/storage/group/izg5139/default/xaris/taxonomies.csv'
-
-tax_df = pd.read_csv(
-    taxonomy_csv,
-    usecols=['Accession (GCF)', 'Assembly Name', 'Genome Type and Domain'],
-    dtype=str
-)
-
-tax_df = tax_df.set_index(['Accession (GCF)', 'Assembly Name'], drop=False)
-tax_df.sort_index(inplace=True)
-
-eukaryote_subtypes = {
-    "protozoa",
-    "vertebrate",
-    "vertebrate(other)",
-    "fungi",
-    "plant",
-    "invertebrate"
-}
+taxonomy = load_taxonomy(taxonomy_csv)
 
 domains = ['viral', 'bacteria', 'archaea', 'eukaryote']
-collected = { k: { dom: [] for dom in domains } for k in txt_paths.keys() }
-
-pattern = re.compile(r'^(?P<acc>GCA_[^_]+|GCF_[^_]+)_(?P<asm>[^_]+)_')
-
-for k, path in txt_paths.items():
-    matched_count = 0
-    unmatched_list = []
-
-    with open(path, 'r') as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-
-            try:
-                fname, metrics = line.split(':', 1)
-            except ValueError:
-                unmatched_list.append(f"{fname if 'fname' in locals() else line}")
-                continue
-
-            # Extract R² from metrics
-            r2_match = re.search(r'R2=([-\d\.eE\+]+)', metrics)
-            if not r2_match:
-                unmatched_list.append(fname)
-                continue
-            r2_val = float(r2_match.group(1))
-
-            # Extract accession & assembly from filename
-            m = pattern.match(fname)
-            if not m:
-                unmatched_list.append(fname)
-                continue
-            acc = m.group('acc')
-            asm = m.group('asm')
-
-            try:
-                raw_tax_field = tax_df.loc[(acc, asm), 'Genome Type and Domain']
-            except KeyError:
-                unmatched_list.append(fname)
-                continue
-
-            if isinstance(raw_tax_field, pd.Series):
-                raw_tax = raw_tax_field.iloc[0].strip().lower()
-            else:
-                raw_tax = raw_tax_field.strip().lower()
-
-            if raw_tax in eukaryote_subtypes:
-                domain = 'eukaryote'
-            elif raw_tax == 'viral':
-                domain = 'viral'
-            elif raw_tax == 'bacteria':
-                domain = 'bacteria'
-            elif raw_tax == 'archaea':
-                domain = 'archaea'
-            else:
-                unmatched_list.append(fname)
-                continue
-
-            collected[k][domain].append(r2_val)
-            matched_count += 1
-
-    print(f"\nSummary for file (k = {k}):\n  Path: {path}")
+collected = { k: { dom: [] for dom in domains } for k in k_values }
+
+for k in k_values:
+    results = load_results(RESULTS_STORE, 'zipf', int(k), columns=['Filename', 'R2'])
+    results = results[results['R2'].notna()].copy()
+    results['domain'] = taxonomy.domains(results['Filename'], fallback=False)
+    matched = results[results['domain'].notna()]
+    for domain, group in matched.groupby('domain'):
+        collected[k][domain] = group['R2'].astype(float).tolist()
+    matched_count = len(matched)
+
+    print(f"\nSummary for k = {k}:\n  Store: {RESULTS_STORE}")
     print(f" Successfully matched taxonomy for {matched_count} filenames.")
 
-median_r2 = pd.DataFrame(index=domains, columns=sorted(txt_paths.keys(), key=int), dtype=float)
+median_r2 = pd.DataFrame(index=domains, columns=k_values, dtype=float)
 for k in sorted(collected.keys(), key=int):
     for dom in domains:
         vals = collected[k][dom]
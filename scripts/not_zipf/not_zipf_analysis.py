@@ -1,33 +1,21 @@
 #!/usr/bin/env python3
 
+import sys
 import os
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 
-FILE_PATHS = {
-    3: "/storage/group/izg5139/default/xaris/not_zipf/not_zipf_3mers_final.txt",
-    4: "/storage/group/izg5139/default/xaris/not_zipf/not_zipf_4mers_final.txt",
-    5: "/storage/group/izg5139/default/xaris/not_zipf/not_zipf_5mers_final.txt",
-    6: "/storage/group/izg5139/default/xaris/not_zipf/not_zipf_6mers_final.txt",
-    7: "/storage/group/izg5139/default/xaris/not_zipf/not_zipf_7mers_final.txt",
-    8: "/storage/group/izg5139/default/xaris/not_zipf/not_zipf_8mers_final.txt",
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.results_store import load_results
+
+RESULTS_STORE = "/storage/group/izg5139/default/xaris/not_zipf/results_store"
+K_VALUES = [3, 4, 5, 6, 7, 8]
 
 OUTPUT_PLOT = "not_zipf_box_plot.png"
 
-def extract_metrics(file_path):
-    r2_vals = []
-    with open(file_path) as f:
-        for line in f:
-            parts = line.strip().split()
-            for token in parts:
-                if token.startswith('R2='):
-                    try:
-                        r2_vals.append(float(token.split('=', 1)[1]))
-                    except ValueError:
-                        pass
-    return r2_vals
+def extract_metrics(k):
+    return load_results(RESULTS_STORE, 'zipf', k, columns=['R2'])['R2'].dropna().astype(float).tolist()
 
 def custom_boxplot(ax, data, positions):
     for i, vals in enumerate(data):
@@ -60,11 +48,12 @@ def custom_boxplot(ax, data, positions):
 
 def main():
     metrics_by_k = {}
-    for k, file_path in FILE_PATHS.items():
-        if not os.path.exists(file_path):
-            print(f"Warning: file for k={k} not found at {file_path}, skipping.")
+    for k in K_VALUES:
+        try:
+            r2_vals = extract_metrics(k)
+        except FileNotFoundError:
+            print(f"Warning: no results for k={k} in {RESULTS_STORE}, skipping.")
             continue
-        r2_vals = extract_metrics(file_path)
         r2_clean = [v for v in r2_vals if not np.isnan(v)]
         if len(r2_clean) < 2:
             print(f"Not enough data for k={k} (R2 count {len(r2_clean)}), skipping.")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Build the scheduler.json consumed by the pipeline scripts ({bucket_id: [files]}).
+
+Every input is given a cost (compressed bytes, or an estimate of its base
+count) and the files are packed into N buckets with the longest-processing-
+time-first rule: largest file first, always into the currently lightest
+bucket. This keeps a few multi-gigabase eukaryotes from landing in one bucket
+while others hold only viral genomes. The predicted makespan (cost of the
+heaviest bucket) is reported next to the lower bound max(total/N, largest).
+"""
+import os
+import sys
+import glob
+import json
+import heapq
+import struct
+import argparse
+
+GZIP_DNA_RATIO = 3.3    # typical uncompressed/compressed size of a FASTA
+
+
+def fai_bases(path):
+    """Total sequence length from a samtools .fai index next to the FASTA, if any."""
+    for fai in (path + ".fai", path[:-3] + ".fai" if path.endswith(".gz") else None):
+        if fai and os.path.exists(fai):
+            with open(fai) as f:
+                return sum(int(line.split('\t')[1]) for line in f if line.strip())
+    return None
+
+
+def gzip_isize(path):
+    """Uncompressed size modulo 2**32 from the gzip trailer (last member only)."""
+    with open(path, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', f.read(4))[0]
+
+
+def estimate_bases(path):
+    """
+    Approximate number of bases (plus header/newline bytes) of a FASTA. Uses a
+    .fai index when present, the gzip trailer otherwise; the trailer stores
+    the size modulo 4 GiB, so the wrap count closest to a typical DNA
+    compression ratio is picked. A trailer smaller than the file (only the
+    last member of a multi-member gzip) falls back to that ratio.
+    """
+    bases = fai_bases(path)
+    if bases is not None:
+        return bases
+    size = os.path.getsize(path)
+    if not path.endswith(".gz"):
+        return size
+    try:
+        isize = gzip_isize(path)
+    except (OSError, struct.error):
+        return int(size * GZIP_DNA_RATIO)
+    expected = size * GZIP_DNA_RATIO
+    wraps = max(0, round((expected - isize) / 2 ** 32))
+    if isize == 0 or (isize < size and wraps == 0):
+        # multi-member (bgzip) files: the trailer is the last member's, often the empty EOF block
+        return int(expected)
+    return isize + wraps * 2 ** 32
+
+
+def file_cost(path, cost):
+    if not os.path.exists(path):
+        print(f"Warning: {path} not found, costed as 0", file=sys.stderr)
+        return 0
+    if cost == 'bases':
+        return estimate_bases(path)
+    return os.path.getsize(path)
+
+
+def lpt_buckets(files, costs, n_buckets):
+    """Longest-processing-time-first packing; returns (buckets, loads)."""
+    heap = [(0, b) for b in range(n_buckets)]
+    buckets = [[] for _ in range(n_buckets)]
+    loads = [0] * n_buckets
+    for cost, path in sorted(zip(costs, files), key=lambda t: t[0], reverse=True):
+        load, b = heapq.heappop(heap)
+        buckets[b].append(path)
+        loads[b] = load + cost
+        heapq.heappush(heap, (loads[b], b))
+    return buckets, loads
+
+
+def collect_inputs(inputs, list_file, pattern):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(sorted(glob.glob(os.path.join(item, pattern))))
+        elif any(c in item for c in "*?["):
+            files.extend(sorted(glob.glob(item)))
+        else:
+            files.append(item)
+    if list_file:
+        with open(list_file) as f:
+            files.extend(line.strip() for line in f if line.strip())
+    return files
+
+
+def human(n, cost):
+    unit = "bp" if cost == 'bases' else "B"
+    for prefix in ("", "K", "M", "G", "T"):
+        if abs(n) < 1000:
+            return f"{n:.1f} {prefix}{unit}"
+        n /= 1000
+    return f"{n:.1f} P{unit}"
+
+
+def main():
+    p = argparse.ArgumentParser(description="Size-balanced scheduler.json builder")
+    p.add_argument('inputs', nargs='*', help="Files, directories or glob patterns")
+    p.add_argument('-n', '--buckets', type=int, required=True, help="Number of buckets")
+    p.add_argument('-o', '--output', default='scheduler.json')
+    p.add_argument('--list', dest='list_file', default=None,
+                   help="Text file with one input path per line")
+    p.add_argument('--pattern', default='*.fna.gz',
+                   help="Glob used inside directory inputs (default: *.fna.gz)")
+    p.add_argument('--cost', choices=('bytes', 'bases'), default='bytes',
+                   help="Balance on file size or on an estimated base count")
+    args = p.parse_args()
+
+    if args.buckets < 1:
+        sys.exit(f"--buckets must be >= 1, got {args.buckets}")
+    files = collect_inputs(args.inputs, args.list_file, args.pattern)
+    if not files:
+        sys.exit("No input files found.")
+
+    costs = [file_cost(f, args.cost) for f in files]
+    buckets, loads = lpt_buckets(files, costs, args.buckets)
+    sched = {str(b): paths for b, paths in enumerate(buckets)}
+
+    with open(args.output, 'w') as f:
+        json.dump(sched, f, indent=1)
+
+    total = sum(costs)
+    makespan = max(loads)
+    bound = max(total / args.buckets, max(costs))
+    print(f"{len(files)} files, total {human(total, args.cost)} in {args.buckets} buckets")
+    print(f"Predicted makespan: {human(makespan, args.cost)} "
+          f"(lower bound {human(bound, args.cost)}, mean load {human(total / args.buckets, args.cost)})")
+    print(f"Lightest bucket: {human(min(loads), args.cost)}")
+    print(f"Scheduler written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,164 @@
 #!/usr/bin/env python3
 
 import sys
-import json
 import os
-import gzip
-from Bio import SeqIO
+import argparse
+from functools import partial
+import numpy as np
 
-def reverse_complement(seq):
-    """Return the reverse complement of a DNA sequence."""
-    complement_map = str.maketrans("ATCG", "TAGC")
-    return seq.translate(complement_map)[::-1]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.kmer_counting import (
+    new_kmer_table, update_kmer_tables, ranked_kmers, ranked_counts, write_kmer_counts,
+    write_kmer_blocks, write_rank_counts, parse_k_values, MAX_DENSE_K
+)
+from common.sparse_counting import (SparseKmerTable, write_sparse_rank_counts,
+                                    iter_ranked_sparse_kmers, canonical_kmer_count,
+                                    DEFAULT_MEMORY)
+from common.count_store import (canonical_vector, canonical_codes, create_bucket, store_counts,
+                                close_bucket)
+from common.packed_genome import iter_genome, genome_name
+from common.inequality import summarize_counts, summarize_histogram, write_summaries
+from common.executor import load_work_list, iter_tasks, atomic_path, add_executor_args
+
+def sparse_summary(table):
+    """Inequality summary of a sparse table, unseen canonical k-mers as zeros."""
+    values, n = table.count_histogram()
+    n_zero = canonical_kmer_count(table.k) - int(n.sum())
+    return summarize_histogram(np.concatenate(([0], values)), np.concatenate(([n_zero], n)))
+
+def count_genome(fasta_path, ks, output_dir, write_text=True, want_vectors=False,
+                 summarize=True, cache_dir=None, ranks_only=False, top=None,
+                 sparse_memory=DEFAULT_MEMORY, tmp_dir=None):
+    """
+    Count every k of one genome in a single pass and write the text files
+    (or, with ranks_only, <name>_ranks_<k>.npy count vectors), limited to
+    the `top` most frequent k-mers when given. Returns ({k: canonical
+    count vector} if want_vectors, {k: inequality summary} if summarize),
+    either being None when not asked for. The genome is read from its
+    packed copy in cache_dir when there is one. k > MAX_DENSE_K is counted
+    as sorted runs (common/sparse_counting.py) in sparse_memory bytes
+    shared by those k, spilled to tmp_dir beyond it.
+    """
+    base_name = genome_name(fasta_path)
+    dense = {k: new_kmer_table(k) for k in ks if k <= MAX_DENSE_K}
+    sparse_ks = [k for k in ks if k > MAX_DENSE_K]
+    sparse = {}
+    try:
+        for k in sparse_ks:
+            sparse[k] = SparseKmerTable(k, sparse_memory // len(sparse_ks), tmp_dir)
+        # one pass over the FASTA fills the table of every requested k
+        for _, encoded in iter_genome(fasta_path, cache_dir):
+            update_kmer_tables(dense.values(), encoded)
+            for table in sparse.values():
+                table.update(encoded)
+
+        for k in ks:
+            if not write_text:
+                break
+            if ranks_only:
+                output_filename = os.path.join(output_dir, f"{base_name}_ranks_{k}.npy")
+                with atomic_path(output_filename) as tmp:
+                    if k in sparse:
+                        write_sparse_rank_counts(tmp, sparse[k], top)
+                    else:
+                        write_rank_counts(tmp, ranked_counts(dense[k]['counts'], top))
+                print(f"Processed {fasta_path}, ranks written to: {output_filename}")
+                continue
+            output_filename = os.path.join(output_dir, f"{base_name}_kmers_{k}.txt")
+            # Write kmers sorted by count in descending order
+            with atomic_path(output_filename) as tmp:
+                if k in sparse:
+                    write_kmer_blocks(tmp, iter_ranked_sparse_kmers(sparse[k], top), k)
+                else:
+                    codes, counts = ranked_kmers(dense[k], top)
+                    write_kmer_counts(tmp, codes, counts, k)
+            print(f"Processed {fasta_path}, results written to: {output_filename}")
+
+        vectors = summaries = None
+        if want_vectors:
+            vectors = {k: canonical_vector(table['counts'], k) for k, table in dense.items()}
+        if summarize:
+            summaries = {k: sparse_summary(sparse[k]) if k in sparse else
+                         summarize_counts(dense[k]['counts'][canonical_codes(k).astype(np.intp)])
+                         for k in ks}
+        return vectors, summaries
+    finally:
+        for table in sparse.values():
+            table.close()
 
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python script.py <bucket_id> <k> <scheduler.json>")
-        sys.exit(1)
+    p = argparse.ArgumentParser()
+    p.add_argument('bucket_id', help="Bucket to process, or 'all' for every bucket")
+    p.add_argument('k', help="Single value, range or list, e.g. 6, 3-8 or 3,5,7")
+    p.add_argument('scheduler', help="Scheduler JSON, or a plain list of FASTA paths")
+    p.add_argument('--store-dir', default=None,
+                   help="Also write dense canonical count vectors (.npy) under this directory.")
+    p.add_argument('--skip-text', action='store_true',
+                   help="Do not write the per-genome <name>_kmers_<k>.txt files.")
+    p.add_argument('--skip-summary', action='store_true',
+                   help="Do not write kmer_summary_<bucket>.tsv (Gini, entropy and Lorenz "
+                        "curve of every genome and k).")
+    p.add_argument('--ranks-only', action='store_true',
+                   help="Write <name>_ranks_<k>.npy (the rank-sorted counts alone) instead of "
+                        "the k-mer text files.")
+    p.add_argument('--top', type=int, default=None,
+                   help="Keep only the N most frequent k-mers in the text or ranks files.")
+    p.add_argument('--genome-cache', default=None,
+                   help="Directory of packed genomes from pack_genomes.py, used when up to date.")
+    p.add_argument('--sparse-memory', type=int, default=1024,
+                   help=f"MiB per worker for the sorted-run counts of k > {MAX_DENSE_K} "
+                        "(default: 1024); runs beyond it are spilled to --tmp-dir.")
+    p.add_argument('--tmp-dir', default=None,
+                   help="Directory for spilled k-mer runs (default: the system temporary directory).")
+    add_executor_args(p)
+    args = p.parse_args()
 
-    bucket_id = sys.argv[1]
-    k = int(sys.argv[2])
-    scheduler_path = sys.argv[3]
+    bucket_id = args.bucket_id
+    ks = parse_k_values(args.k)
+    if args.top is not None and args.top < 1:
+        print(f"--top must be >= 1, got {args.top}.")
+        sys.exit(1)
+    if args.store_dir is not None and max(ks) > MAX_DENSE_K:
+        print(f"--store-dir holds dense count vectors, k must be <= {MAX_DENSE_K}.")
+        sys.exit(1)
 
-    with open(scheduler_path, 'r') as f:
-        scheduler = json.load(f)
-    if bucket_id not in scheduler:
+    try:
+        fasta_paths = load_work_list(args.scheduler, bucket_id)
+    except KeyError:
         print(f"Bucket ID '{bucket_id}' not found in scheduler.")
         sys.exit(1)
 
     output_dir = "/scratch/cpk5664/extra_3_tru_mers"
     os.makedirs(output_dir, exist_ok=True)
 
-    for fasta_path in scheduler[bucket_id]:
-        base_name = os.path.basename(fasta_path)
-        output_filename = os.path.join(output_dir, f"{base_name}_kmers_{k}.txt")
-        kmer_counts = {}
-
-        if fasta_path.endswith(".gz"):
-            handle = gzip.open(fasta_path, "rt")
-        else:
-            handle = open(fasta_path, "r")
+    store = None
+    if args.store_dir is not None:
+        store = create_bucket(args.store_dir, bucket_id, ks, len(fasta_paths))
 
-        with handle:
-            for record in SeqIO.parse(handle, "fasta"):
-                seq_str = str(record.seq).upper()
-                seq_length = len(seq_str)
-                if seq_length < k:
-                    continue
-                for i in range(seq_length - k + 1):
-                    kmer = seq_str[i:i+k]
-                    if any(base not in "ATCG" for base in kmer):
-                        continue
-                    rc_kmer = reverse_complement(kmer)
-                    canonical_kmer = kmer if kmer < rc_kmer else rc_kmer
-                    kmer_counts[canonical_kmer] = kmer_counts.get(canonical_kmer, 0) + 1
-
-        with open(output_filename, 'w') as out_f:
-            out_f.write("#kmer\tcount\n")
-            # Write kmers sorted by count in descending order
-            for kmer, count in sorted(kmer_counts.items(), key=lambda x: x[1], reverse=True):
-                out_f.write(f"{kmer}\t{count}\n")
+    work = partial(count_genome, ks=ks, output_dir=output_dir, write_text=not args.skip_text,
+                   want_vectors=store is not None, summarize=not args.skip_summary,
+                   cache_dir=args.genome_cache, ranks_only=args.ranks_only, top=args.top,
+                   sparse_memory=args.sparse_memory << 20, tmp_dir=args.tmp_dir)
+    summary_rows = {}
+    for i, result in iter_tasks(work, fasta_paths, args.workers, args.retries):
+        if result is None:
+            print(f"Failed {fasta_paths[i]}", file=sys.stderr)
+            continue
+        vectors, summaries = result
+        name = genome_name(fasta_paths[i])
+        if store is not None:
+            store_counts(store, name, vectors)
+            print(f"Processed {fasta_paths[i]}, counts stored in: {store['dir']}")
+        if summaries is not None:
+            summary_rows[i] = [(name, k, summaries[k]) for k in ks]
 
-        print(f"Processed {fasta_path}, results written to: {output_filename}")
-        kmer_counts.clear()
+    if store is not None:
+        close_bucket(store)
+    if summary_rows:
+        summary_path = os.path.join(output_dir, f"kmer_summary_{bucket_id}.tsv")
+        with atomic_path(summary_path) as tmp:
+            write_summaries(tmp, [row for i in sorted(summary_rows) for row in summary_rows[i]])
+        print(f"Per-genome summaries written to: {summary_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
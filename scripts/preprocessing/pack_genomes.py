@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Convert the genomes of a scheduler bucket once to 2-bit packed files
+(common/packed_genome.py) in a cache directory. create_kmers.py and
+calculate_distinct_total_pairs.py given --genome-cache DIR then read these
+instead of gunzipping and parsing the FASTA on every pass. Genomes whose
+packed copy is up to date are skipped.
+"""
+import sys
+import os
+import argparse
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.executor import load_work_list, iter_tasks, add_executor_args, file_size
+from common.packed_genome import packed_path, cached_genome, write_packed_genome
+
+
+def pack_genome(fasta_path, cache_dir):
+    """Packed file of one genome; returns the number of contigs, 0 if it was up to date."""
+    if cached_genome(fasta_path, cache_dir) is not None:
+        return 0
+    n = write_packed_genome(fasta_path, packed_path(fasta_path, cache_dir))
+    print(f"Packed {fasta_path} ({n} contigs)")
+    return n
+
+
+def main():
+    p = argparse.ArgumentParser(description="Pack genomes to 2-bit files for the scanning stages")
+    p.add_argument('bucket_id', help="Bucket to process, or 'all' for every bucket")
+    p.add_argument('scheduler', help="Scheduler JSON, or a plain list of FASTA paths")
+    p.add_argument('cache_dir', help="Directory of the packed files")
+    add_executor_args(p)
+    args = p.parse_args()
+
+    try:
+        fasta_paths = load_work_list(args.scheduler, args.bucket_id)
+    except KeyError:
+        print(f"Bucket ID '{args.bucket_id}' not found in scheduler.")
+        sys.exit(1)
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    work = partial(pack_genome, cache_dir=args.cache_dir)
+    sizes = [file_size(f) for f in fasta_paths]
+    failed = 0
+    for i, result in iter_tasks(work, fasta_paths, args.workers, args.retries, sizes):
+        if result is None:
+            print(f"Failed {fasta_paths[i]}", file=sys.stderr)
+            failed += 1
+    print(f"{len(fasta_paths) - failed}/{len(fasta_paths)} genomes packed in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()